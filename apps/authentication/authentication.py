@@ -1,4 +1,9 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from setup.local_cache import local_cache, stats, ensure_subscriber, MISSING
+from users.models import user_cache_key
 
 class CookiesJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -17,4 +22,37 @@ class CookiesJWTAuthentication(JWTAuthentication):
         except:
             return None
         
-        return user, access_token
\ No newline at end of file
+        return user, access_token
+
+    def get_user(self, validated_token):
+        """Busca o usuário no cache local do processo antes de ir ao banco."""
+        ensure_subscriber()
+        cache_key = user_cache_key(validated_token.get(api_settings.USER_ID_CLAIM))
+        row = local_cache.get(cache_key)
+
+        if row is MISSING:
+            stats.incr('l1_misses')
+            user = super().get_user(validated_token)
+            # Guarda só os valores da linha (imutáveis): cada requisição monta a sua própria instância,
+            # então alterar `request.user` não afeta as outras threads
+            fields = user._meta.concrete_fields
+            local_cache.set(cache_key, (
+                user._state.db,
+                tuple(field.attname for field in fields),
+                tuple(getattr(user, field.attname) for field in fields),
+            ))
+            return user
+
+        stats.incr('l1_hits')
+        db, field_names, values = row
+        user = self.user_model.from_db(db, field_names, values)
+
+        # As mesmas verificações do JWTAuthentication.get_user. Um `update()` em massa não dispara o
+        # signal que invalida a entrada, então a desativação feita assim vale após L1_CACHE_TIMEOUT
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
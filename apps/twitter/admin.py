@@ -1,14 +1,26 @@
 from django.contrib import admin
-from .models import Post, Like, Follow
+from .models import Post, Like, Follow, ArchivedPost
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'created_at', 'updated_at',)
+    list_display = ('title', 'created_at', 'updated_at', 'deleted_post',)
     search_fields = ('title', 'content',)
-    list_filter = ('created_at', 'updated_at',)
+    list_filter = ('created_at', 'updated_at', 'deleted_post',)
     ordering = ('created_at',)
     list_per_page = 20
 
+    def get_queryset(self, request):
+        # O admin também precisa ver os posts deletados
+        return Post.all_objects.all()
+
+
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = ('title', 'user', 'likes_count', 'deleted_at', 'archived_at',)
+    search_fields = ('title', 'content',)
+    list_filter = ('archived_at',)
+    ordering = ('-archived_at',)
+    list_per_page = 20
+
 
 class LikeAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'created_at',)
@@ -29,3 +41,4 @@ class FollowAdmin(admin.ModelAdmin):
 admin.site.register(Post, PostAdmin)
 admin.site.register(Like, LikeAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(ArchivedPost, ArchivedPostAdmin)
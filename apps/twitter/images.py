@@ -0,0 +1,196 @@
+import hashlib
+import io
+import posixpath
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+from .models import ImageAsset
+
+
+def _encode(image, fmt, quality):
+    buffer = io.BytesIO()
+    # Nenhum `exif`/`icc_profile` é repassado, então os metadados do original não vão para as variantes
+    if fmt == 'JPEG':
+        image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        image.save(buffer, format=fmt, optimize=True)
+    return buffer.getvalue()
+
+
+def variant_widths(original_width):
+    """Target widths smaller than the original, plus the original width itself."""
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS if width < original_width]
+    return widths + [original_width]
+
+
+def generate_variants(name, storage=default_storage):
+    """
+    Read an uploaded image and write its resized JPEG/PNG and WebP variants, without EXIF.
+
+    Returns (width, height, variants) where variants is a list ordered by width:
+    [{'width': 320, 'height': 240, 'fallback': <path>, 'webp': <path>}, ...].
+    """
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+
+    # Aplica a orientação do EXIF antes de descartá-lo
+    image = ImageOps.exif_transpose(image)
+    width, height = image.size
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    fallback_format, fallback_ext = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+
+    variants = []
+    for target_width in variant_widths(width):
+        resized = image
+        if target_width < width:
+            resized = image.resize((target_width, max(1, round(height * target_width / width))), Image.LANCZOS)
+
+        base = posixpath.join(directory, 'variants', f'{stem}_{target_width}')
+        fallback = storage.save(
+            f'{base}.{fallback_ext}',
+            ContentFile(_encode(resized, fallback_format, settings.IMAGE_JPEG_QUALITY)),
+        )
+        webp = storage.save(f'{base}.webp', ContentFile(_encode(resized, 'WEBP', settings.IMAGE_WEBP_QUALITY)))
+        variants.append({'width': resized.width, 'height': resized.height, 'fallback': fallback, 'webp': webp})
+
+    return width, height, variants
+
+
+def content_hash(upload):
+    """SHA-256 of an upload, as computed by the hashing upload handlers or read from its chunks."""
+    digest = getattr(upload, 'sha256', None)
+    if digest:
+        return digest
+
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    upload.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_path(digest, filename):
+    """Content-addressed path of an image: <IMAGE_BLOB_PREFIX>/ab/cd/<sha256><ext>."""
+    ext = posixpath.splitext(filename or '')[1].lower()
+    return posixpath.join(settings.IMAGE_BLOB_PREFIX, digest[:2], digest[2:4], f'{digest}{ext}')
+
+
+def store_image(upload, storage=default_storage):
+    """
+    Store an uploaded image by content hash and take a reference to it.
+
+    Identical uploads share the same ImageAsset (and file); the caller must hand the reference
+    back with `release_image` when the post stops using it.
+    """
+    digest = content_hash(upload)
+
+    with transaction.atomic():
+        asset, created = ImageAsset.objects.select_for_update().get_or_create(
+            sha256=digest,
+            defaults={'path': blob_path(digest, upload.name), 'size': upload.size},
+        )
+        if created and not storage.exists(asset.path):
+            name = storage.save(asset.path, upload)
+            if name != asset.path:
+                asset.path = name
+                asset.save(update_fields=['path'])
+
+        ImageAsset.objects.filter(id=asset.id).update(refcount=F('refcount') + 1)
+        asset.refcount += 1
+
+    return asset
+
+
+def delete_image_files(asset, storage=default_storage):
+    for name in [asset.path] + [path for variant in asset.variants for path in (variant['fallback'], variant['webp'])]:
+        storage.delete(name)
+
+
+def release_image(asset_id, storage=default_storage):
+    """Drop one reference to an image; the last one deletes the asset and its files."""
+    if asset_id is None:
+        return
+
+    with transaction.atomic():
+        asset = ImageAsset.objects.select_for_update().filter(id=asset_id).first()
+        if asset is None:
+            return
+
+        asset.refcount = max(0, asset.refcount - 1)
+        # Imagens anteriores ao armazenamento por hash (sem sha256) nunca são apagadas daqui
+        if asset.refcount or not asset.sha256:
+            asset.save(update_fields=['refcount'])
+            return
+
+        asset.delete()
+        # Os arquivos só somem depois do commit, para um rollback não deixar o registro sem arquivo
+        transaction.on_commit(lambda: delete_image_files(asset, storage))
+
+
+def requested_width(request):
+    """Width the client asked for (`?image_width=` or the `Width`/`Viewport-Width` client hints)."""
+    if request is None:
+        return settings.IMAGE_DEFAULT_WIDTH
+
+    for value in (
+        request.GET.get('image_width'),
+        request.headers.get('Width'),
+        request.headers.get('Viewport-Width'),
+    ):
+        try:
+            if value:
+                return max(1, int(float(value)))
+        except (ValueError, OverflowError):
+            # Texto inválido, ou `inf`/`1e999`, que o float aceita mas o int não
+            continue
+    return settings.IMAGE_DEFAULT_WIDTH
+
+
+def accepts_webp(request):
+    if request is None:
+        return False
+    return request.GET.get('image_format') == 'webp' or 'image/webp' in request.headers.get('Accept', '')
+
+
+def pick_variant(variants, width, webp):
+    """Path of the smallest variant at least `width` wide (or the largest one), in WebP if accepted."""
+    if not variants:
+        return None
+
+    chosen = next((variant for variant in variants if variant['width'] >= width), variants[-1])
+    return chosen['webp'] if webp else chosen['fallback']
+
+
+def client_preferences(request):
+    return requested_width(request), accepts_webp(request)
+
+
+def image_url(name, variants, request=None, preferences=None, storage=default_storage):
+    """
+    URL of the variant that fits the client, or of the original file while it has no variants.
+
+    List builders pass `preferences=client_preferences(request)` once per page.
+    """
+    if not name:
+        return None
+
+    path = name
+    if variants:
+        width, webp = preferences or client_preferences(request)
+        path = pick_variant(variants, width, webp)
+
+    url = storage.url(path)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
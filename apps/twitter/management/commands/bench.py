@@ -0,0 +1,285 @@
+import json
+import multiprocessing
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.tokens import AccessToken
+from setup.local_cache import local_cache
+from twitter.models import Post, Like, Follow
+
+
+class Fixture:
+    """Usuários (com token já emitido) e posts sorteados do dataset, usados pelos clientes virtuais."""
+
+    def __init__(self, users, post_ids):
+        self.users = users
+        self.post_ids = post_ids
+
+    @classmethod
+    def load(cls, sample_users, seed):
+        rng = random.Random(seed)
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True).iterator(10000))
+        sample = User.objects.filter(id__in=rng.sample(user_ids, min(sample_users, len(user_ids)))).order_by('id')
+        users = [(user.id, user.username, str(AccessToken.for_user(user))) for user in sample]
+
+        post_ids = list(Post.objects.order_by('id').values_list('id', flat=True).iterator(10000))
+        return cls(users, rng.sample(post_ids, min(10000, len(post_ids))))
+
+
+def _auth(user):
+    return {'HTTP_COOKIE': f'access_token={user[2]}'}
+
+
+def bench_feed(client, rng, fixture):
+    return client.get(reverse('post_feed'), **_auth(rng.choice(fixture.users)))
+
+
+def bench_like(client, rng, fixture):
+    # O endpoint alterna like/unlike, então o volume de likes fica estável entre as rodadas
+    return client.post(reverse('like_post-list'), {'post': rng.choice(fixture.post_ids)}, **_auth(rng.choice(fixture.users)))
+
+
+def bench_follow(client, rng, fixture):
+    user, followed = rng.sample(fixture.users, 2)
+    return client.post(reverse('follow_user-list'), {'followed': followed[0]}, **_auth(user))
+
+
+def bench_user_list(client, rng, fixture):
+    return client.get(reverse('user_list'), **_auth(rng.choice(fixture.users)))
+
+
+def bench_profile(client, rng, fixture):
+    return client.get(reverse('user_profile'), **_auth(rng.choice(fixture.users)))
+
+
+def bench_login(client, rng, fixture):
+    # Todos os usuários do populate_models têm a senha "password"
+    user = rng.choice(fixture.users)
+    return client.post(reverse('login'), {'username': user[1], 'password': 'password'}, HTTP_COOKIE='')
+
+
+ENDPOINTS = {
+    'login': bench_login,
+    'profile': bench_profile,
+    'user_list': bench_user_list,
+    'feed': bench_feed,
+    'like': bench_like,
+    'follow': bench_follow,
+}
+
+
+def run_client(func, fixture, count, seed, close_connections):
+    """Executa `count` requisições em sequência; devolve (latência em segundos, queries, status) de cada uma."""
+    client = Client()
+    rng = random.Random(seed)
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    results = []
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count_queries))
+            for _ in range(count):
+                queries = 0
+                start = time.perf_counter()
+                response = func(client, rng, fixture)
+                results.append((time.perf_counter() - start, queries, response.status_code))
+    finally:
+        # Cada thread tem as próprias conexões; fechadas aqui para o banco de teste poder ser removido
+        if close_connections:
+            connections.close_all()
+    return results
+
+
+def summarize(results, elapsed):
+    latencies = np.array([latency for latency, _, _ in results]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, _, status in results if status >= 400),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(latencies.mean()), 3),
+        'throughput_rps': round(len(results) / elapsed, 2),
+        'queries_per_request': round(sum(queries for _, queries, _ in results) / len(results), 2),
+    }
+
+
+def find_regressions(report, baseline, max_regression):
+    """(escala, endpoint, p95 anterior, p95 atual) dos endpoints cujo p95 piorou mais que `max_regression`."""
+    previous = {
+        (run['scale'], name): stats['p95_ms']
+        for run in baseline.get('runs', []) for name, stats in run['endpoints'].items()
+    }
+    regressions = []
+    for run in report['runs']:
+        for name, stats in run['endpoints'].items():
+            before = previous.get((run['scale'], name))
+            if before and stats['p95_ms'] > before * (1 + max_regression):
+                regressions.append((run['scale'], name, before, stats['p95_ms']))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência (p50/p95/p99), vazão e queries por requisição dos principais endpoints em datasets '
+        'determinísticos de vários tamanhos; o relatório sai em JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,100000,1000000',
+                            help='Quantidades de usuários dos datasets, separadas por vírgula')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                            help=f'Endpoints medidos, separados por vírgula ({", ".join(ENDPOINTS)})')
+        parser.add_argument('--requests', type=int, default=200, help='Requisições medidas por endpoint')
+        parser.add_argument('--warmup', type=int, default=20, help='Requisições de aquecimento por endpoint (não medidas)')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Clientes simultâneos (threads; no SQLite sempre 1)')
+        parser.add_argument('--sample-users', type=int, default=500, help='Usuários sorteados para fazer as requisições')
+        parser.add_argument('--seed', type=int, default=0, help='Semente dos datasets e das requisições')
+        parser.add_argument('--power-law', type=float, default=1.2, metavar='ALPHA',
+                            help='Expoente da distribuição de seguidores repassado ao populate_models')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Processos do populate_models')
+        parser.add_argument('--output', help='Grava o relatório neste arquivo em vez da saída padrão')
+        parser.add_argument('--baseline', help='Relatório anterior: falha se algum p95 piorar mais que --max-regression')
+        parser.add_argument('--max-regression', type=float, default=0.2,
+                            help='Piora tolerada do p95 em relação ao --baseline (0.2 = 20%%)')
+        parser.add_argument('--keepdb', action='store_true', help='Mantém o banco de teste entre execuções')
+        parser.add_argument('--no-test-database', action='store_true',
+                            help='Usa o banco configurado em vez de um banco de teste (os dados dele serão APAGADOS)')
+        parser.add_argument('--throttle', action='store_true', help='Mantém o throttling do DRF durante as medições')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(value) for value in options['scales'].split(',') if value]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers.')
+        endpoints = [name for name in options['endpoints'].split(',') if name]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}.')
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+
+        old_config = None
+        if not options['no_test_database']:
+            # Banco separado (test_<NAME>), como no test runner: os dados de desenvolvimento ficam intactos
+            old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+
+        try:
+            self.concurrency = options['concurrency'] if connection.vendor != 'sqlite' else 1
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'commit': git_commit(),
+                'database': connection.vendor,
+                'concurrency': self.concurrency,
+                'requests': options['requests'],
+                'seed': options['seed'],
+                'runs': [self.run_scale(scale, endpoints, options) for scale in scales],
+            }
+        finally:
+            if old_config is not None:
+                connections.close_all()
+                teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        content = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(content + '\n')
+        else:
+            self.stdout.write(content)
+
+        if baseline is not None:
+            regressions = find_regressions(report, baseline, options['max_regression'])
+            for scale, name, before, after in regressions:
+                self.stderr.write(f'{name} ({scale} usuários): p95 {before:.1f} ms -> {after:.1f} ms')
+            if regressions:
+                raise CommandError(f'{len(regressions)} endpoint(s) slower than the baseline.')
+
+    def run_scale(self, scale, endpoints, options):
+        self.stderr.write(f'Gerando o dataset com {scale} usuários...')
+        call_command('flush', interactive=False, verbosity=0)
+        call_command(
+            'populate_models', users=scale, seed=options['seed'], power_law=options['power_law'],
+            workers=options['workers'], stdout=StringIO(),
+        )
+        fixture = Fixture.load(options['sample_users'], options['seed'])
+        if len(fixture.users) < 2 or not fixture.post_ids:
+            raise CommandError(f'The {scale} users dataset is too small to benchmark.')
+
+        dataset = {
+            'users': User.objects.count(),
+            'posts': Post.objects.count(),
+            'likes': Like.objects.count(),
+            'follows': Follow.objects.count(),
+        }
+
+        # Prefixo próprio por escala: nada do cache de uma rodada anterior (com os mesmos ids) é reaproveitado
+        caches = {
+            alias: {**config, 'KEY_PREFIX': f"{config.get('KEY_PREFIX', '')}bench_{scale}_{time.time_ns()}"}
+            for alias, config in settings.CACHES.items()
+        }
+        throttle = nullcontext() if options['throttle'] else mock.patch.object(
+            SimpleRateThrottle, 'THROTTLE_RATES', dict.fromkeys(SimpleRateThrottle.THROTTLE_RATES),
+        )
+
+        results = {}
+        with override_settings(CACHES=caches, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), throttle:
+            local_cache.clear()
+            for name in endpoints:
+                self.stderr.write(f'  {name}...')
+                results[name] = self.run_endpoint(ENDPOINTS[name], fixture, options)
+
+        return {'scale': scale, 'dataset': dataset, 'endpoints': results}
+
+    def run_endpoint(self, func, fixture, options):
+        seed = options['seed']
+        if options['warmup']:
+            run_client(func, fixture, options['warmup'], seed - 1, close_connections=False)
+
+        counts = [len(part) for part in np.array_split(np.arange(options['requests']), self.concurrency)]
+        start = time.perf_counter()
+        if self.concurrency == 1:
+            results = run_client(func, fixture, counts[0], seed, close_connections=False)
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                parts = pool.map(
+                    lambda args: run_client(func, fixture, *args, close_connections=True),
+                    [(count, seed + index) for index, count in enumerate(counts)],
+                )
+                results = [result for part in parts for result in part]
+        return summarize(results, time.perf_counter() - start)
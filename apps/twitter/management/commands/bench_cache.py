@@ -0,0 +1,85 @@
+import time
+import uuid
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_redis.serializers.pickle import PickleSerializer
+from setup.cache_backends import CompactSerializer, _codecs
+from setup.connections import get_redis
+from twitter.management.commands.bench_serialization import best_of
+
+
+def build_values(num_rows):
+    """Valores típicos do cache: contagem, histórico do throttle, página do feed, sugestões, usuário e metadados."""
+    now = time.time()
+    feed_page = [
+        {'id': i, 'user__username': f'user_{i % 100}', 'title': f'Post {i}', 'content': 'Lorem ipsum ' * 20,
+         'image': 'core/static/posts/img/default.png', 'created_at': '2024-11-01T12:00:00Z', 'likes_count': i % 50}
+        for i in range(num_rows)
+    ]
+    return [
+        ('contagem (int)', 1234),
+        ('histórico do throttle', [now - i * 0.5 for i in range(100)]),
+        ('página do feed', feed_page),
+        ('ids da timeline', list(range(1_000_000, 1_000_000 + num_rows * 10))),
+        ('sugestões', [{'id': i, 'username': f'user_{i}', 'score': i / 7} for i in range(50)]),
+        ('usuário (model)', User(id=1, username='bench_user', email='bench_user@example.com', date_joined=timezone.now())),
+        ('metadados (tupla)', (now + 900, 0.05)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compara tamanho, memória no Redis e latência de get/set dos valores do cache entre o pickle e o CompactSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Posts na página do feed (e ids x10 na timeline)')
+        parser.add_argument('--repeat', type=int, default=200, help='Rodadas de cada medida (vale a melhor)')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        min_bytes = settings.CACHES['default'].get('OPTIONS', {}).get('COMPRESS_MIN_BYTES', 1024)
+        serializers = [('pickle', PickleSerializer({}))]
+        for _, (name, _, _) in sorted(_codecs().items()):
+            serializers.append((f'compact+{name}', CompactSerializer({'COMPRESSION': name, 'COMPRESS_MIN_BYTES': min_bytes})))
+
+        client = get_redis()
+        if client is None:
+            self.stdout.write('Sem Redis: só tamanho e (de)serialização; memória e get/set exigem o cache no Redis')
+        prefix = f'bench_cache:{uuid.uuid4().hex[:8]}'
+
+        self.stdout.write(
+            f'{"valor":<24}{"serializer":<16}{"bytes":>9}{"redis B":>9}{"dumps µs":>10}{"loads µs":>10}'
+            f'{"set µs":>9}{"get µs":>9}'
+        )
+        try:
+            for label, value in build_values(options['rows']):
+                for name, serializer in serializers:
+                    self.stdout.write(self.measure(label, name, serializer, value, client, f'{prefix}:{name}', repeat))
+        finally:
+            if client is not None:
+                keys = list(client.scan_iter(f'{prefix}:*'))
+                if keys:
+                    client.delete(*keys)
+
+    def measure(self, label, name, serializer, value, client, key, repeat):
+        # Inteiros não passam pelo serializer no django-redis: viram inteiros nativos do Redis
+        if isinstance(value, int) and not isinstance(value, bool):
+            encode, decode = (lambda: value), (lambda data: int(data))
+        else:
+            encode, decode = (lambda: serializer.dumps(value)), serializer.loads
+
+        dumps_time, data = best_of(repeat, encode)
+        loads_time, _ = best_of(repeat, lambda: decode(data))
+        size = len(data) if isinstance(data, bytes) else len(str(data))
+
+        redis_columns = f'{"-":>9}{"-":>9}{"-":>9}'
+        if client is not None:
+            set_time, _ = best_of(repeat, lambda: client.set(key, encode()))
+            get_time, _ = best_of(repeat, lambda: decode(client.get(key)))
+            redis_columns = f'{client.memory_usage(key):>9}{set_time * 1e6:>9.1f}{get_time * 1e6:>9.1f}'
+
+        return (
+            f'{label:<24}{name:<16}{size:>9}{redis_columns[:9]}{dumps_time * 1e6:>10.1f}{loads_time * 1e6:>10.1f}'
+            f'{redis_columns[9:]}'
+        )
@@ -0,0 +1,36 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from twitter.ranking import score_posts, rank_post_ids
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de pontuação e ordenação dos candidatos do feed ranqueado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=10000, help='Posts candidatos por rodada')
+        parser.add_argument('--repeat', type=int, default=50, help='Rodadas (vale a mediana)')
+
+    def handle(self, *args, **options):
+        num_candidates = options['candidates']
+        rng = np.random.default_rng(0)
+        now = time.time()
+
+        post_ids = np.arange(num_candidates, dtype=np.int64)
+        created_at = now - rng.uniform(0, 7 * 24 * 3600, num_candidates)
+        likes = rng.poisson(5, num_candidates)
+        affinity = rng.poisson(1, num_candidates)
+        followers = rng.integers(0, 100_000, num_candidates)
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            scores = score_posts(created_at, likes, affinity, followers, now)
+            rank_post_ids(post_ids, scores)
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        self.stdout.write(
+            f'{num_candidates} candidatos: mediana {timings[len(timings) // 2] * 1000:.2f} ms, '
+            f'melhor {timings[0] * 1000:.2f} ms, pior {timings[-1] * 1000:.2f} ms'
+        )
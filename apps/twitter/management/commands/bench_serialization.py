@@ -0,0 +1,95 @@
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from twitter.models import Post, Follow, followers_count_cache_key, followed_count_cache_key
+from twitter.serializers import PostListSerializer, FollowerListSerializer, FollowedListSerializer
+from users.serializers import UserSerializer
+from setup.cache import set_many_cached
+from setup.renderers import ORJSONRenderer
+
+
+def build_users(num_rows):
+    now = timezone.now()
+    return [
+        User(id=1_000_000 + i, username=f'bench_user_{i}', email=f'bench_user_{i}@example.com', date_joined=now)
+        for i in range(num_rows)
+    ]
+
+
+def build_datasets(num_rows):
+    """Monta instâncias (caminho ModelSerializer) e linhas de `.values()` (caminho rápido) equivalentes, sem banco."""
+    now = timezone.now()
+    users = build_users(num_rows)
+
+    posts = []
+    post_rows = []
+    for i, user in enumerate(users):
+        post = Post(id=i + 1, user=user, title=f'Post {i}', content='Lorem ipsum ' * 20,
+                    image='core/static/posts/img/default.png', created_at=now)
+        post.likes_count = i % 50
+        posts.append(post)
+        post_rows.append({
+            'id': post.id, 'user__username': user.username, 'title': post.title, 'content': post.content,
+            'image': post.image.name, 'created_at': now, 'likes_count': post.likes_count,
+        })
+
+    follows = [Follow(id=i + 1, follower=user, followed=users[-i - 1], created_at=now) for i, user in enumerate(users)]
+    follower_rows = [{'id': f.id, 'follower__username': f.follower.username, 'created_at': now} for f in follows]
+    followed_rows = [{'id': f.id, 'followed__username': f.followed.username, 'created_at': now} for f in follows]
+    user_rows = [
+        {'id': u.id, 'username': u.username, 'email': u.email, 'date_joined': u.date_joined} for u in users
+    ]
+
+    return [
+        ('PostListSerializer', PostListSerializer, posts, post_rows),
+        ('FollowerListSerializer', FollowerListSerializer, follows, follower_rows),
+        ('FollowedListSerializer', FollowedListSerializer, follows, followed_rows),
+        ('UserSerializer', UserSerializer, users, user_rows),
+    ]
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = 'Compara o tempo de serialização/renderização por 1000 linhas entre o ModelSerializer e o modo rápido'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Linhas por rodada')
+        parser.add_argument('--repeat', type=int, default=5, help='Rodadas (vale a melhor)')
+
+    def handle(self, *args, **options):
+        num_rows = options['rows']
+        repeat = options['repeat']
+        context = {'request': RequestFactory(SERVER_NAME='localhost').get('/api/posts/feed/')}
+        scale = 1000 / num_rows
+
+        datasets = build_datasets(num_rows)
+
+        # As contagens do UserSerializer vêm do cache nos dois caminhos
+        user_ids = [row['id'] for row in datasets[-1][3]]
+        set_many_cached({followers_count_cache_key(user_id): 0 for user_id in user_ids})
+        set_many_cached({followed_count_cache_key(user_id): 0 for user_id in user_ids})
+
+        self.stdout.write(f'{"serializer":<24}{"model ms":>10}{"fast ms":>10}{"json ms":>10}{"orjson ms":>11}{"speedup":>9}')
+        for name, serializer_class, instances, rows in datasets:
+            model_time, model_data = best_of(repeat, lambda: serializer_class(instances, many=True, context=context).data)
+            fast_time, fast_data = best_of(repeat, lambda: serializer_class.fast_representation(rows, context))
+            json_time, _ = best_of(repeat, lambda: JSONRenderer().render(model_data))
+            orjson_time, _ = best_of(repeat, lambda: ORJSONRenderer().render(fast_data))
+
+            speedup = (model_time + json_time) / (fast_time + orjson_time)
+            self.stdout.write(
+                f'{name:<24}{model_time * scale * 1000:>10.2f}{fast_time * scale * 1000:>10.2f}'
+                f'{json_time * scale * 1000:>10.2f}{orjson_time * scale * 1000:>11.2f}{speedup:>8.1f}x'
+            )
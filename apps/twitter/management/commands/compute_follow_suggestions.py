@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from twitter.suggestions import store_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Calcula as sugestões de quem seguir (amigos de amigos) de todos os usuários e grava no cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None, help='Sugestões por usuário')
+        parser.add_argument('--workers', type=int, default=None, help='Processos do pool (padrão: FOLLOW_SUGGESTIONS_WORKERS)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        processed = store_suggestions(top_k=options['top_k'], workers=options['workers'])
+        self.stdout.write(f'Sugestões calculadas para {processed} usuários em {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,10 @@
+import json
+from django.core.management.base import BaseCommand
+from setup.connections import pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Exibe estatísticas dos pools de conexão do Postgres, Redis e Celery'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(json.dumps(pool_stats(), indent=2, default=str))
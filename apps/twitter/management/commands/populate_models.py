@@ -1,93 +1,267 @@
-import random
+import csv
+import io
+import multiprocessing
+import time
+from datetime import timedelta
+from itertools import islice
+import numpy as np
 from faker import Faker
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.models import Max
+from django.utils import timezone
 from twitter.models import Post, Like, Follow
 
-fake = Faker()
 
-# Número de usuários a serem criados
-NUM_USERS = 1550
+# Estado de cada fase, herdado pelos processos filhos via fork (os arrays não são serializados)
+_state = {}
 
-# Limites para o número de posts e likes por usuário
-MIN_POSTS_PER_USER = 1
-MAX_POSTS_PER_USER = 3
+POOL_SIZE = 1000
+CHUNK_SIZE = 50_000
 
-# Número máximo de seguidores por usuário
-MAX_FOLLOWERS_PER_USER = 1549
 
-def generate_data(command):
-    users = []
-    posts = []
-    likes = []
-    follows = []
-    
-    # Conjunto para rastrear usernames gerados
-    existing_usernames = set()
+def chunks(total, chunk_size=CHUNK_SIZE):
+    return [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
 
-    # Criar usuários
-    for i in range(NUM_USERS):
-        username = fake.user_name()
 
-        # Garantir que o username seja único
-        while username in existing_usernames:
-            username = fake.user_name()  # Gerar um novo username se já existir
+def split(total, parts, size):
+    """Distribui `total` itens entre os intervalos `parts` de um conjunto de `size` elementos, proporcionalmente."""
+    return [(start, stop, total * stop // size - total * start // size) for start, stop in parts]
 
-        existing_usernames.add(username)
 
-        user = User.objects.create_user(
-            username=username,
-            email=fake.email(),
-            password='password'
-        )
-        users.append(user)
-
-        # Exibir progresso da criação de usuários
-        command.stdout.write(command.style.SUCCESS(f'Usuário {i + 1}/{NUM_USERS} criado: {user.username}'))
-
-    # Criar posts para cada usuário
-    for i, user in enumerate(users):
-        num_posts = random.randint(MIN_POSTS_PER_USER, MAX_POSTS_PER_USER)
-        for j in range(num_posts):
-            post = Post.objects.create(
-                user=user,
-                title=fake.sentence(),
-                content=fake.paragraph(),
-                image=fake.file_name(extension='jpg'),
-            )
-            posts.append(post)
-
-            # Exibir progresso da criação de posts
-            command.stdout.write(command.style.SUCCESS(f'Post {j + 1} criado para {user.username}'))
-
-    # Criar likes aleatórios em posts
-    for i, user in enumerate(users):
-        num_likes = random.randint(1, min(len(posts), 1549))  # Cada usuário pode curtir até 1549 posts
-        liked_posts = random.sample(posts, num_likes)
-        for j, post in enumerate(liked_posts):
-            like = Like.objects.create(user=user, post=post)
-            likes.append(like)
-
-            # Exibir progresso da criação de likes
-            command.stdout.write(command.style.SUCCESS(f'Like {j + 1}/{num_likes} dado por {user.username}'))
-
-    # Criar follows aleatórios
-    for i, user in enumerate(users):
-        num_follows = random.randint(1, MAX_FOLLOWERS_PER_USER)
-        followers = random.sample([u for u in users if u != user], num_follows)
-        for j, follower in enumerate(followers):
-            follow = Follow.objects.create(follower=follower, followed=user)
-            follows.append(follow)
-
-            # Exibir progresso da criação de follows
-            command.stdout.write(command.style.SUCCESS(f'{follower.username} seguiu {user.username}'))
-
-    return users, posts, likes, follows
+def power_law_weights(size, alpha, rng):
+    """Probabilidades Zipf (rank^-alpha) em ordem aleatória, para os populares não serem sempre os primeiros ids."""
+    weights = np.arange(1, size + 1, dtype=np.float64) ** -alpha
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def random_datetimes(rng, count, now, days):
+    seconds = rng.integers(0, max(1, days * 24 * 3600), count)
+    return (now - timedelta(seconds=int(value)) for value in seconds)
+
+
+def batched(rows, size):
+    """Lotes de `size` linhas de um iterável, sem materializar o resto."""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def unique_pairs(left, right, right_size):
+    """Remove os pares repetidos de dois arrays de índices."""
+    keys = np.unique(left.astype(np.int64) * right_size + right)
+    left, right = keys // right_size, keys % right_size
+    return left, right
+
+
+def write_rows(model, columns, rows, batch_size):
+    """
+    Grava as linhas com COPY no Postgres ou com INSERTs em lote (executemany) nos outros bancos.
+
+    `rows` pode ser um gerador: só um lote fica em memória por vez. Retorna quantas linhas foram gravadas.
+    """
+    written = 0
+    if connection.vendor == 'postgresql':
+        for batch in batched(rows, batch_size):
+            copy_rows(model._meta.db_table, columns, batch)
+            written += len(batch)
+        return written
+
+    # Sem bulk_create: o auto_now_add trocaria as datas geradas pelo horário atual
+    fields = [model._meta.get_field(column) for column in columns]
+    quote = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(field.column) for field in fields)}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))})'
+    )
+    with connection.cursor() as cursor:
+        for batch in batched(rows, batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+                for row in batch
+            ])
+            written += len(batch)
+    return written
+
+
+def copy_rows(table, columns, rows):
+    # NULL explícito: no formato csv o padrão trata o campo vazio como NULL, e first_name/last_name são ''
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([r'\N' if value is None else value for value in row] for row in rows)
+    buffer.seek(0)
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+    with connection.cursor() as cursor:
+        if hasattr(cursor.cursor, 'copy_expert'):  # psycopg2
+            cursor.cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _rng(phase, start):
+    return np.random.default_rng([_state['seed'], phase, start])
+
+
+def create_users(start, stop):
+    names = _state['usernames']
+    rng = _rng(0, start)
+    now = timezone.now()
+    offset = _state['user_offset']
+    usernames = (
+        f'{names[name]}_{offset + i + 1}'
+        for i, name in zip(range(start, stop), rng.integers(0, len(names), stop - start))
+    )
+    rows = (
+        (username, f'{username}@example.com', _state['password'], '', '', False, False, True, now)
+        for username in usernames
+    )
+    return write_rows(
+        User,
+        ['username', 'email', 'password', 'first_name', 'last_name', 'is_superuser', 'is_staff', 'is_active', 'date_joined'],
+        rows,
+        _state['batch_size'],
+    )
+
+
+def create_posts(start, stop):
+    rng = _rng(1, start)
+    count = stop - start
+    now = timezone.now()
+    authors = rng.choice(_state['user_ids'], count)
+    titles = rng.integers(0, len(_state['titles']), count)
+    contents = rng.integers(0, len(_state['contents']), count)
+    created = random_datetimes(rng, count, now, _state['days'])
+
+    rows = (
+        (int(author), _state['titles'][title], _state['contents'][content], _state['image'], False, when, when)
+        for author, title, content, when in zip(authors, titles, contents, created)
+    )
+    return write_rows(
+        Post, ['user_id', 'title', 'content', 'image', 'deleted_post', 'created_at', 'updated_at'],
+        rows, _state['batch_size'],
+    )
+
+
+def create_likes(start, stop, count):
+    # Cada processo cuida de um intervalo de usuários, então os pares (user, post) não se repetem entre processos
+    rng = _rng(2, start)
+    post_ids = _state['post_ids']
+    users, posts = unique_pairs(rng.integers(start, stop, count), rng.integers(0, len(post_ids), count), len(post_ids))
+    now = timezone.now()
+    created = random_datetimes(rng, len(users), now, _state['days'])
+
+    rows = (
+        (int(_state['user_ids'][user]), int(post_ids[post]), when)
+        for user, post, when in zip(users, posts, created)
+    )
+    return write_rows(Like, ['user_id', 'post_id', 'created_at'], rows, _state['batch_size'])
+
+
+def create_follows(start, stop, count):
+    rng = _rng(3, start)
+    user_ids = _state['user_ids']
+    followers = rng.integers(start, stop, count)
+    weights = _state['follow_weights']
+    followed = rng.choice(len(user_ids), count, p=weights) if weights is not None else rng.integers(0, len(user_ids), count)
+
+    followers, followed = unique_pairs(followers, followed, len(user_ids))
+    keep = followers != followed
+    followers, followed = followers[keep], followed[keep]
+    now = timezone.now()
+    created = random_datetimes(rng, len(followers), now, _state['days'])
+
+    rows = (
+        (int(user_ids[follower]), int(user_ids[target]), when)
+        for follower, target, when in zip(followers, followed, created)
+    )
+    return write_rows(Follow, ['follower_id', 'followed_id', 'created_at'], rows, _state['batch_size'])
+
+
+def _run_chunk(task):
+    func, args = task
+    return func(*args)
+
 
 class Command(BaseCommand):
-    help = 'Popula o banco de dados com usuários, posts, likes e follows'
+    help = 'Popula o banco de dados com usuários, posts, likes e follows (em lotes, com COPY no Postgres)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1550, help='Usuários a criar')
+        parser.add_argument('--posts', type=int, default=None, help='Posts a criar (padrão: 2 por usuário)')
+        parser.add_argument('--likes', type=int, default=None, help='Likes a criar (padrão: 20 por usuário)')
+        parser.add_argument('--follows', type=int, default=None, help='Follows a criar (padrão: 20 por usuário)')
+        parser.add_argument('--seed', type=int, default=0, help='Semente dos dados gerados')
+        parser.add_argument('--power-law', type=float, default=None, metavar='ALPHA',
+                            help='Distribui os seguidores por uma lei de potência (Zipf) com este expoente')
+        parser.add_argument('--days', type=int, default=30, help='Período (em dias) das datas geradas')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Linhas por lote de inserção')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Processos em paralelo (só no Postgres; no SQLite sempre 1)')
+
+    def handle(self, *args, **options):
+        num_users = options['users']
+        num_posts = options['posts'] if options['posts'] is not None else num_users * 2
+        num_likes = options['likes'] if options['likes'] is not None else num_users * 20
+        num_follows = options['follows'] if options['follows'] is not None else num_users * 20
+        self.workers = options['workers'] if connection.vendor == 'postgresql' else 1
+
+        fake = Faker()
+        Faker.seed(options['seed'])
+        _state.update(
+            seed=options['seed'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            # Um único hash para todos os usuários: o PBKDF2 por usuário é o que mais custa
+            password=make_password('password'),
+            usernames=[fake.user_name() for _ in range(POOL_SIZE)],
+            titles=[fake.sentence() for _ in range(POOL_SIZE)],
+            contents=[fake.paragraph() for _ in range(POOL_SIZE)],
+            image='core/static/img/posts/default.jpg',
+            user_offset=User.objects.aggregate(last=Max('id'))['last'] or 0,
+        )
+        post_offset = Post.all_objects.aggregate(last=Max('id'))['last'] or 0
+
+        self.stdout.write(self.style.WARNING(f'Iniciando a geração de dados ({self.workers} processo(s))...'))
+
+        self.run_phase('usuários', create_users, chunks(num_users))
+        _state['user_ids'] = np.fromiter(
+            User.objects.filter(id__gt=_state['user_offset']).order_by('id').values_list('id', flat=True).iterator(),
+            dtype=np.int64,
+        )
+
+        self.run_phase('posts', create_posts, chunks(num_posts))
+        _state['post_ids'] = np.fromiter(
+            Post.all_objects.filter(id__gt=post_offset).order_by('id').values_list('id', flat=True).iterator(),
+            dtype=np.int64,
+        )
+
+        users = len(_state['user_ids'])
+        if users and len(_state['post_ids']):
+            self.run_phase('likes', create_likes, split(num_likes, chunks(users), users))
+
+        if users > 1:
+            alpha = options['power_law']
+            rng = np.random.default_rng(options['seed'])
+            _state['follow_weights'] = power_law_weights(users, alpha, rng) if alpha else None
+            self.run_phase('follows', create_follows, split(num_follows, chunks(users), users))
+
+    def run_phase(self, name, func, tasks):
+        start = time.perf_counter()
+        tasks = [(func, args) for args in tasks]
+
+        if self.workers > 1 and len(tasks) > 1:
+            # Os filhos abrem as próprias conexões; o estado da fase vai junto no fork
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(self.workers) as pool:
+                created = sum(pool.imap_unordered(_run_chunk, tasks))
+        else:
+            created = sum(_run_chunk(task) for task in tasks)
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write(self.style.WARNING('Iniciando a geração de dados...'))
-        users, posts, likes, follows = generate_data(self)
-        self.stdout.write(self.style.SUCCESS(f'Concluído: {len(users)} usuários, {len(posts)} posts, {len(likes)} likes, e {len(follows)} follows criados.'))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} {name} criados em {elapsed:.1f}s ({created / max(elapsed, 1e-9):,.0f}/s)'
+        ))
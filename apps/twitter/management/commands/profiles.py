@@ -0,0 +1,80 @@
+import io
+import os
+import pstats
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from setup.profiling import MODES, list_profiles, make_token
+
+
+def top_functions(path, limit):
+    """Funções com mais tempo acumulado de um .prof do cProfile."""
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+
+def top_frames(path, limit):
+    """Frames mais amostrados de um .folded: (frame, amostras em que está na pilha, amostras em que é a folha)."""
+    inclusive = Counter()
+    leaf = Counter()
+    for line in open(path):
+        stack, _, count = line.rstrip('\n').rpartition(' ')
+        frames = stack.split(';')
+        for frame in set(frames):
+            inclusive[frame] += int(count)
+        leaf[frames[-1]] += int(count)
+    return [(frame, samples, leaf[frame]) for frame, samples in inclusive.most_common(limit)]
+
+
+class Command(BaseCommand):
+    help = 'Lista os perfis de requisições gravados, mostra o resumo de um deles ou gera o header para perfilar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?', help='Mostra as funções e as queries mais lentas deste perfil')
+        parser.add_argument('--limit', type=int, default=20, help='Perfis listados ou linhas do resumo')
+        parser.add_argument('--token', action='store_true',
+                            help=f'Gera o valor do header {settings.PROFILING_HEADER} (válido por PROFILING_TOKEN_MAX_AGE)')
+        parser.add_argument('--mode', choices=MODES, default='cprofile', help='Profiler usado com o --token')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(f'{settings.PROFILING_HEADER}: {make_token(options["mode"])}')
+            return
+
+        profiles = list_profiles()
+        if options['profile_id']:
+            meta = next((meta for meta in profiles if meta['id'] == options['profile_id']), None)
+            if meta is None:
+                raise CommandError(f'Profile {options["profile_id"]} not found in {settings.PROFILING_DIR}.')
+            return self.show(meta, options['limit'])
+
+        if not profiles:
+            self.stdout.write(f'Nenhum perfil em {settings.PROFILING_DIR}')
+            return
+
+        self.stdout.write(f'{"id":<24}{"modo":<10}{"ms":>9}{"queries":>9}{"sql ms":>9}{"status":>8}  requisição')
+        for meta in profiles[:options['limit']]:
+            self.stdout.write(
+                f'{meta["id"]:<24}{meta["mode"]:<10}{meta["duration"] * 1000:>9.1f}{meta["query_count"]:>9}'
+                f'{meta["query_time"] * 1000:>9.1f}{meta["status"]:>8}  {meta["method"]} {meta["path"]}'
+            )
+
+    def show(self, meta, limit):
+        path = os.path.join(settings.PROFILING_DIR, meta['file'])
+        self.stdout.write(
+            f'{meta["method"]} {meta["path"]} ({meta["view"]}) -> {meta["status"]} em {meta["duration"] * 1000:.1f} ms, '
+            f'{meta["query_count"]} queries ({meta["query_time"] * 1000:.1f} ms)\n'
+        )
+
+        if meta['mode'] == 'sampling':
+            self.stdout.write(f'{"amostras":>9}{"folha":>7}  frame')
+            for frame, samples, leaf in top_frames(path, limit):
+                self.stdout.write(f'{samples:>9}{leaf:>7}  {frame}')
+            self.stdout.write(f'\nPilhas para flamegraph.pl/speedscope: {path}')
+        else:
+            self.stdout.write(top_functions(path, limit))
+
+        self.stdout.write('Queries mais lentas:')
+        for query in sorted(meta['queries'], key=lambda query: query['time'], reverse=True)[:limit]:
+            self.stdout.write(f'{query["time"] * 1000:>9.2f} ms  {query["sql"]}')
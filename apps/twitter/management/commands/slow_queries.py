@@ -0,0 +1,45 @@
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from setup import slow_queries
+
+
+class Command(BaseCommand):
+    help = 'Lista as queries lentas agregadas por fingerprint (maior tempo total primeiro), com o plano capturado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fingerprint', nargs='?', help='Mostra o SQL, os parâmetros da pior execução e o EXPLAIN')
+        parser.add_argument('--limit', type=int, default=20, help='Fingerprints listados')
+        parser.add_argument('--reset', action='store_true', help='Apaga o agregado')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            slow_queries.reset()
+            self.stdout.write(self.style.SUCCESS('Log de queries lentas apagado'))
+            return
+
+        if options['fingerprint']:
+            entries = slow_queries.top(settings.SLOW_QUERY_MAX_FINGERPRINTS)
+            entry = next((entry for entry in entries if entry['fingerprint'] == options['fingerprint']), None)
+            if entry is None:
+                raise CommandError(f'Fingerprint {options["fingerprint"]} not found.')
+            return self.show(entry)
+
+        entries = slow_queries.top(options['limit'])
+        self.stdout.write(f'{"fingerprint":<18}{"count":>7}{"total s":>10}{"avg ms":>9}{"max ms":>9}  {"plan":<5} origem / SQL')
+        for entry in entries:
+            self.stdout.write(
+                f'{entry["fingerprint"]:<18}{entry["count"]:>7}{entry["total"]:>10.2f}'
+                f'{entry["total"] / entry["count"] * 1000:>9.1f}{entry["max"] * 1000:>9.1f}  '
+                f'{"sim" if entry.get("plan") else "-":<5} {entry["source"]}: {entry["sql"][:120]}'
+            )
+
+    def show(self, entry):
+        # O agregado pode ter parâmetros gravados antes de SLOW_QUERY_LOG_PARAMS ser desligado
+        params = entry.get('max_params') if settings.SLOW_QUERY_LOG_PARAMS else '<hidden>'
+        self.stdout.write(
+            f'{entry["count"]} execuções, {entry["total"]:.2f} s no total, pior {entry["max"] * 1000:.1f} ms\n'
+            f'Origem: {entry["source"]} ({entry["alias"]}), última em {datetime.fromtimestamp(entry["last_seen"]):%Y-%m-%d %H:%M:%S}\n\n'
+            f'{entry["sql"]}\n\nParâmetros da pior execução: {params}\n'
+        )
+        self.stdout.write(entry.get('plan') or 'Sem plano capturado (só leituras no Postgres têm EXPLAIN)')
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-19 13:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0005_image_asset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='image_asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_posts', to='twitter.imageasset'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='refcount',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='size',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-19 13:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0007_image_upload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', 'followed'], name='follow_follower_followed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followed', 'follower'], name='follow_followed_follower_idx'),
+        ),
+    ]
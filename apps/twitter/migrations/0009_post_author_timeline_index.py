@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-19 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0008_follow_relationship_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Cria o novo índice antes de remover o antigo, para as consultas não ficarem sem nenhum
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', 'deleted_post', '-created_at', '-id'], name='post_user_deleted_created_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_active_user_created_idx',
+        ),
+    ]
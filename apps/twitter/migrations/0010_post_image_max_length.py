@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twitter', '0009_post_author_timeline_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(max_length=255, upload_to='core/static/img/posts/', verbose_name='Image'),
+        ),
+    ]
@@ -1,15 +1,107 @@
+import os
+import uuid
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from setup.cache import get_or_compute, get_many_or_compute, set_cached
+from setup.local_cache import invalidate
+
+
+def post_likes_cache_key(post_id):
+    return f'post_{post_id}_likes'
+
+
+def followers_count_cache_key(user_id):
+    return f'user_{user_id}_followers_count'
+
+
+def followed_count_cache_key(user_id):
+    return f'user_{user_id}_followed_count'
+
+
+class ActivePostManager(models.Manager):
+    """Default manager for posts that hides the soft-deleted ones."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_post=False)
+
+
+class ImageAsset(models.Model):
+    """
+    Uploaded image stored by content hash and shared by every post that uses it (`refcount`),
+    with its dimensions and resized JPEG/PNG + WebP variants without EXIF.
+    """
+    path = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    size = models.PositiveBigIntegerField(null=True)
+    refcount = models.PositiveIntegerField(default=0)
+    width = models.PositiveIntegerField(null=True)
+    height = models.PositiveIntegerField(null=True)
+    variants = models.JSONField(default=list)
+    processed_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.path
+
+
+class ImageUpload(models.Model):
+    """
+    Resumable image upload: the bytes are appended to a temporary file until `offset == size`,
+    then stored as an ImageAsset whose reference moves to the post that uses `id`.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='image_uploads')
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=50, blank=True)
+    image_asset = models.ForeignKey(ImageAsset, null=True, blank=True, on_delete=models.SET_NULL, related_name='uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.IMAGE_UPLOAD_TEMP_DIR, f'{self.id}.part')
+
+    def __str__(self):
+        return str(self.id)
+
 
 class Post(models.Model):
     user = models.ForeignKey(User, on_delete=models.PROTECT)
     title = models.CharField(max_length=255)
     content = models.TextField()
-    image = models.ImageField(verbose_name="Image", upload_to='core/static/img/posts/')
+    image = models.ImageField(verbose_name="Image", upload_to='core/static/img/posts/', max_length=255)
+    image_asset = models.ForeignKey(ImageAsset, null=True, blank=True, on_delete=models.SET_NULL, related_name='posts')
     deleted_post = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # `objects` só enxerga posts ativos; `all_objects` inclui os deletados
+    objects = ActivePostManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        base_manager_name = 'all_objects'
+        indexes = [
+            # Timeline do autor e feed: filtra por autor e deleted_post e pagina por (created_at, id)
+            # direto na ordem do índice, inclusive nas páginas profundas
+            models.Index(
+                fields=['user', 'deleted_post', '-created_at', '-id'],
+                name='post_user_deleted_created_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                condition=Q(deleted_post=True),
+                name='post_deleted_at_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -17,6 +109,62 @@ class Post(models.Model):
     def get_likes_count(self):
         return self.likes.count() 
 
+    def refresh_likes_count(self):
+        """Recalcula a contagem de likes no Redis e a descarta do cache local de todos os processos."""
+        cache_key = post_likes_cache_key(self.id)
+        set_cached(cache_key, self.likes.count())
+        invalidate(cache_key)
+
+    def adjust_likes_count(self, delta):
+        """Soma `delta` à contagem em cache com um INCR atômico; sem a contagem em cache, recalcula."""
+        cache_key = post_likes_cache_key(self.id)
+        try:
+            cache.incr(cache_key, delta)
+        except ValueError:
+            self.refresh_likes_count()
+            return
+        invalidate(cache_key)
+
+    @classmethod
+    def get_likes_counts(cls, post_ids, local=False):
+        """Retorna {post_id: likes} usando o cache e uma única consulta para os que faltarem."""
+        def count_likes(missing_ids):
+            return dict(
+                Like.objects.filter(post_id__in=missing_ids)
+                .values_list('post_id')
+                .annotate(total=Count('id'))
+            )
+
+        return get_many_or_compute(
+            {post_id: post_likes_cache_key(post_id) for post_id in post_ids},
+            count_likes,
+            local=local,
+        )
+
+    def soft_delete(self):
+        """Mark the post as deleted, keeping the row until it is archived."""
+        self.deleted_post = True
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_post', 'deleted_at', 'updated_at'])
+
+
+class ArchivedPost(models.Model):
+    """Post deleted long enough ago to be moved out of the live `Post` table."""
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='archived_posts')
+    title = models.CharField(max_length=255)
+    content = models.TextField()
+    image = models.CharField(max_length=255, blank=True)
+    image_asset = models.ForeignKey(ImageAsset, null=True, blank=True, on_delete=models.SET_NULL, related_name='archived_posts')
+    likes_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
 
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.PROTECT)
@@ -31,34 +179,129 @@ class Follow(models.Model):
     follower = models.ForeignKey(User, on_delete=models.PROTECT, related_name='follower')
     followed = models.ForeignKey(User, on_delete=models.PROTECT, related_name='followed')
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        # Índices compostos nos dois sentidos: as consultas de relacionamento resolvem só pelo índice
+        indexes = [
+            models.Index(fields=['follower', 'followed'], name='follow_follower_followed_idx'),
+            models.Index(fields=['followed', 'follower'], name='follow_followed_follower_idx'),
+        ]
+
     def __str__(self):
         return f'{self.follower.username} follows {self.followed.username}'
 
     @classmethod
-    def get_followers_count(cls, user, update_cache=False):
+    def relationships(cls, user, user_ids):
+        """
+        Relationship of `user` with each id in `user_ids`, in one query:
+        {user_id: {'following': bool, 'followed_by': bool, 'mutual': bool}}.
+        """
+        result = {user_id: {'following': False, 'followed_by': False, 'mutual': False} for user_id in user_ids}
+        edges = cls.objects.filter(
+            Q(follower=user, followed_id__in=user_ids) | Q(followed=user, follower_id__in=user_ids)
+        ).values_list('follower_id', 'followed_id')
+
+        for follower_id, followed_id in edges:
+            if follower_id == user.id:
+                result[followed_id]['following'] = True
+            else:
+                result[follower_id]['followed_by'] = True
+        for status in result.values():
+            status['mutual'] = status['following'] and status['followed_by']
+        return result
+
+    @classmethod
+    def followers_in_common(cls, user, user_ids, sample):
+        """
+        For each id in `user_ids`, how many accounts `user` follows also follow it and the first
+        `sample` of them by username, in one self-join on Follow that never loads more than
+        `sample` rows per id: {user_id: (count, [(follower_id, username), ...])}.
+        """
+        result = {user_id: (0, []) for user_id in user_ids}
+        partition = {'partition_by': [F('followed_id')]}
+        rows = (
+            cls.objects.filter(
+                followed_id__in=user_ids,
+                follower_id__in=cls.objects.filter(follower=user).values('followed_id'),
+            )
+            .annotate(
+                total=Window(Count('id'), **partition),
+                position=Window(RowNumber(), order_by=F('follower__username').asc(), **partition),
+            )
+            # Pelo menos uma linha por id, para a contagem vir mesmo com sample=0
+            .filter(position__lte=max(sample, 1))
+            .order_by('followed_id', 'position')
+            .values_list('followed_id', 'total', 'position', 'follower_id', 'follower__username')
+        )
+        for followed_id, total, position, follower_id, username in rows:
+            names = result[followed_id][1]
+            if position <= sample:
+                names.append((follower_id, username))
+            result[followed_id] = (total, names)
+        return result
+
+    @classmethod
+    def mutuals(cls, user):
+        """Follows from `user` to the accounts that follow `user` back."""
+        return cls.objects.filter(
+            follower=user,
+            followed_id__in=cls.objects.filter(followed=user).values('follower_id'),
+        )
+
+    @classmethod
+    def get_followers_count(cls, user, update_cache=False, local=False):
         """Retorna o número de seguidores de um usuário e atualiza o cache, se solicitado."""
-        cache_key = f'user_{user.id}_followers_count'
-        
-        # Atualiza o cache ao criar uma nova relação de seguidores
-        if update_cache or cache.get(cache_key) is None:
-            followers_count = cls.objects.filter(followed=user).count()
-            cache.set(cache_key, followers_count, timeout=60*15)
-        else:
-            followers_count = cache.get(cache_key)
+        cache_key = followers_count_cache_key(user.id)
 
-        return followers_count
+        # Atualiza o cache ao criar uma nova relação de seguidores; senão, só um processo recalcula
+        return get_or_compute(
+            cache_key,
+            lambda: cls.objects.filter(followed=user).count(),
+            force=update_cache,
+            local=local,
+        )
 
     @classmethod
-    def get_followed_count(cls, user, update_cache=False):
+    def get_followed_count(cls, user, update_cache=False, local=False):
         """Retorna o número de usuários que um usuário está seguindo e atualiza o cache, se solicitado."""
-        cache_key = f'user_{user.id}_followed_count'
-        
-        # Atualiza o cache ao seguir um novo usuário
-        if update_cache or cache.get(cache_key) is None:
-            followed_count = cls.objects.filter(follower=user).count()
-            cache.set(cache_key, followed_count, timeout=60*15)
-        else:
-            followed_count = cache.get(cache_key)
-
-        return followed_count
\ No newline at end of file
+        cache_key = followed_count_cache_key(user.id)
+
+        # Atualiza o cache ao seguir um novo usuário; senão, só um processo recalcula
+        return get_or_compute(
+            cache_key,
+            lambda: cls.objects.filter(follower=user).count(),
+            force=update_cache,
+            local=local,
+        )
+
+    @classmethod
+    def get_followers_counts(cls, user_ids, local=False):
+        """Retorna {user_id: seguidores} em lote, com uma única consulta para os que faltarem no cache."""
+        def count_followers(missing_ids):
+            return dict(
+                cls.objects.filter(followed_id__in=missing_ids)
+                .values_list('followed_id')
+                .annotate(total=Count('id'))
+            )
+
+        return get_many_or_compute(
+            {user_id: followers_count_cache_key(user_id) for user_id in user_ids},
+            count_followers,
+            local=local,
+        )
+
+    @classmethod
+    def get_followed_counts(cls, user_ids, local=False):
+        """Retorna {user_id: seguidos} em lote, com uma única consulta para os que faltarem no cache."""
+        def count_followed(missing_ids):
+            return dict(
+                cls.objects.filter(follower_id__in=missing_ids)
+                .values_list('follower_id')
+                .annotate(total=Count('id'))
+            )
+
+        return get_many_or_compute(
+            {user_id: followed_count_cache_key(user_id) for user_id in user_ids},
+            count_followed,
+            local=local,
+        )
@@ -0,0 +1,79 @@
+import math
+import numpy as np
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from setup.cache import get_or_compute
+from .models import Post, Like, Follow
+
+
+def ranked_feed_cache_key(user_id):
+    return f'ranked_feed_{user_id}'
+
+
+def score_posts(created_at, likes, affinity, followers, now, half_life_hours=None, weights=None):
+    """
+    Score candidate posts in batch; every argument but `now` is an array with one entry per post.
+
+    score = recency × (1 + w_likes·log1p(likes) + w_affinity·log1p(affinity) + w_followers·log1p(followers)),
+    where recency halves every `half_life_hours` and `created_at`/`now` are Unix timestamps.
+    """
+    half_life_hours = settings.RANKED_FEED_HALF_LIFE_HOURS if half_life_hours is None else half_life_hours
+    weights = settings.RANKED_FEED_WEIGHTS if weights is None else weights
+
+    age = np.maximum(now - np.asarray(created_at, dtype=np.float64), 0.0)
+    recency = np.exp(age * (-math.log(2) / (half_life_hours * 3600)))
+
+    engagement = 1.0 + weights['likes'] * np.log1p(np.asarray(likes, dtype=np.float64))
+    engagement += weights['affinity'] * np.log1p(np.asarray(affinity, dtype=np.float64))
+    engagement += weights['followers'] * np.log1p(np.asarray(followers, dtype=np.float64))
+    return recency * engagement
+
+
+def rank_post_ids(post_ids, scores):
+    """Post ids ordered by score (highest first; ties keep the candidate order, newest first)."""
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    return np.asarray(post_ids, dtype=np.int64)[order].tolist()
+
+
+def compute_ranked_feed(user):
+    now = timezone.now()
+    followed = Follow.objects.filter(follower=user).values_list('followed', flat=True)
+    candidates = list(
+        Post.objects.filter(user__in=followed, created_at__gte=now - timedelta(days=settings.RANKED_FEED_WINDOW_DAYS))
+        .order_by('-created_at')
+        .values_list('id', 'user_id', 'created_at')[:settings.RANKED_FEED_CANDIDATES]
+    )
+    if not candidates:
+        return []
+
+    post_ids, author_ids, created_at = zip(*candidates)
+    authors = sorted(set(author_ids))
+
+    # Afinidade: quantos posts de cada autor o usuário já curtiu
+    affinity = dict(
+        Like.objects.filter(user=user, post__user__in=authors)
+        .values_list('post__user')
+        .annotate(total=Count('id'))
+    )
+    likes = Post.get_likes_counts(post_ids)
+    followers = Follow.get_followers_counts(authors)
+
+    scores = score_posts(
+        created_at=[value.timestamp() for value in created_at],
+        likes=[likes[post_id] for post_id in post_ids],
+        affinity=[affinity.get(author_id, 0) for author_id in author_ids],
+        followers=[followers[author_id] for author_id in author_ids],
+        now=now.timestamp(),
+    )
+    return rank_post_ids(post_ids, scores)
+
+
+def ranked_feed_ids(user):
+    """Ranked post ids for the user's feed, cached for RANKED_FEED_CACHE_SECONDS."""
+    return get_or_compute(
+        ranked_feed_cache_key(user.id),
+        lambda: compute_ranked_feed(user),
+        timeout=settings.RANKED_FEED_CACHE_SECONDS,
+    )
@@ -1,13 +1,22 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from .models import Post, Like, Follow
+from .models import Post, Like, Follow, ImageUpload
+from .fast_serialization import datetime_representation, output_timezone
+from .images import image_url, client_preferences, store_image, release_image
+from .uploads import claim_upload
 from users.serializers import UserSerializer
 
 
 class PostSerializer(serializers.ModelSerializer):
+    # Imagem já enviada por /api/uploads/ (alternativa ao upload multipart em `image`)
+    upload_id = serializers.UUIDField(write_only=True, required=False)
+
     class Meta:
         model = Post
-        fields = ['id', 'title', 'content', 'image', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'content', 'image', 'upload_id', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        extra_kwargs = {'image': {'required': False}}
 
     # Validação de campos obrigatórios
     def validate_title(self, value):
@@ -23,16 +32,52 @@ class PostSerializer(serializers.ModelSerializer):
     # Validação para a imagem (se for enviada)
     def validate_image(self, value):
         if value:
-            if value.size > 5 * 1024 * 1024:  # Limite de 5MB
+            if value.size > settings.IMAGE_UPLOAD_MAX_SIZE:  # Limite de 5MB
                 raise serializers.ValidationError("Image file size should not exceed 5MB.")
             if not value.content_type.startswith('image/'):
                 raise serializers.ValidationError("Uploaded file must be an image.")
         return value
 
+    def validate(self, attrs):
+        if attrs.get('image') and attrs.get('upload_id'):
+            raise serializers.ValidationError("Send either an image or an upload_id, not both.")
+        if self.instance is None and not attrs.get('image') and not attrs.get('upload_id'):
+            raise serializers.ValidationError({'image': "No file was submitted."})
+        return attrs
+
+    # A imagem é gravada pelo hash do conteúdo e compartilhada entre posts com o mesmo arquivo
+    def _store_image(self, validated_data, user):
+        upload_id = validated_data.pop('upload_id', None)
+        upload = validated_data.get('image')
+        if upload_id:
+            asset = claim_upload(upload_id, user)
+        elif upload:
+            asset = store_image(upload)
+        else:
+            return validated_data
+
+        validated_data['image'] = asset.path
+        validated_data['image_asset'] = asset
+        return validated_data
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            return super().create(self._store_image(validated_data, validated_data.get('user')))
+
+    def update(self, instance, validated_data):
+        previous_asset_id = instance.image_asset_id
+        with transaction.atomic():
+            validated_data = self._store_image(validated_data, instance.user)
+            instance = super().update(instance, validated_data)
+            if 'image_asset' in validated_data:
+                release_image(previous_asset_id)
+        return instance
+
 
 class PostListSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
     likes_count = serializers.IntegerField()
+    image = serializers.SerializerMethodField()
 
 
     class Meta:
@@ -40,6 +85,32 @@ class PostListSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'title', 'content', 'image', 'created_at', 'likes_count']
         read_only_fields = ['id', 'created_at', 'likes_count']
 
+    def get_image(self, obj):
+        # Variante redimensionada que cabe no cliente (ou o original enquanto não foi processada)
+        variants = obj.image_asset.variants if obj.image_asset_id else None
+        return image_url(obj.image.name, variants, self.context.get('request'))
+
+    # Modo rápido (FastListMixin): mesma saída, montada a partir de `.values()`
+    values_fields = ('id', 'user__username', 'title', 'content', 'image', 'image_asset__variants', 'created_at')
+
+    @classmethod
+    def fast_representation(cls, rows, context):
+        tz = output_timezone()
+        request = context.get('request')
+        preferences = client_preferences(request)
+        return [
+            {
+                'id': row['id'],
+                'user': row['user__username'],
+                'title': row['title'],
+                'content': row['content'],
+                'image': image_url(row['image'], row['image_asset__variants'], request, preferences),
+                'created_at': datetime_representation(row['created_at'], tz),
+                'likes_count': row['likes_count'],
+            }
+            for row in rows
+        ]
+
 
 class LikeSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -65,10 +136,45 @@ class FollowedListSerializer(serializers.ModelSerializer):
         model = Follow
         fields = ['id', 'followed_username', 'created_at']
 
+    values_fields = ('id', 'followed__username', 'created_at')
+
+    @classmethod
+    def fast_representation(cls, rows, context):
+        tz = output_timezone()
+        return [
+            {
+                'id': row['id'],
+                'followed_username': row['followed__username'],
+                'created_at': datetime_representation(row['created_at'], tz),
+            }
+            for row in rows
+        ]
+
 
 class FollowerListSerializer(serializers.ModelSerializer):
     follower_username = serializers.CharField(source='follower.username', read_only=True)
 
     class Meta:
         model = Follow
-        fields = ['id', 'follower_username', 'created_at']
\ No newline at end of file
+        fields = ['id', 'follower_username', 'created_at']
+
+    values_fields = ('id', 'follower__username', 'created_at')
+
+    @classmethod
+    def fast_representation(cls, rows, context):
+        tz = output_timezone()
+        return [
+            {
+                'id': row['id'],
+                'follower_username': row['follower__username'],
+                'created_at': datetime_representation(row['created_at'], tz),
+            }
+            for row in rows
+        ]
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImageUpload
+        fields = ['id', 'size', 'offset', 'content_type', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'offset', 'content_type', 'created_at', 'completed_at']
@@ -1,7 +1,69 @@
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from twitter.models import Follow
-from apps.twitter.tasks import cache_followers_count, cache_followed_count
+from twitter.models import (
+    Post, ArchivedPost, Like, Follow, post_likes_cache_key, followers_count_cache_key, followed_count_cache_key,
+)
+from twitter.images import release_image
+from twitter.suggestions import discard_suggestion
+from apps.twitter.tasks import cache_followers_count, cache_followed_count, process_post_image
+from setup.cache import set_cached
+from setup.local_cache import invalidate
+
+
+# Descarta as contagens do cache local de todos os processos quando um Follow muda
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_counts(sender, instance, **kwargs):
+    invalidate(followers_count_cache_key(instance.followed_id), followed_count_cache_key(instance.follower_id))
+
+
+# Quem acabou de ser seguido sai das sugestões até o próximo cálculo
+@receiver(post_save, sender=Follow)
+def discard_followed_suggestion(sender, instance, created, **kwargs):
+    if created:
+        discard_suggestion(instance.follower_id, instance.followed_id)
+
+
+# Post novo já começa com a contagem de likes em cache, para os likes serem somados com INCR
+@receiver(post_save, sender=Post)
+def seed_likes_count(sender, instance, created, **kwargs):
+    if created:
+        set_cached(post_likes_cache_key(instance.id), 0)
+
+
+# Gera as variantes da imagem quando um post é criado ou tem a imagem trocada
+@receiver(post_save, sender=Post)
+def process_image_on_save(sender, instance, update_fields=None, **kwargs):
+    if not instance.image:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if instance.image_asset_id:
+        asset = instance.image_asset
+        if asset.processed_at is not None and asset.path == instance.image.name:
+            return
+    transaction.on_commit(lambda: process_post_image.delay(instance.id))
+
+
+# Devolve a referência da imagem compartilhada; a última referência apaga o arquivo
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def release_image_on_delete(sender, instance, **kwargs):
+    release_image(instance.image_asset_id)
+
+
+# Atualiza a contagem de likes do post (INCR no Redis + cache local de todos os processos)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def refresh_post_likes_count(sender, instance, created=None, **kwargs):
+    # post_delete não tem `created`; salvar de novo um like existente não muda a contagem
+    if created is False:
+        return
+    # Só depois do commit: um rollback não pode deixar o INCR aplicado
+    post, delta = instance.post, 1 if created else -1
+    transaction.on_commit(lambda: post.adjust_likes_count(delta))
+
 
 # Atualiza cache de seguidores quando um novo Follow é criado
 @receiver(post_save, sender=Follow)
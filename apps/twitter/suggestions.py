@@ -0,0 +1,161 @@
+import itertools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+# Grafo de cada worker do pool, recebido uma vez no initializer
+_graph = None
+
+
+def follow_suggestions_cache_key(user_id):
+    return f'follow_suggestions_{user_id}'
+
+
+class FollowGraph:
+    """
+    Follow edges in CSR form over compact user indexes: the accounts followed by the user at
+    index `u` are `indices[indptr[u]:indptr[u + 1]]`.
+    """
+
+    def __init__(self, user_ids, followers, followed):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        followers = np.searchsorted(self.user_ids, followers)
+        followed = np.searchsorted(self.user_ids, followed)
+
+        size = len(self.user_ids)
+        order = np.argsort(followers, kind='stable')
+        self.indices = followed[order]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(followers, minlength=size), out=self.indptr[1:])
+        in_degree = np.bincount(followed, minlength=size)
+        # Desempate por popularidade, sempre menor que 1 para não superar um caminho a mais
+        self.popularity = in_degree / (in_degree.max(initial=0) + 1)
+
+    @classmethod
+    def load(cls, chunk_size=10000):
+        # Modelos importados aqui: os workers do pool (spawn) importam este módulo sem configurar o Django
+        from django.contrib.auth.models import User
+        from .models import Follow
+
+        user_ids = np.fromiter(User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size), dtype=np.int64)
+        edges = np.fromiter(
+            itertools.chain.from_iterable(
+                Follow.objects.values_list('follower_id', 'followed_id').iterator(chunk_size)
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        return cls(user_ids, edges[:, 0], edges[:, 1])
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def suggest(self, user, top_k):
+        """
+        Friends-of-friends of the user at index `user`: (candidate indexes, scores), best first.
+
+        The score is the number of followed accounts that follow the candidate; ties go to the
+        candidate with more followers.
+        """
+        direct = self.indices[self.indptr[user]:self.indptr[user + 1]]
+        starts = self.indptr[direct]
+        lengths = self.indptr[direct + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Posições de todos os vizinhos de segundo grau, sem laço em Python
+        positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        candidates, paths = np.unique(self.indices[positions], return_counts=True)
+
+        keep = ~np.isin(candidates, direct) & (candidates != user)
+        candidates, paths = candidates[keep], paths[keep]
+        scores = paths + self.popularity[candidates]
+
+        if len(candidates) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            candidates, scores = candidates[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        return candidates[order], scores[order]
+
+
+def _init_worker(graph):
+    global _graph
+    _graph = graph
+
+
+def _suggest_range(start, stop, top_k):
+    return [(user, *_graph.suggest(user, top_k)) for user in range(start, stop)]
+
+
+def compute_suggestions(graph, top_k, workers=1, chunk_size=2000):
+    """Yield (user index, candidate indexes, scores) for every user, in a process pool when `workers > 1`."""
+    ranges = [(start, min(start + chunk_size, len(graph)), top_k) for start in range(0, len(graph), chunk_size)]
+
+    # Processos daemon (workers prefork do Celery) não podem criar filhos: calcula no próprio processo
+    if workers > 1 and multiprocessing.current_process().daemon:
+        logger.warning('Running inside a daemonic process, computing follow suggestions without a process pool')
+        workers = 1
+
+    if workers <= 1 or len(ranges) <= 1:
+        for user in range(len(graph)):
+            yield (user, *graph.suggest(user, top_k))
+        return
+
+    # spawn em vez de fork: o processo pai pode ter threads rodando (o assinante do cache local,
+    # o exportador de spans) e conexões abertas, que um fork copiaria no meio do caminho
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker, initargs=(graph,),
+    ) as pool:
+        for chunk in pool.map(_suggest_range, *zip(*ranges)):
+            yield from chunk
+
+
+def store_suggestions(top_k=None, workers=None, timeout=None, batch_size=1000):
+    """
+    Compute the follow suggestions of every user and store them ready to serve (one cache read).
+
+    Returns the number of users processed.
+    """
+    top_k = settings.FOLLOW_SUGGESTIONS_TOP_K if top_k is None else top_k
+    workers = settings.FOLLOW_SUGGESTIONS_WORKERS if workers is None else workers
+    timeout = settings.FOLLOW_SUGGESTIONS_TIMEOUT if timeout is None else timeout
+
+    from django.contrib.auth.models import User
+
+    graph = FollowGraph.load()
+    usernames = dict(User.objects.values_list('id', 'username').iterator(10000))
+
+    batch = {}
+    processed = 0
+    for user, candidates, scores in compute_suggestions(graph, top_k, workers):
+        batch[follow_suggestions_cache_key(int(graph.user_ids[user]))] = [
+            {'id': int(user_id), 'username': usernames.get(int(user_id)), 'mutual_count': int(score)}
+            for user_id, score in zip(graph.user_ids[candidates], scores)
+        ]
+        processed += 1
+        if len(batch) >= batch_size:
+            cache.set_many(batch, timeout=timeout)
+            batch = {}
+
+    if batch:
+        cache.set_many(batch, timeout=timeout)
+    return processed
+
+
+def get_suggestions(user_id):
+    return cache.get(follow_suggestions_cache_key(user_id)) or []
+
+
+def discard_suggestion(user_id, followed_id):
+    """Drop an account the user has just followed from their stored suggestions."""
+    key = follow_suggestions_cache_key(user_id)
+    suggestions = cache.get(key)
+    if suggestions and any(item['id'] == followed_id for item in suggestions):
+        cache.set(key, [item for item in suggestions if item['id'] != followed_id], settings.FOLLOW_SUGGESTIONS_TIMEOUT)
@@ -1,11 +1,29 @@
+import logging
+from datetime import timedelta
+from itertools import islice
 from celery import shared_task
-from django.db.models import Count
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
 from django.core.mail import send_mail
-from django.core.cache import cache
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from twitter.models import Post, Follow
+from twitter.images import generate_variants
+from twitter.uploads import discard_upload
+from twitter import trending
+from twitter.suggestions import store_suggestions
+from twitter.timelines import invalidate_author_timeline
+from twitter.models import (
+    Post, Like, Follow, ArchivedPost, ImageAsset, ImageUpload,
+    post_likes_cache_key, followers_count_cache_key, followed_count_cache_key,
+)
+from setup.cache import set_cached, add_many_cached
+from setup.local_cache import invalidate
+from setup.logs import log_event
+
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
@@ -24,58 +42,45 @@ def send_follower_notification(followed_user_id, user_id):
 
     except ObjectDoesNotExist as e:
         # Lide com o caso em que um dos usuários não é encontrado
-        print(f"Erro ao encontrar usuário: {e}")
-    except Exception as e:
+        log_event(logger, 'follower_notification_user_not_found', logging.WARNING,
+                  followed_user_id=followed_user_id, user_id=user_id, error=e)
+    except Exception:
         # Lide com qualquer outra exceção
-        print(f"Erro inesperado: {e}")
+        logger.exception('Unexpected error sending the follower notification to user %s', followed_user_id)
 
 
-@shared_task
-def update_post_likes_cache():
-    """Update the cache with the number of likes for each post of all followed users for all users."""
-    # Obtém todos os usuários
-    users = User.objects.all()
-
-    # Para armazenar os likes dos posts
-    posts_likes = []
+def warm_likes_counts(posts):
+    """
+    Cache the like count of the posts in `posts` that have none cached and return how many were
+    written. The aggregate is streamed from the database and written in CACHE_WARM_CHUNK_SIZE
+    blocks, each one a single pipelined SET NX instead of a round-trip per post.
+    """
+    chunk_size = settings.CACHE_WARM_CHUNK_SIZE
+    rows = posts.order_by().values_list('id').annotate(likes_count=Count('likes')).iterator(chunk_size)
 
-    # Obtém todos os usuários que seguem outros usuários
-    followed_users_map = {user.id: Follow.objects.filter(follower=user).values_list('followed', flat=True) for user in users}
+    # Só preenche as contagens que faltam: as que estão em cache são mantidas pelo INCR de cada like,
+    # e uma foto do agregado (lida antes de likes ainda não somados) as deixaria para trás
+    written = 0
+    while chunk := list(islice(rows, chunk_size)):
+        written += add_many_cached({post_likes_cache_key(post_id): likes_count for post_id, likes_count in chunk})
+    return written
 
-    # Filtra todos os posts dos usuários seguidos
-    for user, followed_users in followed_users_map.items():
-        if followed_users:
-            followed_posts = Post.objects.filter(user__in=followed_users, deleted_post=False).annotate(
-                like_count=Count('likes')  # Alterado de 'like_set' para 'likes'
-            ).values('id', 'like_count')
-            posts_likes.extend(followed_posts)
-        print(f"Posts seguidos por {user}: {len(followed_posts)}", flush=True)  # Log de depuração
 
-    # Atualiza o cache com os likes dos posts seguidos
-    for post in posts_likes:
-        cache_key = f'post_{post["id"]}_likes'
-        cache.set(cache_key, post['like_count'], timeout=60 * 15)  # Cache expira em 15 minutos
-        print(f"Atualizando cache para post {post['id']}: {post['like_count']} likes", flush=True)  # Log de depuração
+@shared_task
+def update_post_likes_cache():
+    """Cache the number of likes of every post by a user that someone follows, where it is missing."""
+    # Lê do primário: uma réplica atrasada gravaria contagens sem os likes mais recentes
+    # Um post de autor com vários seguidores é contado e gravado uma vez só
+    written = warm_likes_counts(Post.objects.filter(user__in=Follow.objects.values('followed')))
+    log_event(logger, 'likes_sweep_finished', posts=written)
 
 
 @shared_task
 def update_likes_for_user(user_id):
-    # Recupera os usuários seguidos pelo usuário específico
-    followed_users = Follow.objects.filter(follower_id=user_id).values_list('followed', flat=True)
-
-    # Recupera os posts dos usuários seguidos e anota a contagem de likes
-    posts = Post.objects.filter(user__in=followed_users, deleted_post=False).annotate(
-        likes_count=Count('likes')  # 'likes' deve ser o related_name definido no modelo Like
-    )
-
-    for post in posts:
-        cache_key = f'post_likes_{post.id}'
-        likes_count = post.likes_count  # Acessa diretamente a contagem de likes
-
-        # Armazena ou atualiza a contagem de likes no cache
-        cache.set(cache_key, likes_count, timeout=60 * 15)  # Cache para 15 minutos
-        print(f'Salvando likes no cache para o post {post.id}: {likes_count}', flush=True)
-    print(f'Likes cache atualizado para o usuário {user_id}', flush=True)
+    """Cache the number of likes of the posts by the users `user_id` follows, where it is missing."""
+    followed = Follow.objects.filter(follower_id=user_id).values('followed')
+    written = warm_likes_counts(Post.objects.filter(user__in=followed))
+    log_event(logger, 'user_likes_updated', sample_rate=settings.LOG_SAMPLE_RATE, user_id=user_id, posts=written)
 
 
 @shared_task
@@ -83,13 +88,136 @@ def cache_followers_count(user_id):
     """Tarefa para atualizar o cache de seguidores."""
     user = User.objects.get(id=user_id)
     followers_count = Follow.objects.filter(followed=user).count()
-    cache.set(f'user_{user_id}_followers_count', followers_count, timeout=60 * 15)  # Cache por 15 minutos
-    print(f'Cache atualizado para o usuário {user_id}: {followers_count} seguidores', flush=True)
+    set_cached(followers_count_cache_key(user_id), followers_count)  # Cache por ~15 minutos (com jitter)
+    invalidate(followers_count_cache_key(user_id))
+    log_event(logger, 'followers_count_cached', sample_rate=settings.LOG_SAMPLE_RATE, user_id=user_id, followers=followers_count)
 
 @shared_task
 def cache_followed_count(user_id):
     """Tarefa para atualizar o cache de seguidos."""
     user = User.objects.get(id=user_id)
     followed_count = Follow.objects.filter(follower=user).count()
-    cache.set(f'user_{user_id}_followed_count', followed_count, timeout=60 * 15)  # Cache por 15 minutos
-    print(f'Cache atualizado para o usuário {user_id}: {followed_count} seguidos', flush=True)
\ No newline at end of file
+    set_cached(followed_count_cache_key(user_id), followed_count)  # Cache por ~15 minutos (com jitter)
+    invalidate(followed_count_cache_key(user_id))
+    log_event(logger, 'followed_count_cached', sample_rate=settings.LOG_SAMPLE_RATE, user_id=user_id, followed=followed_count)
+
+
+@shared_task
+def archive_deleted_posts(days=None, batch_size=None):
+    """Move posts deleted more than `days` ago to the archive table, in batches, removing their likes."""
+    days = days if days is not None else settings.POST_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.POST_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    archived = 0
+
+    while True:
+        with transaction.atomic():
+            # skip_locked permite rodar mais de um worker sem disputar as mesmas linhas
+            post_ids = list(
+                Post.all_objects.select_for_update(skip_locked=True)
+                .filter(deleted_post=True, deleted_at__lt=cutoff)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not post_ids:
+                break
+
+            likes_count = dict(
+                Like.objects.filter(post_id__in=post_ids)
+                .values_list('post_id')
+                .annotate(total=Count('id'))
+            )
+            ArchivedPost.objects.bulk_create([
+                ArchivedPost(
+                    original_id=post.id,
+                    user_id=post.user_id,
+                    title=post.title,
+                    content=post.content,
+                    image=post.image.name or '',
+                    image_asset_id=post.image_asset_id,
+                    likes_count=likes_count.get(post.id, 0),
+                    created_at=post.created_at,
+                    updated_at=post.updated_at,
+                    deleted_at=post.deleted_at,
+                )
+                for post in Post.all_objects.filter(id__in=post_ids)
+            ])
+
+            # O post arquivado fica com a sua própria referência da imagem antes de o post liberar a dele
+            for asset_id, references in (
+                Post.all_objects.filter(id__in=post_ids, image_asset__isnull=False)
+                .values_list('image_asset')
+                .annotate(total=Count('id'))
+            ):
+                ImageAsset.objects.filter(id=asset_id).update(refcount=F('refcount') + references)
+
+            # Os likes protegem o post (PROTECT), então saem primeiro; o DELETE direto evita
+            # carregar cada like só para disparar os signals de contagem de um post arquivado
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {connection.ops.quote_name(Like._meta.db_table)} '
+                    f'WHERE {connection.ops.quote_name(Like._meta.get_field("post").column)} '
+                    f'IN ({", ".join(["%s"] * len(post_ids))})',
+                    post_ids,
+                )
+            Post.all_objects.filter(id__in=post_ids).delete()
+
+        archived += len(post_ids)
+
+    return archived
+
+
+@shared_task
+def process_post_image(post_id):
+    """Generate the resized/WebP variants of a post image (once per file) and link them to the post."""
+    try:
+        post = Post.all_objects.get(id=post_id)
+    except Post.DoesNotExist:
+        return
+    if not post.image:
+        return
+
+    path = post.image.name
+    asset, _ = ImageAsset.objects.get_or_create(path=path)
+    if asset.processed_at is None:
+        asset.width, asset.height, asset.variants = generate_variants(path)
+        asset.processed_at = timezone.now()
+        asset.save()
+
+    # Só associa se a imagem do post não mudou enquanto a tarefa rodava
+    if Post.all_objects.filter(id=post_id, image=path).update(image_asset=asset):
+        # A timeline em cache guarda as variantes de cada post
+        invalidate_author_timeline(post.user_id)
+
+
+@shared_task
+def expire_image_uploads(hours=None):
+    """Delete uploads left unfinished or never used by a post, with their temporary files and image references."""
+    hours = settings.IMAGE_UPLOAD_EXPIRE_HOURS if hours is None else hours
+    cutoff = timezone.now() - timedelta(hours=hours)
+
+    expired = 0
+    for upload in ImageUpload.objects.filter(updated_at__lt=cutoff).iterator():
+        discard_upload(upload)
+        expired += 1
+    return expired
+
+
+@shared_task
+def rescale_trending_posts():
+    """Decay the trending scores to the current time, trim the set to the top K and drop deleted posts."""
+    post_ids = trending.post_ids()
+    deleted = list(Post.all_objects.filter(id__in=post_ids, deleted_post=True).values_list('id', flat=True))
+    trending.discard_posts(*deleted)
+    return trending.rescale()
+
+
+@shared_task
+def compute_follow_suggestions(top_k=None, workers=None):
+    """
+    Recompute the "who to follow" suggestions of every user from the follow graph.
+
+    The process pool only kicks in on a worker started with `-P solo` (prefork children are daemonic);
+    `python manage.py compute_follow_suggestions` runs it from cron as well.
+    """
+    return store_suggestions(top_k=top_k, workers=workers)
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from twitter.models import Post, Like, ArchivedPost
+from twitter.tasks import archive_deleted_posts
+
+
+class ArchiveDeletedPostsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.liker = User.objects.create_user(username='liker', password='password')
+
+    def create_deleted_post(self, days_ago):
+        post = Post.objects.create(user=self.user, title='Old Post', content='Old content')
+        post.soft_delete()
+        Post.all_objects.filter(pk=post.pk).update(deleted_at=timezone.now() - timedelta(days=days_ago))
+        return post
+
+    def test_archives_old_deleted_posts(self):
+        """Test that posts deleted before the cutoff move to the archive with their like count."""
+        post = self.create_deleted_post(days_ago=40)
+        Like.objects.create(user=self.liker, post=post)
+
+        archived = archive_deleted_posts(days=30)
+
+        self.assertEqual(archived, 1)
+        self.assertFalse(Post.all_objects.filter(pk=post.pk).exists())
+        self.assertFalse(Like.objects.filter(post_id=post.pk).exists())
+        archived_post = ArchivedPost.objects.get(original_id=post.pk)
+        self.assertEqual(archived_post.likes_count, 1)
+        self.assertEqual(archived_post.title, 'Old Post')
+
+    def test_keeps_recent_and_active_posts(self):
+        """Test that recently deleted and active posts stay in the live table."""
+        recent = self.create_deleted_post(days_ago=1)
+        active = Post.objects.create(user=self.user, title='Active', content='Active content')
+
+        self.assertEqual(archive_deleted_posts(days=30), 0)
+        self.assertTrue(Post.all_objects.filter(pk=recent.pk).exists())
+        self.assertTrue(Post.objects.filter(pk=active.pk).exists())
+
+    def test_archives_in_batches(self):
+        """Test that every eligible post is archived when they exceed one batch."""
+        for _ in range(5):
+            self.create_deleted_post(days_ago=40)
+
+        self.assertEqual(archive_deleted_posts(days=30, batch_size=2), 5)
+        self.assertEqual(ArchivedPost.objects.count(), 5)
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from twitter.management.commands.bench import ENDPOINTS
+
+
+class BenchCommandTest(TestCase):
+    def run_bench(self, **options):
+        stdout = StringIO()
+        call_command(
+            'bench', scales='30', requests=6, warmup=1, concurrency=1, sample_users=10, workers=1,
+            no_test_database=True, stdout=stdout, stderr=StringIO(), **options,
+        )
+        return stdout.getvalue()
+
+    def test_report(self):
+        """Test that every endpoint is measured without errors and reported as JSON."""
+        report = json.loads(self.run_bench())
+
+        run, = report['runs']
+        self.assertEqual(run['scale'], 30)
+        self.assertEqual(run['dataset']['users'], 30)
+        self.assertEqual(set(run['endpoints']), set(ENDPOINTS))
+        for name, stats in run['endpoints'].items():
+            self.assertEqual(stats['requests'], 6, name)
+            self.assertEqual(stats['errors'], 0, name)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'], name)
+            self.assertGreater(stats['queries_per_request'], 0, name)
+
+    def test_baseline_regression(self):
+        """Test that a p95 much worse than the baseline fails the run."""
+        baseline = {'runs': [{'scale': 30, 'endpoints': {'profile': {'p95_ms': 1e-6}}}]}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+            json.dump(baseline, file)
+        self.addCleanup(os.remove, file.name)
+
+        with self.assertRaises(CommandError):
+            self.run_bench(endpoints='profile', baseline=file.name)
@@ -0,0 +1,112 @@
+import time
+from unittest.mock import patch
+from django.test import TestCase
+from django.core.cache import cache
+from setup.cache import get_or_compute, get_many_or_compute, set_cached, jittered, acquire_lock, release_locks
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_computes_once_and_caches(self):
+        """Test that the value is computed on a miss and read from the cache afterwards."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 42
+
+        self.assertEqual(get_or_compute('answer', compute), 42)
+        self.assertEqual(get_or_compute('answer', compute), 42)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get('answer'), 42)
+
+    def test_force_recomputes(self):
+        """Test that `force=True` always recomputes and overwrites the cache."""
+        set_cached('answer', 1)
+        self.assertEqual(get_or_compute('answer', lambda: 2, force=True), 2)
+        self.assertEqual(cache.get('answer'), 2)
+
+    def test_serves_stale_value_while_locked(self):
+        """Test that an expired value is served while another process holds the recompute lock."""
+        cache.set_many({'answer': 1, 'answer:meta': (time.time() - 1, 0.0)})
+        cache.add('answer:lock', 1)
+
+        self.assertEqual(get_or_compute('answer', lambda: 2), 1)
+
+    def test_recomputes_expired_value(self):
+        """Test that the lock holder recomputes an expired value and releases the lock."""
+        cache.set_many({'answer': 1, 'answer:meta': (time.time() - 1, 0.0)})
+
+        self.assertEqual(get_or_compute('answer', lambda: 2), 2)
+        self.assertIsNone(cache.get('answer:lock'))
+
+    @patch('setup.cache.time.sleep')
+    def test_waits_for_lock_holder_on_cold_miss(self, mock_sleep):
+        """Test that a cold miss waits for the value computed by the lock holder."""
+        cache.add('answer:lock', 1)
+        mock_sleep.side_effect = lambda seconds: cache.set('answer', 3)
+
+        self.assertEqual(get_or_compute('answer', lambda: 4), 3)
+
+    def test_release_keeps_lock_taken_by_another_holder(self):
+        """Test that releasing an expired lock does not delete the lock another caller took afterwards."""
+        token = acquire_lock('answer:lock', 10)
+        self.assertIsNone(acquire_lock('answer:lock', 10))
+        cache.set('answer:lock', token + 1)  # O lock expirou e outro processo o pegou
+
+        release_locks({'answer:lock': token})
+        self.assertEqual(cache.get('answer:lock'), token + 1)
+        release_locks({'answer:lock': token + 1})
+        self.assertIsNone(cache.get('answer:lock'))
+
+    def test_jittered_timeout(self):
+        """Test that jittered TTLs stay within ±10% of the base timeout."""
+        for _ in range(100):
+            self.assertTrue(810 <= jittered(900) <= 990)
+
+
+class GetManyOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_missing_ids_are_computed(self):
+        """Test that cached ids are read from the cache and the rest are computed in one call."""
+        set_cached('item_1', 10)
+        calls = []
+
+        def compute_missing(ids):
+            calls.append(ids)
+            return {2: 20}
+
+        result = get_many_or_compute({1: 'item_1', 2: 'item_2', 3: 'item_3'}, compute_missing)
+
+        self.assertEqual(result, {1: 10, 2: 20, 3: 0})
+        self.assertEqual(calls, [[2, 3]])
+        self.assertEqual(cache.get('item_3'), 0)
+
+    def test_cold_keys_are_locked(self):
+        """Test that cold keys are computed under the lock, which is released afterwards."""
+        def compute_missing(ids):
+            self.assertIsNotNone(cache.get('item_1:lock'))
+            return {1: 10}
+
+        self.assertEqual(get_many_or_compute({1: 'item_1'}, compute_missing), {1: 10})
+        self.assertIsNone(cache.get('item_1:lock'))
+
+    @patch('setup.cache.time.sleep')
+    def test_cold_keys_wait_for_lock_holder(self, mock_sleep):
+        """Test that a cold key locked by another caller waits for its value instead of computing it."""
+        cache.add('item_2:lock', 1)
+        mock_sleep.side_effect = lambda seconds: cache.set('item_2', 20)
+        calls = []
+
+        def compute_missing(ids):
+            calls.append(ids)
+            return {item_id: item_id * 10 for item_id in ids}
+
+        result = get_many_or_compute({1: 'item_1', 2: 'item_2'}, compute_missing)
+
+        self.assertEqual(result, {1: 10, 2: 20})
+        self.assertEqual(calls, [[1]])
@@ -0,0 +1,126 @@
+import datetime
+import pickle
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.utils.safestring import mark_safe
+from setup.cache_backends import CompactSerializer, JSON, PICKLE, ZLIB
+from twitter.models import Post, Like, Follow, post_likes_cache_key
+from twitter.tasks import update_post_likes_cache
+
+
+class CompactSerializerTest(TestCase):
+    def setUp(self):
+        self.serializer = CompactSerializer({'COMPRESSION': 'zlib', 'COMPRESS_MIN_BYTES': 1024})
+
+    def test_round_trip_keeps_types(self):
+        """Test that JSON-native values use orjson and the others fall back to pickle with their types intact."""
+        cases = [
+            ([1.5, 2.5], JSON),
+            ({'id': 1, 'title': 'Post', 'tags': [None, True]}, JSON),
+            ((1700000000.0, 0.1), PICKLE),
+            ([1.0, float('inf')], PICKLE),
+            ({'ids': [1, 2], 'meta': {'at': datetime.date(2024, 11, 1)}}, PICKLE),
+            ({1: 'non-string key'}, PICKLE),
+            (datetime.datetime(2024, 11, 1, 12, 0), PICKLE),
+            (mark_safe('<b>safe</b>'), PICKLE),
+            (User(id=1, username='cached'), PICKLE),
+        ]
+        for value, kind in cases:
+            data = self.serializer.dumps(value)
+            self.assertEqual(data[0], kind)
+            loaded = self.serializer.loads(data)
+            self.assertIs(type(loaded), type(value))
+            if isinstance(value, User):
+                self.assertEqual(loaded.username, value.username)
+            else:
+                self.assertEqual(loaded, value)
+
+    def test_compresses_large_values(self):
+        """Test that values above COMPRESS_MIN_BYTES are compressed and still read back uncompressed ones."""
+        page = [{'id': i, 'content': 'Lorem ipsum ' * 20} for i in range(50)]
+        data = self.serializer.dumps(page)
+        self.assertEqual(data[0], JSON | ZLIB)
+        self.assertLess(len(data), len(pickle.dumps(page)) / 2)
+        self.assertEqual(self.serializer.loads(data), page)
+
+        uncompressed = CompactSerializer({'COMPRESSION': 'none'}).dumps(page)
+        self.assertEqual(uncompressed[0], JSON)
+        self.assertEqual(self.serializer.loads(uncompressed), page)
+
+    def test_reads_values_written_by_the_pickle_serializer(self):
+        """Test that values left by the default pickle serializer stay readable."""
+        self.assertEqual(self.serializer.loads(pickle.dumps({'legacy': [1, 2]})), {'legacy': [1, 2]})
+
+    def test_unavailable_compression(self):
+        """Test that an unknown or uninstalled compression is a configuration error."""
+        with self.assertRaises(ImproperlyConfigured):
+            CompactSerializer({'COMPRESSION': 'brotli'})
+
+    def test_benchmark_command(self):
+        """Test that the benchmark compares the serializers (without Redis, only size and (de)serialization)."""
+        output = StringIO()
+        call_command('bench_cache', rows=10, repeat=1, stdout=output)
+        self.assertIn('compact+zlib', output.getvalue())
+        self.assertIn('página do feed', output.getvalue())
+
+
+class LikesCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='testuser')
+        self.post = Post.objects.create(user=user, title='Post', content='Content')
+        self.liker = User.objects.create(username='liker')
+
+    def test_likes_are_counted_with_incr(self):
+        """Test that liking and unliking adjust the cached count in place once it is cached."""
+        self.assertEqual(Post.get_likes_counts([self.post.id]), {self.post.id: 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            like = Like.objects.create(user=self.liker, post=self.post)
+        self.assertEqual(cache.get(post_likes_cache_key(self.post.id)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            like.save()
+        self.assertEqual(cache.get(post_likes_cache_key(self.post.id)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            like.delete()
+        self.assertEqual(cache.get(post_likes_cache_key(self.post.id)), 0)
+
+    def test_rolled_back_like_is_not_counted(self):
+        """Test that the cached count only changes when the like is committed."""
+        Post.get_likes_counts([self.post.id])
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    Like.objects.create(user=self.liker, post=self.post)
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(cache.get(post_likes_cache_key(self.post.id)), 0)
+
+    def test_warmer_keeps_counts_updated_in_place(self):
+        """Test that the warmer only fills missing counts and never replaces one kept by INCR."""
+        Follow.objects.create(follower=self.liker, followed=self.post.user)
+        other = Post.objects.create(user=self.post.user, title='Other', content='Content')
+        cache.delete(post_likes_cache_key(other.id))
+        # Um like já somado no cache que a leitura do agregado ainda não vê
+        cache.incr(post_likes_cache_key(self.post.id))
+
+        update_post_likes_cache.apply()
+
+        self.assertEqual(cache.get(post_likes_cache_key(self.post.id)), 1)
+        self.assertEqual(cache.get(post_likes_cache_key(other.id)), 0)
+
+    def test_recounts_when_not_cached(self):
+        """Test that a like on a post whose count is not cached recounts it from the database."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=self.liker, post=self.post)
+        cache.delete(post_likes_cache_key(self.post.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=User.objects.create(username='other'), post=self.post)
+        self.assertEqual(cache.get(post_likes_cache_key(self.post.id)), 2)
@@ -0,0 +1,30 @@
+import json
+import sys
+from io import StringIO
+from unittest import mock
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase
+
+from setup import settings as settings_module
+
+
+class PoolStatsCommandTest(TestCase):
+    def test_pool_stats_output(self):
+        """Test that `pool_stats` reports the database, cache and Celery pools as JSON."""
+        out = StringIO()
+        call_command('pool_stats', stdout=out)
+        stats = json.loads(out.getvalue())
+
+        self.assertIn('default', stats['databases'])
+        self.assertIn('conn_max_age', stats['databases']['default'])
+        self.assertIn('default', stats['redis'])
+        self.assertIn('broker_pool_limit', stats['celery'])
+
+
+class ConnectionModeSettingsTest(TestCase):
+    def test_pool_mode_requires_psycopg3(self):
+        """Test that the pool mode raises ImproperlyConfigured when psycopg 3 is not installed."""
+        with mock.patch.dict(sys.modules, {'psycopg': None, 'psycopg_pool': None}):
+            with self.assertRaises(ImproperlyConfigured):
+                settings_module.check_psycopg_pool()
@@ -0,0 +1,79 @@
+from django.test import TestCase, RequestFactory, override_settings
+from django.http import HttpResponse
+from twitter.models import Post
+from setup.db_routers import ReplicaRouter, use_replica, pin_primary, reset_state
+from setup.middleware import ReplicaPinningMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        reset_state()
+
+    def tearDown(self):
+        reset_state()
+
+    def test_reads_go_to_primary_by_default(self):
+        """Test that reads outside a replica block use the primary."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_reads_go_to_replica_inside_block(self):
+        """Test that reads inside `use_replica` go to one of the replicas."""
+        with use_replica():
+            self.assertIn(self.router.db_for_read(Post), ['replica_1', 'replica_2'])
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_pinned_reads_stay_on_primary(self):
+        """Test that a pinned primary wins over the replica block."""
+        with use_replica(), pin_primary():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_write_pins_following_reads(self):
+        """Test that reads after a write in the same request use the primary."""
+        with use_replica():
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        """Test that reads fall back to the primary when there are no replicas."""
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_migrations_only_on_primary(self):
+        """Test that migrations are never applied to the replicas."""
+        self.assertTrue(self.router.allow_migrate('default', 'twitter'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'twitter'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaPinningMiddlewareTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def test_write_sets_pin_cookie(self):
+        """Test that a request that writes marks the client to read from the primary."""
+        def view(request):
+            self.router.db_for_write(Post)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(self.factory.post('/api/posts/like/'))
+        self.assertIn('pin_primary', response.cookies)
+
+    def test_read_does_not_set_pin_cookie(self):
+        """Test that a read-only request does not pin the client."""
+        response = ReplicaPinningMiddleware(lambda request: HttpResponse())(self.factory.get('/api/posts/feed/'))
+        self.assertNotIn('pin_primary', response.cookies)
+
+    def test_pin_cookie_keeps_reads_on_primary(self):
+        """Test that a pinned client reads from the primary even inside a replica block."""
+        def view(request):
+            with use_replica():
+                return HttpResponse(self.router.db_for_read(Post))
+
+        request = self.factory.get('/api/posts/feed/')
+        request.COOKIES['pin_primary'] = '1'
+        response = ReplicaPinningMiddleware(view)(request)
+        self.assertEqual(response.content, b'default')
@@ -0,0 +1,79 @@
+from django.test import TestCase, RequestFactory
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from twitter.models import Post, Like, Follow
+from twitter.serializers import PostListSerializer, FollowerListSerializer, FollowedListSerializer
+from users.serializers import UserSerializer
+from setup.local_cache import local_cache
+from setup.renderers import ORJSONRenderer
+
+
+class FastRepresentationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.request = RequestFactory().get('/api/posts/feed/')
+        self.user = User.objects.create_user(username='testuser', email='testuser@example.com', password='password')
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        Follow.objects.create(follower=self.user, followed=self.author)
+        Follow.objects.create(follower=self.author, followed=self.user)
+
+        self.post = Post.objects.create(user=self.author, title='Título', content='Conteúdo', image='core/static/posts/img/default.png')
+        Post.objects.create(user=self.author, title='Sem imagem', content='Conteúdo')
+        Like.objects.create(user=self.user, post=self.post)
+
+    def test_post_list_serializer(self):
+        """Test that the fast path of PostListSerializer matches the ModelSerializer output."""
+        posts = list(Post.objects.order_by('id'))
+        for post in posts:
+            post.likes_count = post.get_likes_count()
+        rows = list(Post.objects.order_by('id').values(*PostListSerializer.values_fields))
+        for row in rows:
+            row['likes_count'] = Like.objects.filter(post_id=row['id']).count()
+        context = {'request': self.request}
+
+        self.assertEqual(
+            PostListSerializer.fast_representation(rows, context),
+            PostListSerializer(posts, many=True, context=context).data,
+        )
+
+    def test_follow_list_serializers(self):
+        """Test that the fast paths of the follower/followed serializers match the ModelSerializer output."""
+        for serializer_class in (FollowerListSerializer, FollowedListSerializer):
+            queryset = Follow.objects.order_by('id')
+            expected = serializer_class(queryset, many=True).data
+            rows = list(queryset.values(*serializer_class.values_fields))
+            self.assertEqual(serializer_class.fast_representation(rows, {}), expected)
+
+    def test_user_serializer(self):
+        """Test that the fast path of UserSerializer matches the ModelSerializer output."""
+        queryset = User.objects.order_by('id')
+        expected = UserSerializer(queryset, many=True).data
+        rows = list(queryset.values(*UserSerializer.values_fields))
+        self.assertEqual(UserSerializer.fast_representation(rows, {}), expected)
+
+    def test_feed_endpoint_matches_serializer(self):
+        """Test that the fast feed response is the same the ModelSerializer would render."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with self.settings(FAST_LIST_SERIALIZATION=True):
+            fast = client.get('/api/posts/feed/', HTTP_ACCEPT='application/json')
+        with self.settings(FAST_LIST_SERIALIZATION=False):
+            slow = client.get('/api/posts/feed/', HTTP_ACCEPT='application/json')
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+
+class ORJSONRendererTest(TestCase):
+    def test_matches_json_renderer(self):
+        """Test that the orjson renderer produces the same bytes as the stdlib renderer."""
+        data = {'id': 1, 'title': 'Olá, mundo', 'tags': ['a', 'b'], 'separator': ' ', 'empty': None}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_stdlib(self):
+        """Test that indented output is still supported."""
+        rendered = ORJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
@@ -0,0 +1,168 @@
+import hashlib
+import io
+import shutil
+import tempfile
+from PIL import Image
+from django.conf import settings
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from twitter.models import Post, ImageAsset
+from twitter.images import blob_path, requested_width
+from twitter.serializers import PostSerializer, PostListSerializer
+from twitter.tasks import process_post_image
+
+
+def make_jpeg(width, height):
+    image = Image.new('RGB', (width, height), color='red')
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera Maker'  # Make
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', exif=exif)
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ProcessPostImageTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(user=self.user, title='Photo', content='Content', image=make_jpeg(1200, 800))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_generates_variants(self):
+        """Test that resized JPEG and WebP variants are generated and the dimensions recorded."""
+        process_post_image(self.post.id)
+
+        self.post.refresh_from_db()
+        asset = self.post.image_asset
+        self.assertEqual((asset.width, asset.height), (1200, 800))
+        self.assertEqual([variant['width'] for variant in asset.variants], [320, 640, 1080, 1200])
+        self.assertEqual(asset.variants[0]['height'], 213)
+
+        for variant in asset.variants:
+            self.assertTrue(default_storage.exists(variant['fallback']))
+            with default_storage.open(variant['webp']) as webp:
+                self.assertEqual(Image.open(webp).format, 'WEBP')
+
+    def test_strips_exif(self):
+        """Test that the variants carry no EXIF metadata."""
+        process_post_image(self.post.id)
+
+        asset = ImageAsset.objects.get(path=self.post.image.name)
+        with default_storage.open(asset.variants[-1]['fallback']) as variant:
+            self.assertEqual(len(Image.open(variant).getexif()), 0)
+
+    def test_same_file_processed_once(self):
+        """Test that a file already processed is not processed again."""
+        process_post_image(self.post.id)
+        processed_at = ImageAsset.objects.get().processed_at
+
+        process_post_image(self.post.id)
+        self.assertEqual(ImageAsset.objects.get().processed_at, processed_at)
+
+    def test_serializer_picks_variant_for_client(self):
+        """Test that the feed returns the smallest variant that fits the requested width and format."""
+        process_post_image(self.post.id)
+        post = Post.objects.select_related('image_asset').get(pk=self.post.pk)
+        post.likes_count = 0
+        factory = RequestFactory()
+
+        request = factory.get('/api/posts/feed/', {'image_width': 500})
+        image = PostListSerializer(post, context={'request': request}).data['image']
+        self.assertTrue(image.endswith('photo_640.jpg'))
+
+        request = factory.get('/api/posts/feed/', HTTP_ACCEPT='image/webp,*/*')
+        image = PostListSerializer(post, context={'request': request}).data['image']
+        self.assertTrue(image.endswith('photo_640.webp'))
+
+    def test_invalid_requested_width(self):
+        """Test that unparsable or infinite widths fall back to the next hint or the default width."""
+        factory = RequestFactory()
+        for value in ('inf', '1e999', '-inf', 'nan', 'wide'):
+            self.assertEqual(requested_width(factory.get('/', {'image_width': value})), settings.IMAGE_DEFAULT_WIDTH)
+        self.assertEqual(requested_width(factory.get('/', {'image_width': 'inf'}, HTTP_WIDTH='320')), 320)
+        self.assertEqual(requested_width(factory.get('/', HTTP_WIDTH='1e999')), settings.IMAGE_DEFAULT_WIDTH)
+
+    def test_unprocessed_post_returns_original(self):
+        """Test that a post without variants still returns its original image."""
+        self.post.likes_count = 0
+        image = PostListSerializer(self.post).data['image']
+        self.assertEqual(image, default_storage.url(self.post.image.name))
+
+
+class ImageDedupTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.jpeg = make_jpeg(800, 600).read()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def create_post(self, content=None):
+        upload = SimpleUploadedFile('photo.jpg', content or self.jpeg, content_type='image/jpeg')
+        serializer = PostSerializer(data={'title': 'Photo', 'content': 'Content', 'image': upload})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(user=self.user)
+
+    def test_blob_path_fits_image_column(self):
+        """Test that the content-addressed path fits in the post and asset columns (Postgres enforces the length)."""
+        path = blob_path('a' * 64, 'photo.jpeg')
+
+        self.assertLessEqual(len(path), Post._meta.get_field('image').max_length)
+        self.assertLessEqual(len(path), ImageAsset._meta.get_field('path').max_length)
+
+    def test_identical_uploads_share_one_file(self):
+        """Test that the same image uploaded twice is stored once and referenced by both posts."""
+        first = self.create_post()
+        second = self.create_post()
+
+        asset = ImageAsset.objects.get()
+        self.assertEqual(asset.refcount, 2)
+        self.assertEqual(asset.sha256, hashlib.sha256(self.jpeg).hexdigest())
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image.name, asset.path)
+        self.assertTrue(default_storage.exists(asset.path))
+
+    def test_replacing_image_releases_previous(self):
+        """Test that updating the image of a post drops its reference to the old one."""
+        post = self.create_post()
+        self.create_post()
+        old_asset = post.image_asset
+
+        other = make_jpeg(640, 480)
+        serializer = PostSerializer(post, data={'image': other}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        old_asset.refresh_from_db()
+        self.assertEqual(old_asset.refcount, 1)
+        self.assertNotEqual(post.image_asset_id, old_asset.id)
+
+    def test_last_reference_deletes_files(self):
+        """Test that deleting the last post using an image removes the asset and its variants."""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_post()
+            second = self.create_post()
+        asset = ImageAsset.objects.get()
+        files = [asset.path] + [variant['webp'] for variant in asset.variants]
+
+        first.delete()
+        self.assertTrue(default_storage.exists(asset.path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ImageAsset.objects.exists())
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from authentication.authentication import CookiesJWTAuthentication
+from twitter.models import Follow, followers_count_cache_key
+from twitter.tasks import cache_followers_count
+from users.models import user_cache_key
+from setup.cache import get_or_compute
+from setup.local_cache import LocalCache, local_cache, stats
+from setup.metrics import registry
+
+
+class LocalCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is evicted when the cache is full."""
+        lru = LocalCache(max_entries=2, timeout=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b', None))
+        self.assertEqual(lru.get('c'), 3)
+
+    @patch('setup.local_cache.time.monotonic')
+    def test_entries_expire(self, mock_monotonic):
+        """Test that entries are dropped after their TTL."""
+        lru = LocalCache(max_entries=10, timeout=5)
+        mock_monotonic.return_value = 100
+        lru.set('a', 1)
+
+        mock_monotonic.return_value = 106
+        self.assertIsNone(lru.get('a', None))
+
+
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        stats.reset()
+        registry.reset()
+
+    def test_local_hit_skips_redis(self):
+        """Test that a value found in L1 is not read from the shared cache again."""
+        self.assertEqual(get_or_compute('answer', lambda: 42, local=True), 42)
+        cache.clear()
+
+        self.assertEqual(get_or_compute('answer', lambda: 0, local=True), 42)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['l1_hits'], 1)
+        self.assertEqual(snapshot['l1_misses'], 1)
+        self.assertEqual(snapshot['l1_hit_ratio'], 0.5)
+        self.assertEqual(snapshot['l2_misses'], 1)
+
+    def test_hits_are_published_to_metrics(self):
+        """Test that L1 and L2 hits and misses are aggregated in the metrics registry."""
+        get_or_compute('answer', lambda: 42, local=True)
+        local_cache.clear()
+        get_or_compute('answer', lambda: 0, local=True)
+
+        values = registry.snapshot()
+        self.assertEqual(values['tiered_cache_misses_total{tier="l1"}'], 2)
+        self.assertEqual(values['tiered_cache_misses_total{tier="l2"}'], 1)
+        self.assertEqual(values['tiered_cache_hits_total{tier="l2"}'], 1)
+
+    def test_follow_invalidates_local_counts(self):
+        """Test that a new follow drops the cached follower count from L1."""
+        user1 = User.objects.create_user(username='user1', password='password')
+        user2 = User.objects.create_user(username='user2', password='password')
+        self.assertEqual(Follow.get_followers_count(user1, local=True), 0)
+
+        Follow.objects.create(follower=user2, followed=user1)
+        self.assertIsNone(local_cache.get(followers_count_cache_key(user1.id), None))
+
+        # A contagem no Redis é renovada pela tarefa que o signal enfileira
+        cache_followers_count.apply(args=[user1.id])
+        self.assertEqual(Follow.get_followers_count(user1, local=True), 1)
+
+    def test_cached_user_is_not_shared(self):
+        """Test that every authentication served from L1 gets its own User instance."""
+        user = User.objects.create_user(username='user1', password='password')
+        token = AccessToken.for_user(user)
+        authentication = CookiesJWTAuthentication()
+
+        first = authentication.get_user(token)
+        first.username = 'changed'
+        second = authentication.get_user(token)
+        third = authentication.get_user(token)
+
+        self.assertEqual(stats.snapshot()['l1_hits'], 2)
+        self.assertIsNot(second, third)
+        self.assertEqual(second.username, 'user1')
+        second.username = 'changed'
+        self.assertEqual(third.username, 'user1')
+
+    def test_cached_inactive_user_is_rejected(self):
+        """Test that an L1 hit still refuses a user whose cached row is inactive."""
+        user = User.objects.create_user(username='user1', password='password')
+        token = AccessToken.for_user(user)
+        authentication = CookiesJWTAuthentication()
+        authentication.get_user(token)
+
+        db, field_names, values = local_cache.get(user_cache_key(user.id))
+        values = tuple(False if name == 'is_active' else value for name, value in zip(field_names, values))
+        local_cache.set(user_cache_key(user.id), (db, field_names, values))
+
+        with self.assertRaises(AuthenticationFailed):
+            authentication.get_user(token)
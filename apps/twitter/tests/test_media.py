@@ -0,0 +1,89 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+
+
+class ServeMediaTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SERVE_MODE='django')
+        self.settings_override.enable()
+
+        self.content = bytes(range(256)) * 4
+        self.digest = hashlib.sha256(self.content).hexdigest()
+        self.blob = f'core/static/img/posts/blobs/{self.digest[:2]}/{self.digest[2:4]}/{self.digest}.jpg'
+        self.write(self.blob)
+        self.write('core/static/img/posts/legacy.jpg')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def write(self, name):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as target:
+            target.write(self.content)
+
+    def test_content_addressed_file_is_immutable(self):
+        """Test that hashed blobs get an immutable Cache-Control and their hash as ETag."""
+        response = self.client.get(f'/media/{self.blob}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_legacy_file_is_not_immutable(self):
+        """Test that files outside the blob store are not marked immutable."""
+        response = self.client.get('/media/core/static/img/posts/legacy.jpg')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_if_none_match_returns_not_modified(self):
+        """Test that a matching If-None-Match is answered with an empty 304."""
+        response = self.client.get(f'/media/{self.blob}', HTTP_IF_NONE_MATCH=f'"{self.digest}"')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_range_request(self):
+        """Test that a byte range is answered with 206 and only the requested bytes."""
+        response = self.client.get(f'/media/{self.blob}', HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(f'/media/{self.blob}', HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-4:])
+
+        response = self.client.get(f'/media/{self.blob}', HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_offloads_to_web_server(self):
+        """Test that x-accel and x-sendfile modes send no body, only the header for the web server."""
+        with self.settings(MEDIA_SERVE_MODE='x-accel', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response = self.client.get(f'/media/{self.blob}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.blob}')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.client.get(f'/media/{self.blob}')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, self.blob))
+
+    def test_path_traversal_is_rejected(self):
+        """Test that paths escaping MEDIA_ROOT are answered with 404."""
+        response = self.client.get('/media/../setup/settings.py')
+        self.assertEqual(response.status_code, 404)
+
+    def test_pending_uploads_are_not_served(self):
+        """Test that incomplete uploads in IMAGE_UPLOAD_TEMP_DIR are not served."""
+        with self.settings(IMAGE_UPLOAD_TEMP_DIR=os.path.join(self.media_root, 'uploads')):
+            self.write('uploads/pending.part')
+            response = self.client.get('/media/uploads/pending.part')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,93 @@
+import unittest
+import redis
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from setup.metrics import Registry, registry, render
+from twitter.models import Post, Follow
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(f'{settings.REDIS_URL}/15', socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'setup.cache_backends.InstrumentedLocMemCache'}}, METRICS_TOKEN='secret')
+class MetricsMiddlewareTest(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        author = User.objects.create_user(username='author', password='password')
+        Follow.objects.create(follower=self.user, followed=author)
+        Post.objects.create(user=author, title='Post', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_metrics(self):
+        """Test that a request is counted with its latency, size, queries and cache calls under its URL name."""
+        self.assertEqual(self.client.get('/api/posts/feed/').status_code, status.HTTP_200_OK)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{view="post_feed",method="GET",status="200"} 1\n', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="post_feed",le="+Inf"} 1\n', body)
+        self.assertIn('http_response_size_bytes_count{view="post_feed"} 1\n', body)
+        self.assertIn('db_queries_total{view="post_feed"}', body)
+        self.assertIn('cache_calls_total{view="post_feed",operation="get_many"}', body)
+        self.assertIn('cache_misses_total{view="post_feed"}', body)
+
+    def test_token(self):
+        """Test that the scrape needs the bearer token and is closed while no token is configured."""
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, status.HTTP_200_OK)
+
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer None')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class RenderTest(TestCase):
+    def test_buckets_in_numeric_order(self):
+        """Test that histogram buckets are rendered by their numeric bound, +Inf last."""
+        values = {
+            'http_request_duration_seconds_bucket{view="a",le="+Inf"}': 2,
+            'http_request_duration_seconds_bucket{view="a",le="10"}': 2,
+            'http_request_duration_seconds_bucket{view="a",le="2.5"}': 1,
+        }
+        lines = [line for line in render(values).splitlines() if not line.startswith('#')]
+        self.assertEqual([line.split('le="')[1].split('"')[0] for line in lines], ['2.5', '10', '+Inf'])
+
+
+@unittest.skipUnless(redis_available(), 'Redis is not available')
+@override_settings(
+    CACHES={'default': {'BACKEND': 'setup.cache_backends.InstrumentedRedisCache', 'LOCATION': f'{settings.REDIS_URL}/15'}},
+    METRICS_KEY='test:metrics',
+)
+class MetricsAggregationTest(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_workers_are_summed(self):
+        """Test that the values flushed by different processes are added up in Redis."""
+        workers = [Registry(), Registry()]
+        for worker in workers:
+            worker.inc('http_requests_total', view='post_feed', method='GET', status=200)
+            worker.observe('http_request_duration_seconds', 0.02, settings.METRICS_LATENCY_BUCKETS, view='post_feed')
+            worker.flush()
+
+        values = registry.snapshot()
+        self.assertEqual(values['http_requests_total{view="post_feed",method="GET",status="200"}'], 2)
+        self.assertEqual(values['http_request_duration_seconds_bucket{view="post_feed",le="0.025"}'], 2)
+        self.assertNotIn('http_request_duration_seconds_bucket{view="post_feed",le="0.01"}', values)
+        self.assertAlmostEqual(values['http_request_duration_seconds_sum{view="post_feed"}'], 0.04)
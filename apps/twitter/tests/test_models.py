@@ -80,4 +80,24 @@ class FollowModelTest(TestCase):
         
         # Test that unfollowing decreases the follow count
         follow.delete()
-        self.assertEqual(Follow.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(Follow.objects.count(), 1)
+
+class PostSoftDeleteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='testuser@gmail.com', password='password')
+        self.post = Post.objects.create(user=self.user, title='Test Post', content='This is a test post content.')
+
+    def test_soft_delete_hides_post(self):
+        """Test that the default manager hides soft-deleted posts."""
+        self.post.soft_delete()
+
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertTrue(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertIsNotNone(Post.all_objects.get(pk=self.post.pk).deleted_at)
+
+    def test_related_access_sees_deleted_post(self):
+        """Test that a like still reaches its post after the post is deleted."""
+        like = Like.objects.create(user=self.user, post=self.post)
+        self.post.soft_delete()
+
+        self.assertEqual(Like.objects.get(pk=like.pk).post, self.post)
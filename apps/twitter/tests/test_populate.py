@@ -0,0 +1,40 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase
+from django.utils import timezone
+from twitter.models import Post, Like, Follow
+
+
+class PopulateModelsTest(TestCase):
+    def test_generates_requested_scale(self):
+        """Test that the generator creates the requested rows without duplicate likes or follows."""
+        call_command('populate_models', users=50, posts=100, likes=400, follows=300, power_law=1.5, stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertGreater(Like.objects.count(), 300)
+        self.assertGreater(Follow.objects.count(), 100)
+
+        self.assertFalse(Like.objects.values('user', 'post').annotate(total=Count('id')).filter(total__gt=1).exists())
+        self.assertFalse(Follow.objects.values('follower', 'followed').annotate(total=Count('id')).filter(total__gt=1).exists())
+        self.assertFalse(Follow.objects.filter(follower_id=F('followed_id')).exists())
+
+    def test_keeps_generated_values(self):
+        """Test that the generated dates are kept (not replaced by auto_now_add) and empty names stay empty."""
+        call_command('populate_models', users=20, posts=50, likes=100, follows=50, days=30, stdout=StringIO())
+
+        week_ago = timezone.now() - timedelta(days=7)
+        self.assertTrue(Post.objects.filter(created_at__lt=week_ago).exists())
+        self.assertTrue(Like.objects.filter(created_at__lt=week_ago).exists())
+        self.assertTrue(Follow.objects.filter(created_at__lt=week_ago).exists())
+        self.assertEqual(User.objects.filter(first_name='', last_name='').count(), 20)
+
+    def test_runs_twice(self):
+        """Test that a second run adds new users instead of clashing on usernames."""
+        call_command('populate_models', users=10, posts=0, likes=0, follows=0, stdout=StringIO())
+        call_command('populate_models', users=10, posts=0, likes=0, follows=0, stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 20)
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from setup.profiling import list_profiles, make_token
+from twitter.models import Post, Follow
+
+
+class ProfilingTest(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=0)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='testuser', password='password')
+        author = User.objects.create_user(username='author', password='password')
+        Follow.objects.create(follower=self.user, followed=author)
+        Post.objects.create(user=author, title='Post', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_signed_header(self):
+        """Test that a signed header profiles the request and stores the profile with its SQL."""
+        response = self.client.get('/api/posts/feed/', HTTP_X_PROFILE=make_token())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        meta, = list_profiles()
+        self.assertEqual(response['X-Profile-Id'], meta['id'])
+        self.assertEqual(meta['view'], 'post_feed')
+        self.assertGreater(meta['query_count'], 0)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, meta['file'])))
+
+        output = StringIO()
+        call_command('profiles', meta['id'], stdout=output)
+        self.assertIn('Queries mais lentas', output.getvalue())
+
+    def test_query_count_is_not_capped(self):
+        """Test that the query count covers every query while only PROFILING_MAX_QUERIES samples are stored."""
+        with self.settings(PROFILING_MAX_QUERIES=1):
+            self.client.get('/api/posts/feed/', HTTP_X_PROFILE=make_token())
+
+        meta, = list_profiles()
+        self.assertGreater(meta['query_count'], 1)
+        self.assertEqual(len(meta['queries']), 1)
+
+    def test_sampling_profiler(self):
+        """Test that a sampled request is profiled with the sampling profiler and listed by the command."""
+        with self.settings(PROFILING_SAMPLE_RATE=1, PROFILING_MODE='sampling', PROFILING_SAMPLE_INTERVAL=0.0005):
+            response = self.client.get('/api/posts/feed/')
+
+        meta, = list_profiles()
+        self.assertEqual(meta['mode'], 'sampling')
+        self.assertTrue(meta['file'].endswith('.folded'))
+        output = StringIO()
+        call_command('profiles', stdout=output)
+        self.assertIn(response['X-Profile-Id'], output.getvalue())
+
+    def test_invalid_header_is_ignored(self):
+        """Test that a forged X-Profile header neither profiles the request nor stores anything."""
+        response = self.client.get('/api/posts/feed/', HTTP_X_PROFILE='cprofile:forged:signature')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list_profiles(), [])
+
+    def test_old_profiles_are_pruned(self):
+        """Test that only the PROFILING_MAX_PROFILES newest profiles are kept."""
+        with self.settings(PROFILING_MAX_PROFILES=2):
+            for _ in range(3):
+                self.client.get('/api/posts/feed/', HTTP_X_PROFILE=make_token())
+
+        self.assertEqual(len(list_profiles()), 2)
+        self.assertEqual(len(os.listdir(self.directory)), 4)
@@ -0,0 +1,151 @@
+from contextlib import contextmanager
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from setup.local_cache import local_cache
+from twitter.models import Post, Like, Follow
+
+
+CACHE_METHODS = (
+    'get', 'get_many', 'set', 'set_many', 'add', 'add_many', 'delete', 'delete_many', 'incr', 'decr', 'touch', 'has_key',
+)
+
+
+@contextmanager
+def capture_cache_calls(alias='default'):
+    """Record (method, key) for every call made to the cache backend inside the block."""
+    calls = []
+    backend = caches[alias]
+
+    def wrap(name):
+        original = getattr(backend, name)
+
+        def wrapper(key, *args, **kwargs):
+            calls.append((name, key))
+            return original(key, *args, **kwargs)
+        return wrapper
+
+    with mock.patch.multiple(backend, **{name: wrap(name) for name in CACHE_METHODS if hasattr(backend, name)}):
+        yield calls
+
+
+class QueryBudgetTest(APITestCase):
+    """
+    Every endpoint is measured with a small and a large fixture (more rows than a page) and must
+    issue the same number of queries and cache calls: a reintroduced N+1 fails here.
+    """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create(username='testuser')
+        self.client.force_authenticate(user=self.user)
+        self.others = []
+
+    def grow(self, count):
+        """Add `count` users that follow and are followed by the test user, each with a liked post."""
+        start = len(self.others)
+        for i in range(start, start + count):
+            other = User.objects.create(username=f'user{i}')
+            Follow.objects.create(follower=self.user, followed=other)
+            Follow.objects.create(follower=other, followed=self.user)
+            post = Post.objects.create(user=other, title=f'Post {i}', content='Content')
+            Like.objects.create(user=other, post=post)
+            self.others.append(other)
+
+    def measure(self, url):
+        # A primeira requisição aquece os caches; a medida é a de uma requisição em regime
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries, capture_cache_calls() as cache_calls:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query['sql'] for query in queries.captured_queries], cache_calls
+
+    def assertConstantBudget(self, url, small=2, large=30):
+        self.grow(small)
+        small_queries, small_calls = self.measure(url)
+        self.grow(large - small)
+        large_queries, large_calls = self.measure(url)
+
+        self.assertEqual(
+            len(large_queries), len(small_queries),
+            f'{url} ran {len(small_queries)} queries with {small} rows and {len(large_queries)} with {large}:\n'
+            + '\n'.join(f'{index}. {sql}' for index, sql in enumerate(large_queries, start=1)),
+        )
+        self.assertEqual(
+            len(large_calls), len(small_calls),
+            f'{url} made {len(small_calls)} cache calls with {small} rows and {len(large_calls)} with {large}:\n'
+            + '\n'.join(f'{index}. {name}({key!r})' for index, (name, key) in enumerate(large_calls, start=1)),
+        )
+
+    def test_feed(self):
+        """Test that the feed keeps the same query and cache budget with more followed posts."""
+        self.assertConstantBudget('/api/posts/feed/')
+
+    def test_user_list(self):
+        """Test that the user list keeps the same query and cache budget with more users."""
+        self.assertConstantBudget('/api/user/user_list/')
+
+    def test_followers(self):
+        """Test that the followers list keeps the same query and cache budget with more followers."""
+        self.assertConstantBudget('/api/user/followers/')
+
+    def test_following(self):
+        """Test that the following list keeps the same query and cache budget with more followed users."""
+        self.assertConstantBudget('/api/user/following/')
+
+    def test_profile(self):
+        """Test that the profile keeps the same query and cache budget with more followers and posts."""
+        self.assertConstantBudget('/api/user/profile/')
+
+
+@override_settings(FAST_LIST_SERIALIZATION=False)
+class ModelSerializerQueryBudgetTest(QueryBudgetTest):
+    """Same budgets through the ModelSerializer path."""
+
+
+@override_settings(CACHE_WARM_CHUNK_SIZE=2)
+class LikesWarmerBudgetTest(APITestCase):
+    """The like-count warmers run one query and one `add_many` per chunk, however many posts and followers."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        other_follower = User.objects.create(username='other_follower')
+        self.posts = []
+        for i in range(5):
+            author = User.objects.create(username=f'author{i}')
+            Follow.objects.create(follower=self.user, followed=author)
+            Follow.objects.create(follower=other_follower, followed=author)
+            post = Post.objects.create(user=author, title=f'Post {i}', content='Content')
+            for liker in (self.user, other_follower)[:i % 3]:
+                Like.objects.create(user=liker, post=post)
+            self.posts.append(post)
+        Post.objects.create(user=User.objects.create(username='not_followed'), title='Post', content='Content')
+        cache.clear()
+
+    def assertWarmed(self, task, *args):
+        with CaptureQueriesContext(connection) as queries, capture_cache_calls() as cache_calls:
+            task.apply(args=args)
+
+        self.assertEqual(len(queries), 1, '\n'.join(query['sql'] for query in queries.captured_queries))
+        self.assertEqual([name for name, _ in cache_calls], ['add_many'] * 3)
+        self.assertEqual(
+            Post.get_likes_counts([post.id for post in self.posts]),
+            {post.id: i % 3 for i, post in enumerate(self.posts)},
+        )
+
+    def test_update_post_likes_cache(self):
+        """Test that warming every post runs one query and one add_many per chunk."""
+        from twitter.tasks import update_post_likes_cache
+        self.assertWarmed(update_post_likes_cache)
+
+    def test_update_likes_for_user(self):
+        """Test that warming a user's feed runs one query and one add_many per chunk."""
+        from twitter.tasks import update_likes_for_user
+        self.assertWarmed(update_likes_for_user, self.user.id)
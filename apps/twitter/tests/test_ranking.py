@@ -0,0 +1,73 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from twitter.models import Post, Like, Follow
+from twitter.ranking import score_posts, rank_post_ids, ranked_feed_ids
+
+
+WEIGHTS = {'likes': 1.0, 'affinity': 2.0, 'followers': 0.25}
+
+
+class ScorePostsTest(TestCase):
+    def test_recency_halves_every_half_life(self):
+        """Test that a post's score halves after each half-life."""
+        now = 1_000_000.0
+        scores = score_posts([now, now - 3600], [0, 0], [0, 0], [0, 0], now, half_life_hours=1, weights=WEIGHTS)
+        self.assertAlmostEqual(scores[1] / scores[0], 0.5)
+
+    def test_engagement_and_affinity_raise_score(self):
+        """Test that likes and affinity with the author rank a post above an equally recent one."""
+        now = 1_000_000.0
+        scores = score_posts([now] * 3, [0, 10, 0], [0, 0, 5], [0, 0, 0], now, half_life_hours=1, weights=WEIGHTS)
+        self.assertEqual(rank_post_ids([1, 2, 3], scores), [3, 2, 1])
+
+
+class RankedFeedTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.favorite = User.objects.create_user(username='favorite', password='password')
+        Follow.objects.create(follower=self.user, followed=self.author)
+        Follow.objects.create(follower=self.user, followed=self.favorite)
+
+        self.recent = Post.objects.create(user=self.author, title='Recent', content='Content')
+        self.liked = Post.objects.create(user=self.favorite, title='Liked', content='Content')
+        old = Post.objects.create(user=self.favorite, title='Old', content='Content')
+        Post.all_objects.filter(id=self.liked.id).update(created_at=timezone.now() - timedelta(hours=1))
+        Post.all_objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=30))
+
+        # O usuário curte o autor favorito, que também tem mais likes
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=self.user, post=old)
+            Like.objects.create(user=self.author, post=self.liked)
+        self.client.force_authenticate(user=self.user)
+
+    def test_ranked_order(self):
+        """Test that engagement and affinity outrank a slightly newer post, outside the window nothing is ranked."""
+        response = self.client.get('/api/posts/feed/', {'order': 'ranked'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.data['results']], [self.liked.id, self.recent.id])
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+
+        response = self.client.get('/api/posts/feed/')
+        self.assertEqual(response.data['results'][0]['id'], self.recent.id)
+
+    def test_ranked_order_applies_search(self):
+        """Test that `?search=` narrows the ranked feed and keeps the ranked order."""
+        response = self.client.get('/api/posts/feed/', {'order': 'ranked', 'search': 'Recent'})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.recent.id])
+
+        response = self.client.get('/api/posts/feed/', {'order': 'ranked', 'search': 'Content'})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.liked.id, self.recent.id])
+
+    def test_ranked_ids_are_cached(self):
+        """Test that the ranked ids are served from the cache without queries."""
+        ranked_feed_ids(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(ranked_feed_ids(self.user), [self.liked.id, self.recent.id])
@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.test import APITestCase
+from twitter.models import Follow
+
+
+class RelationshipsTest(APITestCase):
+    def setUp(self):
+        self.users = {name: User.objects.create_user(username=name, password='password') for name in 'abcde'}
+        # a <-> b, a -> c, d -> a; b e c seguem e
+        for follower, followed in ['ab', 'ba', 'ac', 'da', 'be', 'ce']:
+            Follow.objects.create(follower=self.users[follower], followed=self.users[followed])
+        self.client.force_authenticate(user=self.users['a'])
+
+    def test_relationships_in_one_request(self):
+        """Test the follow status and followers in common for a batch of ids, in two queries."""
+        ids = ','.join(str(self.users[name].id) for name in 'bcde')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/user/relationships/', {'ids': ids})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        by_name = dict(zip('bcde', response.data))
+        self.assertTrue(by_name['b']['mutual'])
+        self.assertEqual((by_name['c']['following'], by_name['c']['followed_by']), (True, False))
+        self.assertEqual((by_name['d']['following'], by_name['d']['followed_by']), (False, True))
+        self.assertEqual(by_name['e']['followers_you_follow'], ['b', 'c'])
+        self.assertEqual(by_name['e']['followers_you_follow_count'], 2)
+
+    def test_common_followers_sample_is_bounded(self):
+        """Test that the count covers every follower in common while only the sample is returned."""
+        with self.settings(RELATIONSHIPS_COMMON_SAMPLE=1):
+            response = self.client.get('/api/user/relationships/', {'ids': self.users['e'].id})
+        self.assertEqual(response.data[0]['followers_you_follow'], ['b'])
+        self.assertEqual(response.data[0]['followers_you_follow_count'], 2)
+
+        in_common = Follow.followers_in_common(self.users['a'], [self.users['e'].id, self.users['d'].id], 0)
+        self.assertEqual(in_common, {self.users['e'].id: (2, []), self.users['d'].id: (0, [])})
+
+    def test_invalid_ids(self):
+        """Test that non-numeric ids and batches above RELATIONSHIPS_MAX_IDS are rejected."""
+        response = self.client.get('/api/user/relationships/', {'ids': '1,x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(RELATIONSHIPS_MAX_IDS=2):
+            response = self.client.get('/api/user/relationships/', {'ids': '1,2,3'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mutuals(self):
+        """Test that only the followed accounts that follow back are listed."""
+        response = self.client.get('/api/user/mutuals/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['followed_username'] for item in response.data['results']], ['b'])
@@ -207,3 +207,25 @@ class FollowViewSetTest(APITestCase):
         # Verifica se o follow foi removido
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Follow.objects.count(), 0)
+
+
+class PostListTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        Follow.objects.create(follower=self.user, followed=self.author)
+
+        self.post = Post.objects.create(title='Post Test', content='Test content', user=self.author)
+        # A contagem em cache só é somada no commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=self.user, post=self.post)
+        self.client.force_authenticate(user=self.user)
+
+    def test_feed_returns_likes_count(self):
+        """Test that the feed returns followed users' posts with their like counts."""
+        response = self.client.get('/api/posts/feed/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], self.post.id)
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
@@ -0,0 +1,132 @@
+import unittest
+from io import StringIO
+from unittest.mock import patch
+import redis
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from setup import slow_queries
+from twitter.models import Post, Follow
+from twitter.tasks import update_likes_for_user
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(f'{settings.REDIS_URL}/15', socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+
+class FingerprintTest(TestCase):
+    def test_literals_and_in_lists(self):
+        """Test that queries differing only in literals or IN list sizes share a fingerprint."""
+        first = 'SELECT * FROM post WHERE user_id IN (%s, %s) AND title = \'a\' LIMIT 21'
+        second = 'SELECT  *  FROM post WHERE user_id IN (%s, %s, %s) AND title = \'b\' LIMIT 5'
+        self.assertEqual(slow_queries.fingerprint(first), slow_queries.fingerprint(second))
+        self.assertNotEqual(slow_queries.fingerprint(first), slow_queries.fingerprint('SELECT * FROM post'))
+
+
+class SlowQueryLogTest(APITestCase):
+    def setUp(self):
+        slow_queries.reset()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        author = User.objects.create_user(username='author', password='password')
+        Follow.objects.create(follower=self.user, followed=author)
+        Post.objects.create(user=author, title='Post', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        slow_queries.reset()
+
+    def test_request_queries(self):
+        """Test that slow queries are logged and aggregated with the view that ran them."""
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), self.assertLogs('setup.slow_queries', 'WARNING') as logs:
+            self.client.get('/api/posts/feed/')
+
+        self.assertTrue(any('source=post_feed' in line for line in logs.output))
+        feed = [entry for entry in slow_queries.top(100) if entry['source'] == 'post_feed']
+        self.assertEqual(sum(entry['count'] for entry in feed), len(logs.output))
+
+        output = StringIO()
+        call_command('slow_queries', feed[0]['fingerprint'], stdout=output)
+        self.assertIn('Sem plano capturado', output.getvalue())
+
+    def test_task_queries(self):
+        """Test that slow queries run by a task are aggregated under the task name."""
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), self.assertLogs('setup.slow_queries', 'WARNING'):
+            update_likes_for_user.apply(args=[self.user.id])
+
+        self.assertIn(update_likes_for_user.name, {entry['source'] for entry in slow_queries.top(100)})
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_without_metrics(self):
+        """Test that slow queries of requests and tasks are logged while metrics collection is off."""
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), self.assertLogs('setup.slow_queries', 'WARNING'):
+            self.client.get('/api/posts/feed/')
+            update_likes_for_user.apply(args=[self.user.id])
+
+        sources = {entry['source'] for entry in slow_queries.top(100)}
+        self.assertIn('post_feed', sources)
+        self.assertIn(update_likes_for_user.name, sources)
+
+    @override_settings(SLOW_QUERY_LOG_PARAMS=True)
+    def test_explain_only_reads_on_postgres(self):
+        """Test that only reads on Postgres are explained, once per fingerprint and interval."""
+        with patch.object(slow_queries.explain_slow_query, 'delay') as delay, \
+                patch.object(type(slow_queries.connections['default']), 'vendor', 'postgresql'), \
+                self.assertLogs('setup.slow_queries', 'WARNING'):
+            slow_queries.record('UPDATE twitter_post SET title = %s', ['x'], 'default', 1.0, 'test')
+            slow_queries.record('SELECT * FROM twitter_post WHERE id = %s', [1], 'default', 1.0, 'test')
+            slow_queries.record('SELECT * FROM twitter_post WHERE id = %s', [2], 'default', 1.0, 'test')
+
+        delay.assert_called_once()
+
+    def test_hidden_params(self):
+        """Test that with SLOW_QUERY_LOG_PARAMS off the values stay out of the log, the aggregate and the EXPLAIN task."""
+        connection = type(slow_queries.connections['default'])
+        with patch.object(slow_queries.explain_slow_query, 'delay') as delay, \
+                patch.object(connection, 'vendor', 'postgresql'), \
+                patch.object(connection, 'pg_version', 160000, create=True), \
+                self.assertLogs('setup.slow_queries', 'WARNING') as logs:
+            slow_queries.record('SELECT * FROM twitter_post WHERE title = %s', ['secret'], 'default', 1.0, 'test')
+
+        self.assertNotIn('secret', ''.join(logs.output))
+        delay.assert_called_once_with(
+            slow_queries.fingerprint('SELECT * FROM twitter_post WHERE title = %s'),
+            'SELECT * FROM twitter_post WHERE title = %s', None, 'default',
+        )
+        entry, = slow_queries.top()
+        self.assertEqual(entry['max_params'], '<hidden>')
+        output = StringIO()
+        call_command('slow_queries', entry['fingerprint'], stdout=output)
+        self.assertNotIn('secret', output.getvalue())
+        self.assertEqual(
+            slow_queries._numbered("SELECT * FROM t WHERE a = %s AND b LIKE '%%x' AND c IN (%s, %s)"),
+            "SELECT * FROM t WHERE a = $1 AND b LIKE '%x' AND c IN ($2, $3)",
+        )
+
+
+@unittest.skipUnless(redis_available(), 'Redis is not available')
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': f'{settings.REDIS_URL}/15'}},
+    SLOW_QUERY_KEY='test:slow_queries', SLOW_QUERY_LOG_PARAMS=True,
+)
+class SlowQueryAggregationTest(TestCase):
+    def tearDown(self):
+        slow_queries.reset()
+
+    def test_aggregated_in_redis(self):
+        """Test that occurrences are summed in Redis, keeping the worst parameters and the captured plan."""
+        with self.assertLogs('setup.slow_queries', 'WARNING'):
+            slow_queries.record('SELECT * FROM twitter_post WHERE id = %s', [1], 'default', 0.3, 'post_feed')
+            slow_queries.record('SELECT * FROM twitter_post WHERE id = %s', [2], 'default', 0.5, 'post_feed')
+        slow_queries.store_plan(slow_queries.fingerprint('SELECT * FROM twitter_post WHERE id = %s'), 'Seq Scan')
+
+        entry, = slow_queries.top()
+        self.assertEqual(entry['count'], 2)
+        self.assertAlmostEqual(entry['total'], 0.8)
+        self.assertAlmostEqual(entry['max'], 0.5)
+        self.assertEqual(entry['max_params'], '[2]')
+        self.assertEqual(entry['plan'], 'Seq Scan')
@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase
+from twitter.models import Follow
+from twitter.suggestions import FollowGraph, compute_suggestions, store_suggestions
+
+
+class FollowSuggestionsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {name: User.objects.create_user(username=name, password='password') for name in 'abcdef'}
+        for follower, followed in ['ab', 'ac', 'bd', 'cd', 'ce', 'ed', 'fd']:
+            Follow.objects.create(follower=self.users[follower], followed=self.users[followed])
+        self.client.force_authenticate(user=self.users['a'])
+
+    def test_friends_of_friends(self):
+        """Test that suggestions are ranked by how many followed accounts follow the candidate."""
+        store_suggestions(top_k=5, workers=1)
+
+        response = self.client.get('/api/user/suggestions/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['username'] for item in response.data], ['d', 'e'])
+        self.assertEqual([item['mutual_count'] for item in response.data], [2, 1])
+
+    def test_process_pool_matches_serial(self):
+        """Test that the spawned process pool returns the same suggestions as the serial run."""
+        graph = FollowGraph.load()
+
+        serial = [(user, list(candidates)) for user, candidates, _ in compute_suggestions(graph, 5, workers=1)]
+        pooled = [
+            (user, list(candidates)) for user, candidates, _ in compute_suggestions(graph, 5, workers=2, chunk_size=2)
+        ]
+        self.assertEqual(pooled, serial)
+
+    def test_followed_user_leaves_suggestions(self):
+        """Test that following a suggested account removes it from the stored suggestions."""
+        store_suggestions(top_k=5, workers=1)
+        Follow.objects.create(follower=self.users['a'], followed=self.users['d'])
+
+        response = self.client.get('/api/user/suggestions/')
+
+        self.assertEqual([item['username'] for item in response.data], ['e'])
@@ -0,0 +1,47 @@
+import time
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from setup.metrics import registry
+from twitter.models import Post, Follow
+from twitter.tasks import update_post_likes_cache, cache_followers_count
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'setup.cache_backends.InstrumentedLocMemCache'}})
+class TaskMetricsTest(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        Follow.objects.create(follower=self.user, followed=self.author)
+        Post.objects.create(user=self.author, title='Post', content='Content')
+        registry.reset()
+
+    def test_runtime_queries_and_cache_calls(self):
+        """Test that a task run records its state, duration, queries and cache calls under the task name."""
+        update_post_likes_cache.apply()
+
+        values = registry.snapshot()
+        name = update_post_likes_cache.name
+        self.assertEqual(values[f'celery_tasks_total{{task="{name}",state="SUCCESS"}}'], 1)
+        self.assertEqual(values[f'celery_task_duration_seconds_count{{task="{name}"}}'], 1)
+        self.assertGreater(values[f'celery_task_db_queries_total{{task="{name}"}}'], 0)
+        self.assertGreater(values[f'celery_task_cache_calls_total{{task="{name}",operation="add_many"}}'], 0)
+
+    def test_queue_wait(self):
+        """Test that the time since the task was published is recorded."""
+        cache_followers_count.apply(args=[self.author.id], headers={'published_at': time.time() - 2})
+
+        values = registry.snapshot()
+        name = cache_followers_count.name
+        self.assertNotIn(f'celery_task_queue_wait_seconds_bucket{{task="{name}",le="1"}}', values)
+        self.assertEqual(values[f'celery_task_queue_wait_seconds_bucket{{task="{name}",le="5"}}'], 1)
+        self.assertGreaterEqual(values[f'celery_task_queue_wait_seconds_sum{{task="{name}"}}'], 2)
+
+    def test_failure(self):
+        """Test that a failed run is counted under FAILURE and by exception type."""
+        cache_followers_count.apply(args=[0])
+
+        values = registry.snapshot()
+        name = cache_followers_count.name
+        self.assertEqual(values[f'celery_tasks_total{{task="{name}",state="FAILURE"}}'], 1)
+        self.assertEqual(values[f'celery_task_failures_total{{task="{name}",exception="DoesNotExist"}}'], 1)
@@ -0,0 +1,110 @@
+import base64
+import io
+import shutil
+import tempfile
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from twitter.models import Post
+from twitter.tasks import process_post_image
+from twitter.timelines import author_timeline_cache_key, recent_author_posts
+
+
+def make_png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10), color='green').save(buffer, format='PNG')
+    return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+
+class AuthorTimelineTest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.posts = [Post.objects.create(user=self.author, title=f'Post {i}', content='Content') for i in range(5)]
+        self.url = f'/api/user/{self.author.id}/posts/'
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def collect(self):
+        ids = []
+        url = self.url
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [post['id'] for post in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_keyset_pages_cross_cache_and_database(self):
+        """Test that pages from the cached posts and from the database join without gaps or repeats."""
+        # Mesmo created_at em todos: a ordem fica a cargo do id
+        Post.all_objects.update(created_at=timezone.now())
+        expected = [post.id for post in reversed(self.posts)]
+
+        with self.settings(AUTHOR_TIMELINE_CACHE_SIZE=3, REST_FRAMEWORK={'PAGE_SIZE': 2}):
+            self.assertEqual(self.collect(), expected)
+
+    def test_first_page_is_cached(self):
+        """Test that a second read of the first page runs no queries."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_create_and_delete_invalidate(self):
+        """Test that posts created or deleted by the author show up right away."""
+        self.client.get(self.url)
+        self.client.force_authenticate(user=self.author)
+
+        response = self.client.post('/api/posts/create/', {
+            'title': 'New', 'content': 'Content', 'image': make_png(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_post_id = response.data['id']
+
+        response = self.client.delete(f'/api/posts/delete/{self.posts[-1].id}')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        ids = self.collect()
+        self.assertNotIn(self.posts[-1].id, ids)
+        self.assertEqual(ids[:2], [new_post_id, self.posts[-2].id])
+
+    def test_image_variants_invalidate(self):
+        """Test that linking the processed image variants drops the author's cached timeline."""
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post('/api/posts/create/', {
+            'title': 'New', 'content': 'Content', 'image': make_png(),
+        }, format='multipart')
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(author_timeline_cache_key(self.author.id)))
+
+        process_post_image.apply(args=[response.data['id']])
+
+        self.assertIsNone(cache.get(author_timeline_cache_key(self.author.id)))
+        self.assertTrue(recent_author_posts(self.author.id)[0]['image_asset__variants'])
+
+    def test_unknown_author(self):
+        """Test that the timeline of a user that does not exist is a 404."""
+        response = self.client.get('/api/user/999999/posts/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor(self):
+        """Test that malformed cursors and cursors without a time zone are a 400."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        naive = base64.urlsafe_b64encode(f'2024-11-01T12:00:00|{self.posts[0].id}'.encode()).decode()
+        response = self.client.get(self.url, {'cursor': naive})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
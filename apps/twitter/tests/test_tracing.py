@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from setup import tracing
+from twitter.models import Post
+from twitter.tasks import cache_followers_count
+
+
+class TracingTest(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, 'spans.jsonl')
+        self.settings_override = override_settings(
+            TRACING_EXPORTER='file', TRACING_FILE=self.file, TRACING_SAMPLE_RATE=1,
+            CACHES={'default': {'BACKEND': 'setup.cache_backends.InstrumentedLocMemCache'}},
+        )
+        self.settings_override.enable()
+        tracing.flush()
+
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        Post.objects.create(user=self.author, title='Post', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def exported_spans(self):
+        tracing.flush()
+        spans = []
+        with open(self.file) as file:
+            for line in file:
+                for resource in json.loads(line)['resourceSpans']:
+                    for scope in resource['scopeSpans']:
+                        spans.extend(scope['spans'])
+        return spans
+
+    def test_request_database_cache_and_task_spans(self):
+        """Test that the request, its queries, cache calls and the task it starts share one trace."""
+        response = self.client.post('/api/user/follow/', {'followed': self.author.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        spans = self.exported_spans()
+        self.assertEqual({span['traceId'] for span in spans}, {response['X-Trace-Id']})
+
+        root, = [span for span in spans if 'parentSpanId' not in span]
+        self.assertEqual(root['name'], 'POST follow_user-list')
+        self.assertEqual(root['kind'], tracing.SERVER)
+        attributes = {attribute['key']: attribute['value'] for attribute in root['attributes']}
+        self.assertEqual(attributes['http.response.status_code'], {'intValue': '201'})
+
+        queries = [span for span in spans if span['kind'] == tracing.CLIENT and not span['name'].startswith('cache')]
+        self.assertTrue(any(span['parentSpanId'] == root['spanId'] for span in queries))
+
+        # O envio das tarefas é filho da requisição e leva o traceparent na mensagem
+        publishes = [span for span in spans if span['kind'] == tracing.PRODUCER]
+        self.assertTrue(publishes)
+        self.assertEqual({span['parentSpanId'] for span in publishes}, {root['spanId']})
+
+        # O worker continua o trace a partir do header da mensagem
+        publish = next(span for span in publishes if span['name'].endswith('cache_followers_count'))
+        traceparent = f"00-{publish['traceId']}-{publish['spanId']}-01"
+        cache_followers_count.apply(args=[self.author.id], headers={'traceparent': traceparent})
+
+        spans = self.exported_spans()
+        task, = [span for span in spans if span['kind'] == tracing.CONSUMER]
+        self.assertEqual((task['traceId'], task['parentSpanId']), (root['traceId'], publish['spanId']))
+
+        # Queries e chamadas ao cache da tarefa são filhas do span da tarefa
+        children = [span for span in spans if span.get('parentSpanId') == task['spanId']]
+        self.assertIn('cache set_many', [span['name'] for span in children])
+        self.assertIn('SELECT', [span['name'] for span in children])
+
+    def test_incoming_traceparent(self):
+        """Test that a request carrying a sampled traceparent continues that trace."""
+        trace_id, parent_id = '4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'
+        with self.settings(TRACING_SAMPLE_RATE=0):
+            response = self.client.get('/api/user/profile/', HTTP_TRACEPARENT=f'00-{trace_id}-{parent_id}-01')
+            unsampled = self.client.get('/api/user/profile/', HTTP_TRACEPARENT=f'00-{trace_id}-{parent_id}-00')
+
+        self.assertEqual(response['X-Trace-Id'], trace_id)
+        self.assertNotIn('X-Trace-Id', unsampled)
+        root, = [span for span in self.exported_spans() if span.get('parentSpanId') == parent_id]
+        self.assertEqual(root['name'], 'GET user_profile')
+
+    def test_task_traceparent_header(self):
+        """Test that a task run continues the trace of the traceparent in its message headers."""
+        trace_id, parent_id = '4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'
+        cache_followers_count.apply(args=[self.author.id], headers={'traceparent': f'00-{trace_id}-{parent_id}-01'})
+
+        task, = [span for span in self.exported_spans() if span['kind'] == tracing.CONSUMER]
+        self.assertEqual((task['traceId'], task['parentSpanId']), (trace_id, parent_id))
+
+    def test_disabled(self):
+        """Test that nothing is traced or exported with TRACING_EXPORTER='none'."""
+        with self.settings(TRACING_EXPORTER='none'):
+            response = self.client.get('/api/user/profile/')
+        self.assertNotIn('X-Trace-Id', response)
+        tracing.flush()
+        self.assertFalse(os.path.exists(self.file))
+
+    def test_parse_traceparent(self):
+        """Test that valid traceparents are parsed and malformed or all-zero ones are rejected."""
+        self.assertEqual(
+            tracing.parse_traceparent('00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'),
+            ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7', True),
+        )
+        for value in ('', 'garbage', '00-00000000000000000000000000000000-00f067aa0ba902b7-01', '00-xyz-abc-01'):
+            self.assertIsNone(tracing.parse_traceparent(value))
@@ -0,0 +1,115 @@
+import datetime
+import unittest
+from unittest.mock import patch
+import redis
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from twitter import trending
+from twitter.models import Post
+from twitter.tasks import rescale_trending_posts
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(f'{settings.REDIS_URL}/15', socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+
+REDIS_CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': f'{settings.REDIS_URL}/15',
+    }
+}
+
+
+@unittest.skipUnless(redis_available(), 'Redis is not available')
+@override_settings(CACHES=REDIS_CACHES, TRENDING_KEY='test:trending:posts')
+class TrendingTest(APITestCase):
+    def setUp(self):
+        trending.get_redis().delete(*trending._keys())
+
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.others = [User.objects.create_user(username=f'user{i}', password='password') for i in range(3)]
+        self.posts = [
+            Post.objects.create(user=self.user, title=f'Post {i}', content='Content') for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        trending.get_redis().flushdb()
+
+    def like(self, user, post):
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/posts/like/', {'post': post.id}, format='json')
+
+    def test_likes_rank_posts(self):
+        """Test that the endpoint returns the most liked posts first, unlikes included."""
+        for user in self.others:
+            self.like(user, self.posts[1])
+        self.like(self.others[0], self.posts[2])
+        self.like(self.others[0], self.posts[0])
+        self.like(self.others[0], self.posts[0])  # unlike
+
+        response = self.client.get('/api/posts/trending/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.data], [self.posts[1].id, self.posts[2].id])
+        self.assertEqual(response.data[0]['likes_count'], 3)
+
+    def test_recent_likes_weigh_more(self):
+        """Test that a like counts for half as much after one half-life."""
+        half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+        with patch('twitter.trending.time.time', return_value=1_000_000):
+            trending.record_like(self.posts[0].id)
+            trending.record_like(self.posts[0].id)
+        with patch('twitter.trending.time.time', return_value=1_000_000 + 2 * half_life):
+            trending.record_like(self.posts[1].id)
+            self.assertEqual(trending.top_post_ids(2), [self.posts[1].id, self.posts[0].id])
+
+            trending.rescale()
+        score = trending.get_redis().zscore(settings.TRENDING_KEY, self.posts[0].id)
+        self.assertAlmostEqual(score, 0.5)
+
+    def test_unlike_removes_the_weight_of_the_like(self):
+        """Test that an unlike subtracts the weight the like had when it was made, not the current one."""
+        half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+        liked_at = datetime.datetime.fromtimestamp(1_000_000, datetime.timezone.utc)
+        with patch('twitter.trending.time.time', return_value=1_000_000):
+            trending.record_like(self.posts[0].id, created_at=liked_at)
+        with patch('twitter.trending.time.time', return_value=1_000_000 + half_life):
+            trending.record_like(self.posts[0].id)
+        with patch('twitter.trending.time.time', return_value=1_000_000 + 2 * half_life):
+            trending.record_like(self.posts[0].id, -1, liked_at)
+            trending.record_like(self.posts[1].id, -1)
+
+        self.assertAlmostEqual(trending.get_redis().zscore(settings.TRENDING_KEY, self.posts[0].id), 2)
+        self.assertEqual(trending.get_redis().zscore(settings.TRENDING_KEY, self.posts[1].id), 0)
+        self.assertEqual(trending.top_post_ids(3), [self.posts[0].id])
+
+    def test_rescale_trims_and_drops_deleted_posts(self):
+        """Test that rescaling keeps only the top TRENDING_MAX_POSTS posts and drops soft-deleted ones."""
+        for weight, post in enumerate(self.posts, start=1):
+            for _ in range(weight):
+                trending.record_like(post.id)
+        self.posts[2].soft_delete()
+
+        with self.settings(TRENDING_MAX_POSTS=1):
+            rescale_trending_posts()
+
+        self.assertEqual(trending.post_ids(), [self.posts[1].id])
+
+    def test_deleted_posts_are_hidden(self):
+        """Test that soft-deleted posts are left out of the endpoint and removed from the set."""
+        trending.record_like(self.posts[0].id)
+        self.posts[0].soft_delete()
+
+        response = self.client.get('/api/posts/trending/')
+
+        self.assertEqual(response.data, [])
+        self.assertEqual(trending.post_ids(), [])
@@ -0,0 +1,121 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from PIL import Image
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from twitter.models import Post, ImageAsset, ImageUpload
+from twitter.tasks import expire_image_uploads
+from twitter.uploads import sniff_content_type
+
+
+def make_png(width=64, height=48):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color='blue').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ImageUploadTest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_UPLOAD_TEMP_DIR=os.path.join(self.media_root, 'uploads'),
+            IMAGE_UPLOAD_CHUNK_SIZE=16,
+        )
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.png = make_png()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def send_chunk(self, upload_id, offset, data):
+        return self.client.generic(
+            'PATCH', f'/api/uploads/{upload_id}/', data,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_single_request_upload(self):
+        """Test that a raw image body is stored and can be attached to a post by upload id."""
+        response = self.client.generic('POST', '/api/uploads/', self.png, content_type='image/png')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['offset'], len(self.png))
+        self.assertEqual(response.data['content_type'], 'image/png')
+
+        response = self.client.post('/api/posts/create/', {
+            'title': 'Photo', 'content': 'Content', 'upload_id': response.data['id'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        post = Post.objects.get()
+        self.assertEqual(post.image_asset.refcount, 1)
+        self.assertTrue(post.image.name.endswith('.png'))
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_resumable_upload(self):
+        """Test that an upload sent in chunks resumes from the offset the server reports."""
+        response = self.client.post('/api/uploads/', {'size': len(self.png)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data['id']
+
+        response = self.send_chunk(upload_id, 0, self.png[:40])
+        self.assertEqual(response['Upload-Offset'], '40')
+
+        # Um trecho fora de ordem é recusado
+        response = self.send_chunk(upload_id, 10, self.png[10:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        offset = int(self.client.head(f'/api/uploads/{upload_id}/')['Upload-Offset'])
+        response = self.send_chunk(upload_id, offset, self.png[offset:])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data['completed_at'])
+        self.assertEqual(ImageAsset.objects.get().size, len(self.png))
+
+    def test_rejects_oversized_upload_by_content_length(self):
+        """Test that a declared size over the limit is rejected before the body is read."""
+        with self.settings(IMAGE_UPLOAD_MAX_SIZE=100):
+            response = self.client.generic('POST', '/api/uploads/', self.png, content_type='image/png')
+            self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+            response = self.client.post('/api/uploads/', {'size': 101}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_rejects_non_image_by_magic_bytes(self):
+        """Test that a body that does not start with an image signature is refused."""
+        response = self.client.generic('POST', '/api/uploads/', b'#!/bin/sh\necho hello\n', content_type='image/png')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_webp_requires_riff_header(self):
+        """Test that WEBP is only recognised inside a RIFF container."""
+        self.assertEqual(sniff_content_type(b'RIFF\x24\x00\x00\x00WEBPVP8 '), 'image/webp')
+        self.assertIsNone(sniff_content_type(b'#!/bin/sWEBPecho'))
+
+    def test_upload_of_another_user_cannot_be_used(self):
+        """Test that a post cannot claim an upload made by someone else."""
+        other = User.objects.create_user(username='other', password='password')
+        upload = ImageUpload.objects.create(user=other, size=1, completed_at=timezone.now())
+
+        response = self.client.post('/api/posts/create/', {
+            'title': 'Photo', 'content': 'Content', 'upload_id': str(upload.id),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_uploads_release_their_image(self):
+        """Test that completed uploads never attached to a post are cleaned up."""
+        response = self.client.generic('POST', '/api/uploads/', self.png, content_type='image/png')
+        ImageUpload.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(expire_image_uploads(), 1)
+        self.assertFalse(ImageUpload.objects.filter(id=response.data['id']).exists())
+        self.assertFalse(ImageAsset.objects.exists())
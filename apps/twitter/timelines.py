@@ -0,0 +1,85 @@
+import base64
+import binascii
+from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from setup.cache import get_or_compute
+from setup.db_routers import pin_primary
+from .models import Post
+from .serializers import PostListSerializer
+
+
+def author_timeline_cache_key(user_id):
+    return f'author_posts_{user_id}'
+
+
+def encode_cursor(row):
+    value = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, id) of the last post of the previous page, or None for the first page."""
+    if not cursor:
+        return None
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_at = datetime.fromisoformat(created_at)
+        # Sem fuso não dá para comparar com os created_at (aware) das linhas
+        if created_at.tzinfo is None:
+            raise ValueError('naive datetime')
+        return created_at, int(post_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+def _author_posts(user_id):
+    return (
+        Post.objects.filter(user_id=user_id)
+        .order_by('-created_at', '-id')
+        .values(*PostListSerializer.values_fields)
+    )
+
+
+def _load_recent_author_posts(user_id):
+    # O cache é refeito logo depois de cada invalidação: uma réplica atrasada guardaria o estado antigo
+    with pin_primary():
+        return list(_author_posts(user_id)[:settings.AUTHOR_TIMELINE_CACHE_SIZE])
+
+
+def recent_author_posts(user_id):
+    """The author's AUTHOR_TIMELINE_CACHE_SIZE most recent posts (`.values()` rows), cached."""
+    return get_or_compute(
+        author_timeline_cache_key(user_id),
+        lambda: _load_recent_author_posts(user_id),
+        timeout=settings.AUTHOR_TIMELINE_CACHE_SECONDS,
+    )
+
+
+def invalidate_author_timeline(user_id):
+    cache.delete(author_timeline_cache_key(user_id))
+
+
+def author_posts_page(user_id, cursor, page_size):
+    """
+    One keyset page of the author's timeline: (rows, has_next).
+
+    Pages inside the cached recent posts come from the cache; deeper pages seek on
+    (created_at, id) through the `post_user_deleted_created_idx` index.
+    """
+    recent = recent_author_posts(user_id)
+    candidates = recent if cursor is None else [row for row in recent if (row['created_at'], row['id']) < cursor]
+
+    # O cache cobre a página se tiver um item além dela ou se já contiver todos os posts do autor
+    if len(candidates) > page_size or len(recent) < settings.AUTHOR_TIMELINE_CACHE_SIZE:
+        rows = candidates[:page_size + 1]
+    else:
+        queryset = _author_posts(user_id)
+        if cursor is not None:
+            created_at, post_id = cursor
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id))
+        rows = list(queryset[:page_size + 1])
+
+    return rows[:page_size], len(rows) > page_size
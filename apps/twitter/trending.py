@@ -0,0 +1,93 @@
+import math
+import time
+from django.conf import settings
+from setup.connections import get_redis
+
+
+# Pontuação com decaimento exponencial "para frente": cada like vale exp((criação - época) / tau),
+# então um like recente pesa mais que um antigo sem precisar reescrever o set a cada leitura.
+# O reescalonamento periódico divide tudo por exp((agora - época) / tau) e move a época para agora.
+# Desfazer um like subtrai o peso que ele ganhou quando foi criado; o resto de ponto flutuante
+# que sobra fica preso em zero em vez de negativo.
+INCREMENT_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    epoch = tonumber(ARGV[1])
+    redis.call('SET', KEYS[2], ARGV[1])
+end
+local score = redis.call('ZINCRBY', KEYS[1], tonumber(ARGV[3]) * math.exp((tonumber(ARGV[5]) - epoch) / tonumber(ARGV[2])), ARGV[4])
+if tonumber(score) < 0 then
+    redis.call('ZADD', KEYS[1], 0, ARGV[4])
+    score = '0'
+end
+return score
+"""
+
+RESCALE_SCRIPT = """
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+local now = tonumber(ARGV[1])
+if epoch and now > epoch then
+    local factor = math.exp((epoch - now) / tonumber(ARGV[2]))
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', factor)
+end
+redis.call('SET', KEYS[2], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[4])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[3]) + 1))
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+def _keys():
+    key = settings.TRENDING_KEY
+    return [key, f'{key}:epoch']
+
+
+def _tau():
+    # Meia-vida em horas -> constante de tempo (segundos) do decaimento
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def record_like(post_id, delta=1, created_at=None):
+    """
+    Add (or, with delta=-1, remove) the weight of a like made at `created_at` (default: now)
+    to the post's trending score. O(log n).
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    now = time.time()
+    liked_at = now if created_at is None else created_at.timestamp()
+    return client.register_script(INCREMENT_SCRIPT)(keys=_keys(), args=[now, _tau(), delta, post_id, liked_at])
+
+
+def rescale(max_posts=None, min_score=None):
+    """Bring the scores back to the current epoch and keep only the top `max_posts` posts."""
+    client = get_redis()
+    if client is None:
+        return 0
+
+    max_posts = settings.TRENDING_MAX_POSTS if max_posts is None else max_posts
+    min_score = settings.TRENDING_MIN_SCORE if min_score is None else min_score
+    return client.register_script(RESCALE_SCRIPT)(keys=_keys(), args=[time.time(), _tau(), max_posts, min_score])
+
+
+def top_post_ids(limit):
+    """Ids of the `limit` best-scored posts above TRENDING_MIN_SCORE, best first. O(log n + limit)."""
+    client = get_redis()
+    if client is None:
+        return []
+    post_ids = client.zrevrangebyscore(settings.TRENDING_KEY, '+inf', settings.TRENDING_MIN_SCORE, start=0, num=limit)
+    return [int(post_id) for post_id in post_ids]
+
+
+def post_ids():
+    client = get_redis()
+    if client is None:
+        return []
+    return [int(post_id) for post_id in client.zrange(settings.TRENDING_KEY, 0, -1)]
+
+
+def discard_posts(*post_ids):
+    client = get_redis()
+    if client is not None and post_ids:
+        client.zrem(settings.TRENDING_KEY, *post_ids)
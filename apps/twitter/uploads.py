@@ -0,0 +1,185 @@
+import os
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from .images import store_image, release_image
+from .models import ImageUpload
+
+
+# Assinaturas (magic bytes) aceitas: ((deslocamento, prefixo), ...), content type, extensão
+IMAGE_SIGNATURES = [
+    (((0, b'\xff\xd8\xff'),), 'image/jpeg', '.jpg'),
+    (((0, b'\x89PNG\r\n\x1a\n'),), 'image/png', '.png'),
+    (((0, b'GIF87a'),), 'image/gif', '.gif'),
+    (((0, b'GIF89a'),), 'image/gif', '.gif'),
+    # Contêiner RIFF com o tipo WEBP (outros RIFF, como WAV e AVI, têm o mesmo cabeçalho)
+    (((0, b'RIFF'), (8, b'WEBP')), 'image/webp', '.webp'),
+]
+SIGNATURE_LENGTH = 12
+
+EXTENSIONS = {content_type: ext for _, content_type, ext in IMAGE_SIGNATURES}
+
+
+class PayloadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Image file size should not exceed the upload limit.'
+    default_code = 'payload_too_large'
+
+
+class LengthRequired(APIException):
+    status_code = status.HTTP_411_LENGTH_REQUIRED
+    default_detail = 'Content-Length header is required.'
+    default_code = 'length_required'
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Upload offset does not match.'
+    default_code = 'upload_conflict'
+
+
+def sniff_content_type(head):
+    """Content type from the first bytes of a file, or None if they do not belong to a supported image."""
+    for parts, content_type, _ in IMAGE_SIGNATURES:
+        if all(head[start:start + len(prefix)] == prefix for start, prefix in parts):
+            return content_type
+    return None
+
+
+def check_size(size):
+    if size is None:
+        raise LengthRequired()
+    if size <= 0:
+        raise ValidationError({'size': 'Upload size must be greater than zero.'})
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise PayloadTooLarge()
+
+
+def content_length(request):
+    try:
+        return int(request.META['CONTENT_LENGTH'])
+    except (KeyError, ValueError):
+        return None
+
+
+def start_upload(user, size):
+    """Open a resumable upload of `size` bytes (rejected right away if over IMAGE_UPLOAD_MAX_SIZE)."""
+    check_size(size)
+    upload = ImageUpload.objects.create(user=user, size=size)
+    os.makedirs(settings.IMAGE_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(upload.temp_path, 'wb').close()
+    return upload
+
+
+def _lock_key(upload_id):
+    return f'image_upload_{upload_id}:lock'
+
+
+def append_chunk(upload, stream, offset, length):
+    """
+    Stream `length` bytes of the request body into the upload's temporary file, starting at `offset`.
+
+    The body is read in IMAGE_UPLOAD_CHUNK_SIZE blocks and never held in memory as a whole. If the
+    client disconnects, the bytes already written are kept and the upload can resume from `upload.offset`.
+    """
+    if length is None:
+        raise LengthRequired()
+    if upload.completed_at is not None or offset != upload.offset:
+        raise UploadConflict({'detail': 'Upload offset does not match.', 'offset': upload.offset})
+    if offset + length > upload.size:
+        raise PayloadTooLarge()
+
+    # Um envio por vez para cada upload (o mesmo lock via cache.add usado em setup/cache.py)
+    if not cache.add(_lock_key(upload.id), 1, 60):
+        raise UploadConflict({'detail': 'Another chunk is being uploaded.', 'offset': upload.offset})
+
+    written = 0
+    try:
+        with open(upload.temp_path, 'r+b') as target:
+            # Descarta bytes de um envio anterior que não chegou a ser registrado
+            target.truncate(offset)
+            target.seek(offset)
+
+            try:
+                while written < length:
+                    block = stream.read(min(settings.IMAGE_UPLOAD_CHUNK_SIZE, length - written))
+                    if not block:
+                        break
+                    if offset == 0 and written == 0:
+                        head = block[:SIGNATURE_LENGTH]
+                        content_type = sniff_content_type(head)
+                        if content_type is None and len(head) == min(SIGNATURE_LENGTH, upload.size):
+                            raise ValidationError({'detail': 'Uploaded file must be an image.'})
+                        upload.content_type = content_type or ''
+                    target.write(block)
+                    written += len(block)
+            except (UnreadablePostError, OSError):
+                pass
+
+        upload.offset = offset + written
+        upload.save(update_fields=['offset', 'content_type', 'updated_at'])
+    finally:
+        cache.delete(_lock_key(upload.id))
+
+    if upload.offset == upload.size:
+        complete_upload(upload)
+    return upload
+
+
+def complete_upload(upload):
+    """Validate the received file and store it by content hash; the upload keeps the asset reference."""
+    try:
+        with open(upload.temp_path, 'rb') as source:
+            content_type = sniff_content_type(source.read(SIGNATURE_LENGTH))
+            source.seek(0)
+            Image.open(source).verify()
+    except Exception:
+        discard_upload(upload)
+        raise ValidationError({'detail': 'Uploaded file must be a valid image.'})
+
+    if content_type is None:
+        discard_upload(upload)
+        raise ValidationError({'detail': 'Uploaded file must be an image.'})
+
+    with open(upload.temp_path, 'rb') as source:
+        with transaction.atomic():
+            upload.image_asset = store_image(File(source, name=f'{upload.id}{EXTENSIONS[content_type]}'))
+            upload.content_type = content_type
+            upload.completed_at = timezone.now()
+            upload.save(update_fields=['image_asset', 'content_type', 'completed_at', 'updated_at'])
+
+    _remove_temp_file(upload)
+    return upload
+
+
+def _remove_temp_file(upload):
+    try:
+        os.remove(upload.temp_path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_upload(upload):
+    """Delete an upload and its temporary file (an unclaimed asset reference is handed back)."""
+    _remove_temp_file(upload)
+    with transaction.atomic():
+        if ImageUpload.objects.filter(id=upload.id).delete()[0] and upload.image_asset_id:
+            release_image(upload.image_asset_id)
+
+
+def claim_upload(upload_id, user):
+    """Take the image of a completed upload for a post; the upload's asset reference moves to the post."""
+    upload = ImageUpload.objects.filter(id=upload_id, user=user, completed_at__isnull=False).first()
+    if upload is None or upload.image_asset_id is None:
+        raise ValidationError({'upload_id': 'Upload not found or not completed.'})
+
+    # Só um post pode ficar com a referência, mesmo com duas requisições ao mesmo tempo
+    if not ImageUpload.objects.filter(id=upload.id).delete()[0]:
+        raise ValidationError({'upload_id': 'Upload not found or not completed.'})
+    return upload.image_asset
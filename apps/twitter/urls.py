@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CreatePostViewSet, 
-    UpdatePostViewSet, DeletePostViewSet, PostList, LikeViewSet
+    UpdatePostViewSet, DeletePostViewSet, PostList, TrendingPostList, LikeViewSet,
+    ImageUploadView, ImageUploadDetailView, AuthorPostList,
     )
 from users.views import FollowViewSet
 
@@ -18,10 +19,16 @@ urlpatterns = [
     
     # Rotas de posts
     path('posts/feed/', PostList.as_view(), name='post_feed'),
+    path('posts/trending/', TrendingPostList.as_view(), name='post_trending'),
     path('posts/update/<int:pk>/', UpdatePostViewSet.as_view({'put': 'update', 'get': 'retrieve'}), name='update_post'),
     path('posts/delete/<int:pk>', DeletePostViewSet.as_view({'delete': 'destroy'}), name='delete_post'),
+
+    # Upload de imagens em partes (o id retornado vai em `upload_id` ao criar o post)
+    path('uploads/', ImageUploadView.as_view(), name='image_upload'),
+    path('uploads/<uuid:pk>/', ImageUploadDetailView.as_view(), name='image_upload_detail'),
     
     # Rotas de usuários e interações de follow
+    path('user/<int:user_id>/posts/', AuthorPostList.as_view(), name='author_posts'),
     path('user/', include('users.urls')),
     
     # Inclui rotas registradas no router
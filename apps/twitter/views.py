@@ -1,12 +1,22 @@
-from django.core.cache import cache
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status, viewsets, mixins, filters
 from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
-from rest_framework.exceptions import PermissionDenied
-from .models import Post, Like, Follow
+from rest_framework.exceptions import PermissionDenied, NotFound
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from setup.db_routers import ReplicaReadMixin
+from .models import Post, Like, Follow, ImageUpload
 from .tasks import update_likes_for_user
-from .serializers import PostSerializer, LikeSerializer, PostListSerializer
+from .serializers import PostSerializer, LikeSerializer, PostListSerializer, ImageUploadSerializer
+from .fast_serialization import FastListMixin
+from .uploads import start_upload, append_chunk, content_length
+from . import trending
+from .ranking import ranked_feed_ids
+from .timelines import author_posts_page, decode_cursor, encode_cursor, invalidate_author_timeline
 
 
 class CreatePostViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
@@ -16,6 +26,7 @@ class CreatePostViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        invalidate_author_timeline(self.request.user.id)
     
     def get_view_name(self):
         return "Create Post"
@@ -27,7 +38,7 @@ class UpdatePostViewSet(mixins.UpdateModelMixin, mixins.RetrieveModelMixin, view
 
     def get_queryset(self):
         """Limita a busca aos posts do usuário autenticado que não foram deletados."""
-        return Post.objects.filter(user=self.request.user, deleted_post=False)
+        return Post.objects.filter(user=self.request.user)
 
     def perform_update(self, serializer):
         """Verifica se o usuário é o dono do post antes de salvar as alterações."""
@@ -38,6 +49,7 @@ class UpdatePostViewSet(mixins.UpdateModelMixin, mixins.RetrieveModelMixin, view
 
         # Salva as alterações se a permissão for concedida
         serializer.save()
+        invalidate_author_timeline(post.user_id)
 
     def retrieve(self, request, *args, **kwargs):
         """Obtém o post e retorna os dados preenchidos, se não estiver deletado."""
@@ -55,20 +67,44 @@ class DeletePostViewSet(mixins.DestroyModelMixin, viewsets.GenericViewSet):
     serializer_class = PostSerializer
 
     def get_queryset(self):
-        # Limita a busca aos posts do usuário autenticado
-        return Post.objects.filter(user=self.request.user, deleted_post=False)
+        # Limita a busca aos posts do usuário autenticado (o manager já oculta os deletados)
+        return Post.objects.filter(user=self.request.user)
 
     def perform_destroy(self, instance):
         # Verifica se o usuário é o dono do post
         if instance.user != self.request.user:
             raise PermissionDenied("Você não tem permissão para deletar este post.")
         # Marca o post como deletado (exclusão lógica)
-        instance.deleted_post = True
-        instance.save()
+        instance.soft_delete()
+        invalidate_author_timeline(instance.user_id)
         return Response({"detail": "Post deletado com sucesso."}, status=status.HTTP_204_NO_CONTENT)
 
 
-class PostList(generics.ListAPIView):
+class OrderedPostsMixin:
+    """Load the posts of an id list that comes ranked from elsewhere and serialize them in that order."""
+
+    def load_posts(self, post_ids):
+        queryset = Post.objects.filter(id__in=post_ids)
+        if getattr(settings, 'FAST_LIST_SERIALIZATION', False):
+            return {row['id']: row for row in queryset.values(*self.get_serializer_class().values_fields)}
+        return queryset.select_related('user', 'image_asset').in_bulk()
+
+    def serialize_posts(self, post_ids, posts):
+        post_ids = [post_id for post_id in post_ids if post_id in posts]
+        page = [posts[post_id] for post_id in post_ids]
+        likes_counts = Post.get_likes_counts(post_ids, local=True)
+
+        if getattr(settings, 'FAST_LIST_SERIALIZATION', False):
+            for row in page:
+                row['likes_count'] = likes_counts[row['id']]
+            return self.get_serializer_class().fast_representation(page, self.get_serializer_context())
+
+        for post in page:
+            post.likes_count = likes_counts[post.id]
+        return self.get_serializer(page, many=True).data
+
+
+class PostList(ReplicaReadMixin, OrderedPostsMixin, FastListMixin, generics.ListAPIView):
     serializer_class = PostListSerializer
     throttle_classes = [UserRateThrottle]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -79,18 +115,96 @@ class PostList(generics.ListAPIView):
         followed_users = Follow.objects.filter(follower=self.request.user).values_list('followed', flat=True)
 
         # Filtra os posts dos usuários seguidos e ordena por data de criação
-        posts = Post.objects.filter(user__in=followed_users, deleted_post=False).order_by('-created_at')
+        return Post.objects.filter(user__in=followed_users).select_related('user', 'image_asset').order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('order') != 'ranked':
+            return super().list(request, *args, **kwargs)
+
+        # `?order=ranked`: a página é um recorte dos ids ranqueados, que ficam em cache por alguns minutos
+        ranked_ids = ranked_feed_ids(request.user)
+        queryset = self.get_queryset()
+        filtered = self.filter_queryset(queryset)
+        if filtered is not queryset:
+            # Busca e filtros valem também no ranking: ficam só os ids que passam, na ordem do ranking
+            matching = set(filtered.filter(id__in=ranked_ids).values_list('id', flat=True))
+            ranked_ids = [post_id for post_id in ranked_ids if post_id in matching]
+        page_ids = self.paginator.paginate_queryset(ranked_ids, request, view=self)
+        return self.get_paginated_response(self.serialize_posts(page_ids, self.load_posts(page_ids)))
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+
+        # Atualiza a contagem de likes só dos posts da página, com uma leitura em lote do cache.
+        # No modo rápido a página tem linhas de `.values()` em vez de instâncias.
+        if page is not None:
+            page = list(page)
+            post_ids = [post['id'] if isinstance(post, dict) else post.id for post in page]
+            likes_counts = Post.get_likes_counts(post_ids, local=True)
+            for post in page:
+                if isinstance(post, dict):
+                    post['likes_count'] = likes_counts[post['id']]
+                else:
+                    post.likes_count = likes_counts[post.id]
+        return page
+
+
+class TrendingPostList(ReplicaReadMixin, OrderedPostsMixin, generics.ListAPIView):
+    """
+    Posts with the most recent likes (`?limit=`, 20 by default), read from the trending sorted set.
+
+    The ranking never touches the Like table: the ids come from Redis and the posts are loaded in one query.
+    """
+    serializer_class = PostListSerializer
+    throttle_classes = [UserRateThrottle]
+    pagination_class = None
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', settings.TRENDING_DEFAULT_LIMIT))
+        except ValueError:
+            limit = settings.TRENDING_DEFAULT_LIMIT
+        return max(1, min(limit, settings.TRENDING_MAX_LIMIT))
+
+    def list(self, request, *args, **kwargs):
+        limit = self.get_limit()
+        # Busca alguns a mais para cobrir posts deletados que ainda estão no set
+        post_ids = trending.top_post_ids(limit * 2)
+        posts = self.load_posts(post_ids)
+
+        trending.discard_posts(*[post_id for post_id in post_ids if post_id not in posts])
+        page_ids = [post_id for post_id in post_ids if post_id in posts][:limit]
+        return Response(self.serialize_posts(page_ids, posts))
+
+
+class AuthorPostList(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Timeline of one author (`/api/user/<id>/posts/`), newest first, with keyset pagination (`?cursor=`).
 
-        # Atualiza a contagem de likes de cada post utilizando o cache
-        for post in posts:
-            cache_key = f'post_{post.id}_likes'
-            likes_count = cache.get(cache_key)
-            if likes_count is None:
-                # Se não está no cache, conta os likes e atualiza o cache
-                likes_count = post.likes.count()  # ou use post.get_likes_count()
-                cache.set(cache_key, likes_count, timeout=60 * 15)
-            post.likes_count = likes_count  # Atribui a contagem de likes ao atributo do post
-        return posts
+    The first pages come from the author's cached recent posts, invalidated when they create,
+    update or delete a post.
+    """
+    serializer_class = PostListSerializer
+    throttle_classes = [UserRateThrottle]
+    pagination_class = None
+
+    def get(self, request, user_id, *args, **kwargs):
+        cursor = decode_cursor(request.query_params.get('cursor'))
+        rows, has_next = author_posts_page(user_id, cursor, api_settings.PAGE_SIZE)
+        if not rows and cursor is None and not User.objects.filter(id=user_id).exists():
+            raise NotFound({"detail": "User not found."})
+
+        likes_counts = Post.get_likes_counts([row['id'] for row in rows], local=True)
+        # Cópias: as linhas em cache não recebem a contagem de likes
+        rows = [dict(row, likes_count=likes_counts[row['id']]) for row in rows]
+
+        next_url = None
+        if has_next:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(rows[-1]))
+        return Response({
+            'next': next_url,
+            'results': PostListSerializer.fast_representation(rows, self.get_serializer_context()),
+        })
 
 
 class LikeViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
@@ -100,24 +214,77 @@ class LikeViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
 
     def create(self, request, *args, **kwargs):
         post_id = request.data.get('post')
-        post = Post.objects.get(pk=post_id)
+        post = get_object_or_404(Post, pk=post_id)
 
         existing_like = Like.objects.filter(user=request.user, post=post).first()
 
         if existing_like:
             existing_like.delete()
-            # Atualiza o cache após adicionar o like
-            update_likes_for_user(request.user.id)
+            trending.record_like(post.id, -1, existing_like.created_at)
+            # Renova as contagens do feed de quem curtiu fora da requisição (a do post já foi somada pelo signal)
+            update_likes_for_user.delay(request.user.id)
             return Response(
                 {"detail": "Like removed successfully."},
                 status=status.HTTP_200_OK
             )
         else:
             like = Like.objects.create(user=request.user, post=post)
+            trending.record_like(post.id, created_at=like.created_at)
             serializer = self.get_serializer(like)
-            # Atualiza o cache após adicionar o like
-            update_likes_for_user(request.user.id)
+            # Renova as contagens do feed de quem curtiu fora da requisição (a do post já foi somada pelo signal)
+            update_likes_for_user.delay(request.user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     def get_view_name(self):
-        return "Like Post"
\ No newline at end of file
+        return "Like Post"
+
+class ImageUploadView(generics.GenericAPIView):
+    """
+    Start an image upload.
+
+    JSON body `{"size": <bytes>}` opens a resumable upload, sent in chunks with PATCH to
+    /api/uploads/<id>/. Any other body is taken as the raw image and streamed in a single request.
+    The returned `id` goes in `upload_id` when creating or updating a post.
+    """
+    serializer_class = ImageUploadSerializer
+    throttle_classes = [UserRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type.startswith('application/json'):
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            upload = start_upload(request.user, serializer.validated_data['size'])
+        else:
+            # O corpo é lido direto do stream: o tamanho é conferido antes de qualquer byte ser lido
+            size = content_length(request)
+            upload = start_upload(request.user, size)
+            append_chunk(upload, request.stream, 0, size)
+
+        return upload_response(upload, status.HTTP_201_CREATED)
+
+
+class ImageUploadDetailView(generics.GenericAPIView):
+    """Upload progress (GET/HEAD) and chunk upload (PATCH with the `Upload-Offset` header)."""
+    serializer_class = ImageUploadSerializer
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        return upload_response(self.get_object())
+
+    def patch(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({"detail": "Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        append_chunk(upload, request.stream, offset, content_length(request))
+        return upload_response(upload)
+
+
+def upload_response(upload, status_code=status.HTTP_200_OK):
+    response = Response(ImageUploadSerializer(upload).data, status=status_code)
+    response['Upload-Offset'] = str(upload.offset)
+    return response
@@ -1,3 +1,5 @@
 from django.db import models
 
-# Create your models here.
+
+def user_cache_key(user_id):
+    return f'user_{user_id}_object'
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from twitter.models import Follow
+from twitter.fast_serialization import datetime_representation, output_timezone
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -35,7 +36,28 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'email', 'date_joined', 'followers_count', 'followed_count')
 
     def get_followers_count(self, obj):
-        return Follow.get_followers_count(obj)
+        return Follow.get_followers_count(obj, local=True)
 
     def get_followed_count(self, obj):
-        return Follow.get_followed_count(obj)
+        return Follow.get_followed_count(obj, local=True)
+
+    # Modo rápido (FastListMixin): contagens buscadas em lote para a página inteira
+    values_fields = ('id', 'username', 'email', 'date_joined')
+
+    @classmethod
+    def fast_representation(cls, rows, context):
+        tz = output_timezone()
+        user_ids = [row['id'] for row in rows]
+        followers_counts = Follow.get_followers_counts(user_ids, local=True)
+        followed_counts = Follow.get_followed_counts(user_ids, local=True)
+        return [
+            {
+                'id': row['id'],
+                'username': row['username'],
+                'email': row['email'],
+                'date_joined': datetime_representation(row['date_joined'], tz),
+                'followers_count': followers_counts[row['id']],
+                'followed_count': followed_counts[row['id']],
+            }
+            for row in rows
+        ]
@@ -0,0 +1,12 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.models import user_cache_key
+from setup.local_cache import invalidate
+
+
+# Descarta o usuário do cache local de todos os processos quando ele muda
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate(user_cache_key(instance.id))
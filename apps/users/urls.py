@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
     FollowedListView, FollowerListView, 
-    UserListView, UserProfileView
+    UserListView, UserProfileView, FollowSuggestionsView,
+    RelationshipsView, MutualFollowListView,
 )
 
 
@@ -9,6 +10,9 @@ urlpatterns = [
     # Rotas de usuários e interações de follow
     path('following/', FollowedListView.as_view(), name='user_followed'),
     path('followers/', FollowerListView.as_view(), name='user_followers'),
+    path('mutuals/', MutualFollowListView.as_view(), name='user_mutuals'),
+    path('relationships/', RelationshipsView.as_view(), name='user_relationships'),
     path('user_list/', UserListView.as_view(), name='user_list'),
     path('profile/', UserProfileView.as_view(), name='user_profile'),
+    path('suggestions/', FollowSuggestionsView.as_view(), name='follow_suggestions'),
 ]
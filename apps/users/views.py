@@ -1,4 +1,5 @@
 import time
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.models import User
 from django.db.models import Count
@@ -7,9 +8,12 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status, viewsets, mixins, filters
 from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
+from setup.db_routers import ReplicaReadMixin
 from twitter.models import Post, Like, Follow
 from twitter.serializers import LikeSerializer, FollowSerializer, FollowedListSerializer, FollowerListSerializer
 from .serializers import UserSerializer
+from twitter.fast_serialization import FastListMixin
+from twitter.suggestions import get_suggestions
 from apps.twitter.tasks import send_follower_notification, update_likes_for_user, cache_followers_count
 
 
@@ -53,27 +57,27 @@ class FollowViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
         return "Follow/Unfollow User"
 
 
-class FollowedListView(generics.ListAPIView):
+class FollowedListView(ReplicaReadMixin, FastListMixin, generics.ListAPIView):
     serializer_class = FollowedListSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['followed_username']
     throttle_classes = [UserRateThrottle]
 
     def get_queryset(self):
-        return Follow.objects.filter(follower=self.request.user).order_by('-created_at')
+        return Follow.objects.filter(follower=self.request.user).select_related('followed').order_by('-created_at')
 
 
-class FollowerListView(generics.ListAPIView):
+class FollowerListView(ReplicaReadMixin, FastListMixin, generics.ListAPIView):
     serializer_class = FollowerListSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['follower__username']
     throttle_classes = [UserRateThrottle]
     
     def get_queryset(self):
-        return Follow.objects.filter(followed=self.request.user).order_by('-created_at')
+        return Follow.objects.filter(followed=self.request.user).select_related('follower').order_by('-created_at')
 
 
-class UserListView(generics.ListAPIView):
+class UserListView(ReplicaReadMixin, FastListMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     throttle_classes = [UserRateThrottle]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -90,4 +94,59 @@ class UserProfileView(generics.RetrieveAPIView):
     throttle_classes = [UserRateThrottle]
 
     def get_object(self):
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+
+class RelationshipsView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Relationship with a batch of users in one request: `?ids=1,2,3` (up to RELATIONSHIPS_MAX_IDS).
+
+    For each id: whether you follow them, they follow you, both, and which of the people you
+    follow also follow them (count plus the first RELATIONSHIPS_COMMON_SAMPLE usernames).
+    """
+    throttle_classes = [UserRateThrottle]
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        try:
+            user_ids = list(dict.fromkeys(int(value) for value in request.query_params.get('ids', '').split(',') if value))
+        except ValueError:
+            return Response({"detail": "ids must be a comma-separated list of user ids."}, status=status.HTTP_400_BAD_REQUEST)
+        if not user_ids:
+            return Response({"detail": "ids not provided."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > settings.RELATIONSHIPS_MAX_IDS:
+            return Response(
+                {"detail": f"At most {settings.RELATIONSHIPS_MAX_IDS} ids per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        relationships = Follow.relationships(request.user, user_ids)
+        in_common = Follow.followers_in_common(request.user, user_ids, settings.RELATIONSHIPS_COMMON_SAMPLE)
+
+        return Response([
+            {
+                'id': user_id,
+                **relationships[user_id],
+                'followers_you_follow_count': in_common[user_id][0],
+                'followers_you_follow': [username for _, username in in_common[user_id][1]],
+            }
+            for user_id in user_ids
+        ])
+
+
+class MutualFollowListView(ReplicaReadMixin, FastListMixin, generics.ListAPIView):
+    """Users you follow who follow you back."""
+    serializer_class = FollowedListSerializer
+    throttle_classes = [UserRateThrottle]
+
+    def get_queryset(self):
+        return Follow.mutuals(self.request.user).order_by('-created_at')
+
+
+class FollowSuggestionsView(generics.GenericAPIView):
+    """"Who to follow": friends of friends computed nightly, served straight from the cache."""
+    throttle_classes = [UserRateThrottle]
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_suggestions(request.user.id))
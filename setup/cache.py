@@ -0,0 +1,281 @@
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from setup.connections import get_redis
+from setup.local_cache import local_cache, stats, ensure_subscriber, MISSING
+
+
+DEFAULT_TIMEOUT = 60 * 15
+
+# Apaga cada lock só se ainda guarda o token de quem o pegou (o lock pode ter expirado e sido pego por outro)
+RELEASE_SCRIPT = """
+local released = 0
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[i] then
+        released = released + redis.call('DEL', key)
+    end
+end
+return released
+"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _meta_key(key):
+    return f'{key}:meta'
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def jittered(timeout):
+    """Spread a TTL by ±CACHE_TTL_JITTER so keys written together do not expire together."""
+    jitter = _setting('CACHE_TTL_JITTER', 0.1)
+    return max(1, int(timeout * (1 + random.uniform(-jitter, jitter))))
+
+
+def _is_fresh(meta, now):
+    # Sem metadados (valor gravado por código antigo), o valor é considerado válido
+    if not meta:
+        return True
+
+    # XFetch: quanto mais perto da expiração e mais caro o recálculo, maior a chance de renovar antes
+    expires_at, delta = meta
+    beta = _setting('CACHE_EARLY_REFRESH_BETA', 1.0)
+    return now - delta * beta * math.log(1 - random.random()) < expires_at
+
+
+def set_cached(key, value, timeout=DEFAULT_TIMEOUT, delta=0.0):
+    """Store a value with its soft expiry; it stays readable (stale) for CACHE_STALE_TTL more seconds."""
+    set_many_cached({key: value}, timeout=timeout, delta=delta)
+
+
+def _entries(values, timeout, delta):
+    now = time.time()
+    entries = {}
+    for key, value in values.items():
+        entries[key] = value
+        entries[_meta_key(key)] = (now + jittered(timeout), delta)
+
+    # O TTL real cobre a maior expiração possível mais a janela em que o valor antigo ainda é servido
+    hard_timeout = int(timeout * (1 + _setting('CACHE_TTL_JITTER', 0.1))) + _setting('CACHE_STALE_TTL', 60)
+    return entries, hard_timeout
+
+
+def set_many_cached(values, timeout=DEFAULT_TIMEOUT, delta=0.0):
+    """Store several values at once, each with its own jittered soft expiry."""
+    if not values:
+        return
+
+    entries, hard_timeout = _entries(values, timeout, delta)
+    cache.set_many(entries, timeout=hard_timeout)
+
+
+def add_many_cached(values, timeout=DEFAULT_TIMEOUT, delta=0.0):
+    """
+    Like `set_many_cached`, but only for the keys that are not cached yet, so values kept up to
+    date in place (INCR counters) are never replaced. Returns how many values were added.
+    """
+    if not values:
+        return 0
+
+    entries, hard_timeout = _entries(values, timeout, delta)
+    # Os backends instrumentados fazem um SET NX em lote; os demais, um add por chave
+    if hasattr(cache, 'add_many'):
+        existing = set(cache.add_many(entries, timeout=hard_timeout))
+    else:
+        existing = {key for key, value in entries.items() if not cache.add(key, value, timeout=hard_timeout)}
+    return sum(key not in existing for key in values)
+
+
+def acquire_lock(lock_key, timeout):
+    """Take the lock with `cache.add` and return its token, or None if another caller holds it."""
+    # Inteiros ficam como inteiros nativos no Redis, o que permite comparar o token no script
+    token = random.getrandbits(62) + 1
+    return token if cache.add(lock_key, token, timeout) else None
+
+
+def release_locks(tokens):
+    """Release the locks of {lock_key: token} that still hold our token."""
+    if not tokens:
+        return
+    client = get_redis()
+    if client is not None:
+        client.register_script(RELEASE_SCRIPT)(
+            keys=[cache.make_key(lock_key) for lock_key in tokens],
+            args=list(tokens.values()),
+        )
+        return
+    # Sem Redis (locmem) a comparação não é atômica, mas o cache é do próprio processo
+    for lock_key, token in tokens.items():
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _recompute(key, compute, timeout, token):
+    try:
+        start = time.time()
+        value = compute()
+        set_cached(key, value, timeout=timeout, delta=time.time() - start)
+        return value
+    finally:
+        release_locks({_lock_key(key): token})
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, force=False, local=False):
+    """
+    Return the cached value for `key`, computing it with `compute()` when needed.
+
+    Only one caller recomputes an expired key (lock via `cache.add`); the others keep serving the
+    stale value or, on a cold miss, wait up to CACHE_LOCK_WAIT seconds for the lock holder.
+    With `local=True` the value is also kept in the in-process L1 cache (see setup/local_cache.py).
+    """
+    if force:
+        start = time.time()
+        value = compute()
+        set_cached(key, value, timeout=timeout, delta=time.time() - start)
+        if local:
+            local_cache.set(key, value)
+        return value
+
+    if local:
+        ensure_subscriber()
+        value = local_cache.get(key)
+        if value is not MISSING:
+            stats.incr('l1_hits')
+            return value
+        stats.incr('l1_misses')
+        value = _get_or_compute(key, compute, timeout)
+        local_cache.set(key, value)
+        return value
+
+    return _get_or_compute(key, compute, timeout)
+
+
+def _get_or_compute(key, compute, timeout):
+    lock_key = _lock_key(key)
+    lock_timeout = _setting('CACHE_LOCK_TIMEOUT', 10)
+    values = cache.get_many([key, _meta_key(key)])
+    value = values.get(key)
+    stats.incr('l2_hits' if value is not None else 'l2_misses')
+
+    if value is not None and _is_fresh(values.get(_meta_key(key)), time.time()):
+        return value
+
+    token = acquire_lock(lock_key, lock_timeout)
+    if token is not None:
+        return _recompute(key, compute, timeout, token)
+    # Stale-while-revalidate: se outro processo já está recalculando, serve o valor antigo
+    if value is not None:
+        return value
+
+    # Outro processo está calculando: espera um pouco pelo resultado dele
+    value = _wait_for({key: key}).get(key)
+    return value if value is not None else compute()
+
+
+def _wait_for(keys):
+    """Poll for up to CACHE_LOCK_WAIT seconds for the values other lock holders are computing."""
+    found = {}
+    pending = dict(keys)
+    deadline = time.time() + _setting('CACHE_LOCK_WAIT', 0.5)
+    while pending and time.time() < deadline:
+        time.sleep(0.05)
+        values = cache.get_many(list(pending.values()))
+        for item_id, key in list(pending.items()):
+            if values.get(key) is not None:
+                found[item_id] = values[key]
+                del pending[item_id]
+    return found
+
+
+def get_many_or_compute(keys, compute_missing, timeout=DEFAULT_TIMEOUT, default=0, local=False):
+    """
+    Batch version of `get_or_compute` for a dict of {id: cache_key}.
+
+    `compute_missing(ids)` must return {id: value} for the ids that are missing or due for refresh
+    (ids left out get `default`); it runs once per call, so a cold page costs a single query.
+    """
+    if not keys:
+        return {}
+
+    if local:
+        ensure_subscriber()
+        result = {}
+        remaining = {}
+        for item_id, key in keys.items():
+            value = local_cache.get(key)
+            if value is MISSING:
+                remaining[item_id] = key
+            else:
+                result[item_id] = value
+        stats.incr('l1_hits', len(result))
+        stats.incr('l1_misses', len(remaining))
+
+        if remaining:
+            fetched = _get_many_or_compute(remaining, compute_missing, timeout, default)
+            for item_id, value in fetched.items():
+                local_cache.set(remaining[item_id], value)
+            result.update(fetched)
+        return result
+
+    return _get_many_or_compute(keys, compute_missing, timeout, default)
+
+
+def _get_many_or_compute(keys, compute_missing, timeout, default):
+    lookup = list(keys.values()) + [_meta_key(key) for key in keys.values()]
+    cached = cache.get_many(lookup)
+    lock_timeout = _setting('CACHE_LOCK_TIMEOUT', 10)
+    now = time.time()
+
+    result = {}
+    to_compute = []
+    tokens = {}
+    waiting = {}
+    for item_id, key in keys.items():
+        value = cached.get(key)
+        stats.incr('l2_hits' if value is not None else 'l2_misses')
+        if value is not None and _is_fresh(cached.get(_meta_key(key)), now):
+            result[item_id] = value
+            continue
+
+        # Chaves frias e expiradas passam pelo mesmo lock: só um processo recalcula cada uma
+        token = acquire_lock(_lock_key(key), lock_timeout)
+        if token is not None:
+            to_compute.append(item_id)
+            tokens[_lock_key(key)] = token
+        elif value is not None:
+            result[item_id] = value
+        else:
+            waiting[item_id] = key
+
+    if to_compute:
+        try:
+            start = time.time()
+            computed = compute_missing(to_compute)
+            set_many_cached(
+                {keys[item_id]: computed.get(item_id, default) for item_id in to_compute},
+                timeout=timeout,
+                delta=time.time() - start,
+            )
+        finally:
+            release_locks(tokens)
+        for item_id in to_compute:
+            result[item_id] = computed.get(item_id, default)
+
+    if waiting:
+        # Frias com lock de outro processo: espera o valor dele e só calcula (sem gravar) o que não chegar
+        result.update(_wait_for(waiting))
+        missing = [item_id for item_id in waiting if item_id not in result]
+        if missing:
+            computed = compute_missing(missing)
+            for item_id in missing:
+                result[item_id] = computed.get(item_id, default)
+
+    return result
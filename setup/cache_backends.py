@@ -0,0 +1,251 @@
+import math
+import pickle
+import zlib
+from contextlib import nullcontext
+from itertools import chain
+
+import orjson
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django_redis.cache import RedisCache
+from django_redis.serializers.base import BaseSerializer
+from setup import tracing
+from setup.metrics import current_stats
+
+
+_MISSING = object()
+
+# Primeiro byte dos valores do CompactSerializer: formato nos 4 bits baixos, compressão nos altos.
+# Valores gravados pelo PickleSerializer começam com 0x80 (protocolo do pickle) e continuam legíveis.
+JSON, PICKLE = 0x01, 0x02
+UNCOMPRESSED, ZLIB, ZSTD, LZ4 = 0x00, 0x10, 0x20, 0x30
+_PICKLE_PROTOCOL = 0x80
+_JSON_TYPES = frozenset((str, int, float, bool, type(None), list, dict))
+_CONTAINERS = frozenset((list, dict))
+_DICT, _LIST, _FLOAT, _STR = frozenset((dict,)), frozenset((list,)), frozenset((float,)), frozenset((str,))
+
+
+def _codecs():
+    """{header: (name, compress, decompress)} of the compression libraries available."""
+    # Níveis rápidos: nos valores do cache a taxa quase não muda e a compressão fica várias vezes mais rápida
+    codecs = {ZLIB: ('zlib', lambda data: zlib.compress(data, 1), zlib.decompress)}
+    try:
+        import zstandard
+    except ImportError:
+        pass
+    else:
+        codecs[ZSTD] = ('zstd', zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress)
+    try:
+        import lz4.frame
+    except ImportError:
+        pass
+    else:
+        codecs[LZ4] = ('lz4', lz4.frame.compress, lz4.frame.decompress)
+    return codecs
+
+
+def _json_native(value):
+    """
+    Whether `value` comes back unchanged from JSON: only the exact JSON types all the way down, so
+    tuples, datetimes, UUIDs, subclasses (e.g. SafeString), non-string keys and NaN/inf are not.
+    """
+    # Um nível de aninhamento por vez, com type()/set()/chain em C: sai mais barato que ida e volta pelo orjson
+    level = value if type(value) is list else [value]
+    while level:
+        types = set(map(type, level))
+        if not types <= _JSON_TYPES:
+            return False
+        if float in types:
+            # NaN e infinito viram null; uma soma finita garante que todos são finitos
+            floats = level if types == _FLOAT else [item for item in level if type(item) is float]
+            if not math.isfinite(sum(floats)):
+                return False
+        if types.isdisjoint(_CONTAINERS):
+            return True
+        dicts = (level if types == _DICT else [item for item in level if type(item) is dict]) if dict in types else ()
+        lists = (level if types == _LIST else [item for item in level if type(item) is list]) if list in types else ()
+        if dicts and not set(map(type, chain.from_iterable(dicts))) <= _STR:
+            return False
+        level = [*chain.from_iterable(map(dict.values, dicts)), *chain.from_iterable(lists)]
+    return True
+
+
+class CompactSerializer(BaseSerializer):
+    """
+    django-redis serializer that writes JSON-native values (id lists, serialized rows, throttle
+    histories) with orjson and anything else (model instances, tuples, datetimes) with pickle,
+    compressing values of COMPRESS_MIN_BYTES or more with COMPRESSION (zlib, zstd or lz4).
+    Integers never reach the serializer: django-redis stores them as native Redis integers.
+    """
+
+    def __init__(self, options):
+        codecs = _codecs()
+        self._decompressors = {header: decompress for header, (_, _, decompress) in codecs.items()}
+        self.min_bytes = options.get('COMPRESS_MIN_BYTES', 1024)
+
+        name = options.get('COMPRESSION', 'zlib')
+        if name in (None, 'none'):
+            self._codec = None
+            return
+        try:
+            self._codec = next((header, compress) for header, (codec, compress, _) in codecs.items() if codec == name)
+        except StopIteration:
+            raise ImproperlyConfigured(f'Cache compression {name!r} is not available (install zstandard or lz4).')
+
+    def dumps(self, value):
+        data, kind = self._encode(value), JSON
+        if data is None:
+            data, kind = pickle.dumps(value, pickle.HIGHEST_PROTOCOL), PICKLE
+
+        if self._codec is not None and len(data) >= self.min_bytes:
+            header, compress = self._codec
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                return bytes((kind | header,)) + compressed
+        return bytes((kind,)) + data
+
+    @staticmethod
+    def _encode(value):
+        if not _json_native(value):
+            return None
+        try:
+            return orjson.dumps(value)
+        except TypeError:  # Inteiros acima de 64 bits
+            return None
+
+    def loads(self, value):
+        header = value[0]
+        if header == _PICKLE_PROTOCOL:
+            return pickle.loads(value)
+
+        data = memoryview(value)[1:]
+        codec = header & 0xF0
+        if codec != UNCOMPRESSED:
+            data = self._decompressors[codec](data)
+        return orjson.loads(data) if header & 0x0F == JSON else pickle.loads(data)
+
+
+class InstrumentedCacheMixin:
+    """
+    Cache backend wrapper that counts calls, hits and misses into the active `setup.metrics.collect()`
+    block (the request being served) and records a span per call when the request is traced.
+    Outside of them it only adds two context variable lookups.
+    """
+
+    def _span(self, operation):
+        current = tracing.current_span()
+        # Chamadas internas de outra operação do cache (ex.: get_many do locmem) não viram spans
+        if current is None or current.kind == tracing.CLIENT:
+            return nullcontext()
+        return tracing.span(f'cache {operation}', tracing.CLIENT, **{'db.system': self.system})
+
+    def _count(self, operation):
+        stats = current_stats()
+        if stats is None or stats.cache_depth:
+            return None
+        stats.cache_calls[operation] += 1
+        return stats
+
+    def _call(self, operation, method, *args, **kwargs):
+        with self._span(operation):
+            return self._counted_call(operation, method, *args, **kwargs)
+
+    def _counted_call(self, operation, method, *args, **kwargs):
+        stats = self._count(operation)
+        if stats is None:
+            return method(*args, **kwargs)
+        stats.cache_depth += 1
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.cache_depth -= 1
+
+    def get(self, key, default=None, version=None, **kwargs):
+        with self._span('get') as span:
+            value = self._counted_get(key, _MISSING, version, **kwargs)
+            if span is not None:
+                span.attributes['cache.hit'] = value is not _MISSING
+        return default if value is _MISSING else value
+
+    def _counted_get(self, key, default, version, **kwargs):
+        stats = self._count('get')
+        if stats is None:
+            return super().get(key, default, version=version, **kwargs)
+
+        stats.cache_depth += 1
+        try:
+            value = super().get(key, _MISSING, version=version, **kwargs)
+        finally:
+            stats.cache_depth -= 1
+        if value is _MISSING:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None, **kwargs):
+        keys = list(keys)
+        with self._span('get_many') as span:
+            values = self._counted_get_many(keys, version, **kwargs)
+            if span is not None:
+                span.attributes.update({'cache.keys': len(keys), 'cache.hits': len(values)})
+        return values
+
+    def _counted_get_many(self, keys, version, **kwargs):
+        stats = self._count('get_many')
+        if stats is None:
+            return super().get_many(keys, version=version, **kwargs)
+
+        stats.cache_depth += 1
+        try:
+            values = super().get_many(keys, version=version, **kwargs)
+        finally:
+            stats.cache_depth -= 1
+        stats.cache_hits += len(values)
+        stats.cache_misses += len(keys) - len(values)
+        return values
+
+    def set(self, *args, **kwargs):
+        return self._call('set', super().set, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._call('set_many', super().set_many, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._call('add', super().add, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', super().delete, *args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self._call('delete_many', super().delete_many, *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._call('incr', super().incr, *args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self._call('has_key', super().has_key, *args, **kwargs)
+
+    def add_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Add the keys of `data` that are not cached yet; returns the keys that were already there."""
+        return self._call('add_many', self._add_many, data, timeout, version)
+
+    def _add_many(self, data, timeout, version):
+        add = super().add
+        return [key for key, value in data.items() if not add(key, value, timeout, version)]
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    system = 'redis'
+
+    def _add_many(self, data, timeout, version):
+        # Um único pipeline de SET NX, como o set_many do django-redis
+        pipeline = self.client.get_client(write=True).pipeline()
+        for key, value in data.items():
+            self.client.set(key, value, timeout, version=version, client=pipeline, nx=True)
+        return [key for key, added in zip(data, pipeline.execute()) if not added]
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    system = 'locmem'
@@ -1,6 +1,16 @@
 from __future__ import absolute_import
+import logging
 import os
+import time
 from celery import Celery
+from celery.signals import (
+    before_task_publish, after_task_publish, task_prerun, task_postrun, task_failure, worker_process_shutdown,
+)
+from django.conf import settings
+from setup import slow_queries, tracing
+from setup.db_routers import reset_state
+from setup.logs import log_event
+from setup.metrics import collect, record_task, record_task_failure, registry
 
 # Definir as configurações padrão do Django para o Celery
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
@@ -11,4 +21,126 @@ app = Celery('setup')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Descobre e carrega as tarefas (tasks.py) nos aplicativos registrados no INSTALLED_APPS
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+logger = logging.getLogger(__name__)
+
+# Tarefas em execução neste processo: task_id -> (bloco collect(), stats, início)
+_running = {}
+# Blocos slow_queries.watch() das tarefas em execução: task_id -> bloco
+_watching = {}
+# Spans abertos neste processo: task_id -> span do envio, ou (span, token, bloco trace_queries()) da execução
+_publishing = {}
+_traced = {}
+
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    # Horário de envio, para medir quanto tempo a tarefa esperou na fila
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@before_task_publish.connect
+def start_publish_span(sender=None, headers=None, **kwargs):
+    # O traceparent vai na mensagem para a execução no worker continuar o trace de quem enviou
+    if headers is None:
+        return
+    span = tracing.child_span(f'publish {sender}', tracing.PRODUCER, {'celery.task_id': headers.get('id')})
+    if span is not None:
+        headers['traceparent'] = span.traceparent
+        _publishing[headers.get('id')] = span
+
+
+@after_task_publish.connect
+def finish_publish_span(headers=None, **kwargs):
+    span = _publishing.pop((headers or {}).get('id'), None)
+    if span is not None:
+        span.finish()
+
+
+@task_prerun.connect
+def reset_replica_state(**kwargs):
+    # Cada tarefa começa lendo do primário, sem herdar o estado da anterior
+    reset_state()
+
+
+@task_prerun.connect
+def start_task_metrics(task_id=None, task=None, **kwargs):
+    if not settings.METRICS_ENABLED:
+        return
+    block = collect()
+    _running[task_id] = (block, block.__enter__(), time.time(), time.perf_counter())
+
+
+@task_prerun.connect
+def start_slow_query_log(task_id=None, task=None, **kwargs):
+    block = slow_queries.watch(source=task.name)
+    block.__enter__()
+    _watching[task_id] = block
+
+
+@task_postrun.connect
+def finish_slow_query_log(task_id=None, **kwargs):
+    block = _watching.pop(task_id, None)
+    if block is not None:
+        block.__exit__(None, None, None)
+
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    # Em modo eager a tarefa roda dentro da requisição e o span ativo é o pai
+    traceparent = getattr(task.request, 'traceparent', None) or (task.request.headers or {}).get('traceparent')
+    span = tracing.start_trace(task.name, tracing.CONSUMER, traceparent, {'celery.task_id': task_id})
+    if span is None:
+        return
+    token = tracing.attach(span)
+    block = tracing.trace_queries()
+    block.__enter__()
+    _traced[task_id] = (span, token, block)
+
+
+@task_postrun.connect
+def finish_task_span(task_id=None, retval=None, state=None, **kwargs):
+    entry = _traced.pop(task_id, None)
+    if entry is None:
+        return
+    span, token, block = entry
+    block.__exit__(None, None, None)
+    tracing.detach(token)
+    span.attributes['celery.state'] = state
+    span.finish(retval if state == 'FAILURE' else None)
+
+
+@task_postrun.connect
+def record_task_metrics(task_id=None, task=None, state=None, **kwargs):
+    entry = _running.pop(task_id, None)
+    if entry is None:
+        return
+    block, stats, started_at, start = entry
+    block.__exit__(None, None, None)
+    duration = time.perf_counter() - start
+
+    # No worker os headers da mensagem viram atributos do request; em modo eager ficam em `headers`
+    published_at = getattr(task.request, 'published_at', None) or (task.request.headers or {}).get('published_at')
+    queue_wait = max(0.0, started_at - published_at) if published_at else None
+    record_task(task.name, state or 'UNKNOWN', duration, queue_wait, stats)
+
+    log_event(
+        logger, 'task_finished',
+        sample_rate=1.0 if duration >= settings.TASK_LOG_SLOW_SECONDS else settings.TASK_LOG_SAMPLE_RATE,
+        task=task.name, task_id=task_id, state=state, duration=f'{duration:.3f}',
+        queue_wait=f'{queue_wait:.3f}' if queue_wait is not None else None,
+        queries=stats.queries, query_time=f'{stats.query_time:.3f}', cache_calls=sum(stats.cache_calls.values()),
+    )
+
+
+@task_failure.connect
+def count_task_failure(sender=None, exception=None, **kwargs):
+    record_task_failure(sender.name, type(exception).__name__)
+
+
+@worker_process_shutdown.connect
+def flush_metrics(**kwargs):
+    registry.flush()
+    tracing.flush()
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+
+def get_redis(alias='default'):
+    """Return the raw redis client that shares the pool of a django-redis cache, or None for other backends."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection(alias)
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def redis_pool_stats(alias='default'):
+    client = get_redis(alias)
+    if client is None:
+        return {'backend': caches[alias].__class__.__name__}
+
+    pool = client.connection_pool
+    return {
+        'backend': caches[alias].__class__.__name__,
+        'max_connections': pool.max_connections,
+        'created_connections': pool._created_connections,
+        'available_connections': len(pool._available_connections),
+        'in_use_connections': len(pool._in_use_connections),
+    }
+
+
+def database_pool_stats():
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        entry = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+            'open': connection.connection is not None,
+        }
+
+        # Pool do psycopg3 (DB_CONNECTION_MODE=pool)
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            entry['pool'] = pool.get_stats()
+
+        stats[alias] = entry
+    return stats
+
+
+def celery_pool_stats():
+    from setup.celery import app
+
+    return {
+        'broker_pool_limit': app.conf.broker_pool_limit,
+        'redis_max_connections': app.conf.redis_max_connections,
+    }
+
+
+def pool_stats():
+    """Collect connection pool statistics for the database, the cache and Celery."""
+    return {
+        'mode': getattr(settings, 'DB_CONNECTION_MODE', 'persistent'),
+        'databases': database_pool_stats(),
+        'redis': {alias: redis_pool_stats(alias) for alias in settings.CACHES},
+        'celery': celery_pool_stats(),
+    }
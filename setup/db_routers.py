@@ -0,0 +1,76 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+# Estado por thread: cada requisição/tarefa decide se pode ler das réplicas
+_state = threading.local()
+
+
+@contextmanager
+def use_replica():
+    """Route reads inside the block to a read replica, unless the primary is pinned."""
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+@contextmanager
+def pin_primary():
+    """Force every read inside the block to the primary database."""
+    previous = getattr(_state, 'pinned', False)
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = previous
+
+
+def reset_state():
+    """Forget replica/pinning decisions left over from a previous request or task."""
+    _state.use_replica = False
+    _state.pinned = False
+    _state.wrote = False
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Send reads to the replicas listed in DATABASE_REPLICAS and writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'use_replica', False) or getattr(_state, 'pinned', False):
+            return 'default'
+
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Depois de uma escrita, o restante da requisição lê do primário
+        _state.wrote = True
+        _state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas espelham o primário, então as relações entre elas são válidas
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaReadMixin:
+    """Serve GET requests of a DRF view from the read replicas."""
+
+    def get(self, request, *args, **kwargs):
+        with use_replica():
+            return super().get(request, *args, **kwargs)
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from setup.connections import get_redis
+from setup.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LocalCache:
+    """Size-bounded, per-process LRU cache with a TTL per entry."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.monotonic() + (timeout or self.timeout)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheStats:
+    """Hit/miss counters for the local (L1) and Redis (L2) tiers, of this process and in `/metrics`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0}
+
+    def incr(self, name, amount=1):
+        if amount:
+            with self._lock:
+                self.counters[name] += amount
+            # Publica também no /metrics, somado entre os workers (a razão sai de hits / (hits + misses))
+            tier, result = name.split('_')
+            registry.inc(f'tiered_cache_{result}_total', amount, tier=tier)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+        for tier in ('l1', 'l2'):
+            total = counters[f'{tier}_hits'] + counters[f'{tier}_misses']
+            counters[f'{tier}_hit_ratio'] = counters[f'{tier}_hits'] / total if total else 0.0
+        return counters
+
+
+local_cache = LocalCache(
+    max_entries=getattr(settings, 'L1_CACHE_MAX_ENTRIES', 10000),
+    timeout=getattr(settings, 'L1_CACHE_TIMEOUT', 5),
+)
+stats = CacheStats()
+
+_subscriber_pid = None
+_subscriber_lock = threading.Lock()
+
+
+def _listen(client, channel):
+    while True:
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(channel)
+            for message in pubsub.listen():
+                local_cache.delete_many(json.loads(message['data']))
+        except Exception:
+            # Invalidações podem ter sido perdidas durante a queda: descarta tudo antes de reconectar
+            logger.warning('Lost the L1 cache invalidation channel, reconnecting', exc_info=True)
+            local_cache.clear()
+            time.sleep(1)
+
+
+def ensure_subscriber():
+    """Start (once per process, also after a fork) the thread that applies invalidations from other processes."""
+    global _subscriber_pid
+
+    if _subscriber_pid == os.getpid():
+        return
+
+    with _subscriber_lock:
+        if _subscriber_pid == os.getpid():
+            return
+        _subscriber_pid = os.getpid()
+
+        # Processo herdado de um fork pode ter entradas que ninguém mais invalida
+        local_cache.clear()
+
+        client = get_redis()
+        if client is None:
+            return
+
+        thread = threading.Thread(
+            target=_listen,
+            args=(client, getattr(settings, 'L1_CACHE_CHANNEL', 'cache-invalidation')),
+            name='l1-cache-invalidation',
+            daemon=True,
+        )
+        thread.start()
+
+
+def invalidate(*keys):
+    """Drop keys from the L1 cache of every process (the Redis values are left as they are)."""
+    if not keys:
+        return
+
+    local_cache.delete_many(keys)
+
+    client = get_redis()
+    if client is not None:
+        client.publish(getattr(settings, 'L1_CACHE_CHANNEL', 'cache-invalidation'), json.dumps(keys))
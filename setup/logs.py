@@ -0,0 +1,19 @@
+import logging
+import random
+
+
+def log_event(logger, event, level=logging.INFO, sample_rate=1.0, **fields):
+    """
+    Log `event key=value ...` for a random `sample_rate` fraction of the calls.
+
+    The fields also go in the record (`record.event`, `record.fields`) for structured handlers.
+    Hot loops pass a small rate so a sweep over thousands of rows logs a handful of lines.
+    """
+    if sample_rate < 1 and random.random() >= sample_rate:
+        return
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(
+        level, '%s %s', event, ' '.join(f'{key}={value}' for key, value in fields.items()),
+        extra={'event': event, 'fields': fields},
+    )
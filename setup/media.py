@@ -0,0 +1,132 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def is_content_addressed(path):
+    """Files under IMAGE_BLOB_PREFIX are named by their SHA-256 (variants too), so they never change."""
+    prefix = getattr(settings, 'IMAGE_BLOB_PREFIX', None)
+    return bool(prefix) and path.startswith(prefix.rstrip('/') + '/')
+
+
+def file_etag(path, stat):
+    if is_content_addressed(path):
+        return '"%s"' % posixpath.splitext(posixpath.basename(path))[0]
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def cache_control(path):
+    if is_content_addressed(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def parse_range(header, size):
+    """(start, end) of a single `bytes=` range, None to send the whole file, or False if unsatisfiable."""
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        # Faixas múltiplas ou inválidas: a RFC 9110 permite ignorar e responder o arquivo inteiro
+        return None
+
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            block = source.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def _file_response(request, full_path, stat, etag):
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if 'Range' in request.headers and (if_range is None or if_range == etag):
+        byte_range = parse_range(request.headers['Range'], stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range is None:
+        # FileResponse usa o wsgi.file_wrapper do servidor (sendfile quando disponível)
+        return FileResponse(open(full_path, 'rb'))
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_read_range(full_path, start, length), status=206)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT according to MEDIA_SERVE_MODE.
+
+    `x-accel` (nginx) and `x-sendfile` (Apache/lighttpd) only answer with headers and let the web
+    server send the bytes (and handle Range); `django` streams the file itself, with Range support,
+    for local runs. Content-addressed images are cached as immutable.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404('File not found.')
+    # Uploads ainda incompletos (twitter.uploads) ficam fora do alcance público
+    upload_dir = os.path.join(os.path.abspath(getattr(settings, 'IMAGE_UPLOAD_TEMP_DIR', '')), '')
+    if not os.path.isfile(full_path) or full_path.startswith(upload_dir):
+        raise Http404('File not found.')
+
+    etag = file_etag(path, stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        mode = settings.MEDIA_SERVE_MODE
+        if mode == 'x-accel':
+            response = HttpResponse()
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + path
+        elif mode == 'x-sendfile':
+            response = HttpResponse()
+            response['X-Sendfile'] = full_path
+        else:
+            response = _file_response(request, full_path, stat, etag)
+
+        content_type, encoding = mimetypes.guess_type(full_path)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control(path)
+    return response
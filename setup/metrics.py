@@ -0,0 +1,251 @@
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from setup.connections import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+# Nome -> (tipo, descrição) das métricas expostas em /metrics
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by view, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'http_response_size_bytes': ('histogram', 'Response body size by view.'),
+    'db_queries_total': ('counter', 'SQL queries by view.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL queries by view.'),
+    'cache_calls_total': ('counter', 'Cache backend calls by view and operation.'),
+    'cache_hits_total': ('counter', 'Cache keys found by view.'),
+    'cache_misses_total': ('counter', 'Cache keys not found by view.'),
+    'tiered_cache_hits_total': ('counter', 'Two-tier cache hits by tier (l1 = process memory, l2 = Redis).'),
+    'tiered_cache_misses_total': ('counter', 'Two-tier cache misses by tier (l1 = process memory, l2 = Redis).'),
+    'celery_tasks_total': ('counter', 'Celery tasks run by task and final state.'),
+    'celery_task_failures_total': ('counter', 'Celery task failures by task and exception.'),
+    'celery_task_duration_seconds': ('histogram', 'Task execution time.'),
+    'celery_task_queue_wait_seconds': ('histogram', 'Time between publishing a task and a worker starting it.'),
+    'celery_task_db_queries_total': ('counter', 'SQL queries by task.'),
+    'celery_task_db_query_duration_seconds_total': ('counter', 'Time spent in SQL queries by task.'),
+    'celery_task_cache_calls_total': ('counter', 'Cache backend calls by task and operation.'),
+    'celery_task_cache_hits_total': ('counter', 'Cache keys found by task.'),
+    'celery_task_cache_misses_total': ('counter', 'Cache keys not found by task.'),
+}
+
+
+class Stats:
+    """Queries and cache calls made while a `collect()` block is active."""
+
+    __slots__ = ('queries', 'query_time', 'cache_calls', 'cache_hits', 'cache_misses', 'cache_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_calls = defaultdict(int)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Operações compostas (ex.: get_many do locmem chama get) contam só a chamada externa
+        self.cache_depth = 0
+
+
+_current = ContextVar('metrics_stats', default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Count the SQL queries (on every database alias) and cache calls made inside the block."""
+    stats = Stats()
+    token = _current.set(stats)
+
+    def count_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.queries += 1
+            stats.query_time += time.perf_counter() - start
+
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count_query))
+            yield stats
+    finally:
+        _current.reset(token)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def series(name, **labels):
+    """Prometheus series name, e.g. `http_requests_total{view="post_feed",status="200"}`."""
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class Registry:
+    """
+    Counters and histograms aggregated in memory by each worker process and merged every
+    METRICS_FLUSH_INTERVAL seconds into a Redis hash shared by all workers (one pipelined
+    HINCRBYFLOAT per series). Without Redis, /metrics shows the values of the current process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._last_flush = time.monotonic()
+
+    def inc(self, name, amount=1, **labels):
+        key = series(name, **labels)
+        with self._lock:
+            self._pending[key] += amount
+
+    def observe(self, name, value, buckets, **labels):
+        # Buckets cumulativos como no formato do Prometheus: o valor entra em todos com le >= valor
+        first = bisect_left(buckets, value)
+        keys = [series(f'{name}_bucket', **labels, le=bound) for bound in buckets[first:]]
+        keys.append(series(f'{name}_bucket', **labels, le='+Inf'))
+        with self._lock:
+            for key in keys:
+                self._pending[key] += 1
+            self._pending[series(f'{name}_sum', **labels)] += value
+            self._pending[series(f'{name}_count', **labels)] += 1
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        client = get_redis()
+        self._last_flush = time.monotonic()
+        if client is None:
+            return
+
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+        if not pending:
+            return
+
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for key, value in pending.items():
+                pipeline.hincrbyfloat(settings.METRICS_KEY, key, value)
+            pipeline.execute()
+        except Exception:
+            # Devolve os valores para a próxima tentativa
+            logger.warning('Could not flush metrics to Redis', exc_info=True)
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] += value
+
+    def snapshot(self):
+        """{series: value} of every worker (or of this process when there is no Redis)."""
+        self.flush()
+        client = get_redis()
+        if client is None:
+            with self._lock:
+                return dict(self._pending)
+        return {key.decode(): float(value) for key, value in client.hgetall(settings.METRICS_KEY).items()}
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+        client = get_redis()
+        if client is not None:
+            client.delete(settings.METRICS_KEY)
+
+
+registry = Registry()
+
+
+def record_request(view, method, status, duration, size, stats):
+    registry.inc('http_requests_total', view=view, method=method, status=status)
+    registry.observe('http_request_duration_seconds', duration, settings.METRICS_LATENCY_BUCKETS, view=view)
+    if size is not None:
+        registry.observe('http_response_size_bytes', size, settings.METRICS_SIZE_BUCKETS, view=view)
+
+    _record_stats('', stats, view=view)
+    registry.maybe_flush()
+
+
+def record_task(task, state, duration, queue_wait, stats):
+    registry.inc('celery_tasks_total', task=task, state=state)
+    registry.observe('celery_task_duration_seconds', duration, settings.METRICS_TASK_BUCKETS, task=task)
+    # Tarefas executadas em modo eager não passam pela fila
+    if queue_wait is not None:
+        registry.observe('celery_task_queue_wait_seconds', queue_wait, settings.METRICS_TASK_BUCKETS, task=task)
+    _record_stats('celery_task_', stats, task=task)
+    registry.maybe_flush()
+
+
+def record_task_failure(task, exception):
+    registry.inc('celery_task_failures_total', task=task, exception=exception)
+
+
+def _record_stats(prefix, stats, **labels):
+    if stats.queries:
+        registry.inc(f'{prefix}db_queries_total', stats.queries, **labels)
+        registry.inc(f'{prefix}db_query_duration_seconds_total', stats.query_time, **labels)
+    for operation, calls in stats.cache_calls.items():
+        registry.inc(f'{prefix}cache_calls_total', calls, **labels, operation=operation)
+    if stats.cache_hits:
+        registry.inc(f'{prefix}cache_hits_total', stats.cache_hits, **labels)
+    if stats.cache_misses:
+        registry.inc(f'{prefix}cache_misses_total', stats.cache_misses, **labels)
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _family(key):
+    name = key.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and METRICS.get(base, ('',))[0] == 'histogram':
+            return base
+    return name
+
+
+def _sort_key(item):
+    # Buckets em ordem crescente de `le` (a ordem lexicográfica poria "10" antes de "2.5")
+    key = item[0]
+    base, _, bound = key.partition(',le="')
+    if not bound:
+        base, _, bound = key.partition('{le="')
+    return base, float(bound.rstrip('"}').replace('+Inf', 'inf')) if bound else 0.0
+
+
+def render(values):
+    """Prometheus text exposition format (version 0.0.4)."""
+    families = defaultdict(list)
+    for key, value in values.items():
+        families[_family(key)].append((key, value))
+
+    lines = []
+    for family in sorted(families):
+        kind, description = METRICS.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {kind}')
+        lines.extend(f'{key} {_format_value(value)}' for key, value in sorted(families[family], key=_sort_key))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Scrape endpoint for Prometheus, only for requests carrying METRICS_TOKEN (closed while it is unset)."""
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(render(registry.snapshot()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,8 +1,13 @@
+import time
 import jwt
 from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 from jwt import InvalidTokenError
+from setup.db_routers import reset_state, pin_primary, has_written
+from setup.metrics import collect, record_request
+from setup.profiling import requested_mode, profile_request
+from setup import slow_queries, tracing
 
 class AuthRedirectMiddleware:
     def __init__(self, get_response):
@@ -26,4 +31,123 @@ class AuthRedirectMiddleware:
                 return True
             except InvalidTokenError:
                 return False
-        return request.user.is_authenticated 
\ No newline at end of file
+        return request.user.is_authenticated 
+
+
+class ReplicaPinningMiddleware:
+    """Keep a client on the primary database for a few seconds after it writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_state()
+
+        # Um cookie recente indica que o cliente escreveu há pouco e deve ler do primário
+        if request.COOKIES.get(settings.REPLICA_PIN_COOKIE):
+            with pin_primary():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+
+        if has_written():
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class TracingMiddleware:
+    """
+    Open the server span of a sampled request (or of one that arrives with a sampled `traceparent`)
+    and record its SQL queries as child spans; the trace id is returned in `X-Trace-Id`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        span = tracing.start_trace(
+            f'{request.method} {request.path}', tracing.SERVER, request.headers.get('traceparent'),
+            {'http.request.method': request.method, 'url.path': request.path},
+        )
+        if span is None:
+            return self.get_response(request)
+
+        with tracing.activate(span), tracing.trace_queries():
+            try:
+                response = self.get_response(request)
+            except Exception as error:
+                span.finish(error)
+                raise
+
+        # O nome usa a rota resolvida para agrupar as requisições da mesma view
+        view = MetricsMiddleware.view_name(request)
+        span.name = f'{request.method} {view}'
+        span.attributes.update({'http.route': view, 'http.response.status_code': response.status_code})
+        if response.status_code >= 500:
+            span.status = tracing.STATUS_ERROR
+        span.finish()
+        response['X-Trace-Id'] = span.trace_id
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record latency, response size, SQL queries and cache calls of every request, labeled with the
+    resolved URL name, for the Prometheus endpoint at /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with collect() as stats:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = self.view_name(request)
+        # Respostas em streaming (arquivos de mídia) não têm o corpo em memória
+        size = None if response.streaming else len(response.content)
+        record_request(view, request.method, response.status_code, duration, size, stats)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        match = request.resolver_match
+        return match.view_name if match is not None else 'unmatched'
+
+
+class SlowQueryMiddleware:
+    """Send the queries of every request slower than SLOW_QUERY_THRESHOLD_MS to the slow query log."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with slow_queries.watch(source=lambda: MetricsMiddleware.view_name(request)):
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when it carries a valid signed PROFILING_HEADER (see `manage.py profiles --token`)
+    or is picked by PROFILING_SAMPLE_RATE; the profile id is returned in `X-Profile-Id`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, mode)
@@ -0,0 +1,202 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sampling')
+SIGNING_SALT = 'setup.profiling'
+
+
+def make_token(mode='cprofile'):
+    """Signed value for the PROFILING_HEADER, valid for PROFILING_TOKEN_MAX_AGE seconds."""
+    if mode not in MODES:
+        raise ValueError(f'Unknown profiling mode: {mode}')
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(mode)
+
+
+def requested_mode(request):
+    """Profiling mode for the request: from a valid signed header, by sampling, or None."""
+    token = request.headers.get(settings.PROFILING_HEADER)
+    if token:
+        try:
+            mode = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        return mode if mode in MODES else None
+
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return settings.PROFILING_MODE
+    return None
+
+
+class StackSampler:
+    """
+    Sampling profiler: a background thread reads the stack of the profiled thread every
+    `interval` seconds and counts it as a collapsed stack (`outer;inner;leaf`), the input of
+    flamegraph.pl and speedscope. Much lower overhead than cProfile on deep call chains.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class QueryLog:
+    """Count and total time of every query, plus the (sql, seconds) of the first `limit` of them."""
+
+    __slots__ = ('limit', 'count', 'time', 'queries')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self.time = 0.0
+        self.queries = []
+
+
+@contextmanager
+def capture_queries(limit):
+    """Record the queries run inside the block on every database alias (only `limit` SQL samples are kept)."""
+    log = QueryLog(limit)
+
+    def record(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            log.count += 1
+            log.time += elapsed
+            if len(log.queries) < limit:
+                log.queries.append({'sql': sql, 'time': round(elapsed, 6)})
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(record))
+        yield log
+
+
+def profile_request(request, get_response, mode):
+    """Run `get_response` under the profiler and write `<id>.prof` or `<id>.folded` plus `<id>.json`."""
+    profile_id = f'{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}'
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    if mode == 'sampling':
+        profiler = StackSampler(settings.PROFILING_SAMPLE_INTERVAL)
+        start_profiler, stop_profiler = profiler.start, profiler.stop
+    else:
+        profiler = cProfile.Profile()
+        start_profiler, stop_profiler = profiler.enable, profiler.disable
+
+    try:
+        start_profiler()
+    except ValueError:
+        # Outro profiler já ativo no processo (ex.: um depurador): segue sem perfilar
+        logger.warning('Could not start the %s profiler', mode, exc_info=True)
+        return get_response(request)
+
+    start = time.perf_counter()
+    try:
+        with capture_queries(settings.PROFILING_MAX_QUERIES) as query_log:
+            response = get_response(request)
+    finally:
+        stop_profiler()
+    duration = time.perf_counter() - start
+
+    if mode == 'sampling':
+        profile_file = f'{profile_id}.folded'
+        profiler.dump(os.path.join(directory, profile_file))
+    else:
+        profile_file = f'{profile_id}.prof'
+        profiler.dump_stats(os.path.join(directory, profile_file))
+
+    match = request.resolver_match
+    meta = {
+        'id': profile_id,
+        'created_at': timezone.now().isoformat(),
+        'mode': mode,
+        'file': profile_file,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': match.view_name if match is not None else None,
+        'status': response.status_code,
+        'duration': round(duration, 6),
+        'query_count': query_log.count,
+        'query_time': round(query_log.time, 6),
+        'queries': query_log.queries,
+    }
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as file:
+        json.dump(meta, file, indent=2)
+
+    prune(directory, settings.PROFILING_MAX_PROFILES)
+    response['X-Profile-Id'] = profile_id
+    return response
+
+
+def list_profiles(directory=None):
+    """Metadata of the stored profiles, newest first."""
+    directory = directory or settings.PROFILING_DIR
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    profiles.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda meta: meta['id'], reverse=True)
+
+
+def prune(directory, keep):
+    """Delete the oldest profiles beyond the newest `keep` (the ids sort by creation time)."""
+    ids = sorted((name[:-5] for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+    for profile_id in ids[keep:]:
+        for extension in ('.json', '.prof', '.folded'):
+            try:
+                os.remove(os.path.join(directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
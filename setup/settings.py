@@ -16,6 +16,7 @@ import os
 import sys
 from datetime import timedelta
 from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Carrega as variáveis do arquivo .env
@@ -55,6 +56,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'setup.middleware.TracingMiddleware',
+    'setup.middleware.MetricsMiddleware',
+    'setup.middleware.SlowQueryMiddleware',
+    'setup.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +68,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'setup.middleware.AuthRedirectMiddleware',
+    'setup.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'setup.urls'
@@ -107,6 +113,56 @@ DATABASES = {
     }
 }
 
+# Gerenciamento de conexões com o Postgres:
+# - persistent: reaproveita a conexão entre requisições/tarefas (CONN_MAX_AGE) com health check
+# - pool: pool de conexões do psycopg3 (requer `psycopg[pool]` instalado)
+# - pgbouncer: conexões persistentes com um pgbouncer em modo transaction pooling
+DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE', 'persistent')
+
+
+def check_psycopg_pool():
+    """Fail early when the psycopg3 pool is selected but not installed."""
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured("DB_CONNECTION_MODE='pool' requires psycopg 3 (install `psycopg[pool]`).")
+
+
+if DB_CONNECTION_MODE == 'pool':
+    check_psycopg_pool()
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    if DB_CONNECTION_MODE == 'pgbouncer':
+        # Cursores do lado do servidor não sobrevivem ao transaction pooling
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Réplicas de leitura (ex.: DB_REPLICA_HOSTS=db_replica1,db_replica2)
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['setup.db_routers.ReplicaRouter']
+
+# Após uma escrita, o cliente lê do primário por alguns segundos (read-your-writes)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_COOKIE = 'pin_primary'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -152,6 +208,31 @@ STATICFILES_DIRS = [
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Entrega da mídia (setup/media.py): 'django' (streaming no worker, só para rodar local),
+# 'x-accel' (nginx, location interna em MEDIA_ACCEL_PREFIX) ou 'x-sendfile' (Apache/lighttpd).
+# Fora do DEBUG o padrão é o nginx, para os workers não ficarem presos enviando arquivos
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'django' if DEBUG else 'x-accel')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = 60 * 60  # Arquivos que não são endereçados pelo hash do conteúdo
+
+# Variantes das imagens dos posts (geradas em background por twitter.tasks.process_post_image)
+IMAGE_VARIANT_WIDTHS = [320, 640, 1080]
+IMAGE_DEFAULT_WIDTH = 640
+IMAGE_JPEG_QUALITY = 82
+IMAGE_WEBP_QUALITY = 80
+
+# Imagens são gravadas pelo SHA-256 do conteúdo; uploads repetidos reaproveitam o mesmo arquivo
+IMAGE_BLOB_PREFIX = 'core/static/img/posts/blobs'
+# Uploads de imagem em partes (/api/uploads/); o diretório precisa ser compartilhado entre os servidores web
+IMAGE_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+IMAGE_UPLOAD_CHUNK_SIZE = 64 * 1024
+IMAGE_UPLOAD_TEMP_DIR = os.getenv('IMAGE_UPLOAD_TEMP_DIR', os.path.join(MEDIA_ROOT, 'uploads'))
+IMAGE_UPLOAD_EXPIRE_HOURS = 24
+FILE_UPLOAD_HANDLERS = [
+    'twitter.uploadhandlers.HashingMemoryFileUploadHandler',
+    'twitter.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -167,6 +248,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'setup.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
@@ -179,6 +264,9 @@ REST_FRAMEWORK = {
     }
 }
 
+# Listas somente leitura montam o JSON direto de `.values()`, sem os campos do ModelSerializer
+FAST_LIST_SERIALIZATION = True
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=20),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -206,24 +294,163 @@ EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 
+# Conexões com o Redis (compartilhadas pelo cache, throttling e Celery)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379')
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+REDIS_HEALTH_CHECK_INTERVAL = 30
+
 # Configurações do Celery
-CELERY_BROKER_URL = 'redis://redis:6379/0'
+CELERY_BROKER_URL = f'{REDIS_URL}/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
+CELERY_RESULT_BACKEND = f'{REDIS_URL}/0'
+CELERY_BROKER_POOL_LIMIT = 10
+CELERY_REDIS_MAX_CONNECTIONS = REDIS_MAX_CONNECTIONS
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'max_connections': REDIS_MAX_CONNECTIONS,
+    'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+}
+CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = CELERY_BROKER_TRANSPORT_OPTIONS
 
+# O throttling do DRF usa o cache 'default', então divide o mesmo pool
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': 'redis://redis:6379/1',
+        # RedisCache do django-redis que conta chamadas, hits e misses para o /metrics
+        'BACKEND': 'setup.cache_backends.InstrumentedRedisCache',
+        'LOCATION': f'{REDIS_URL}/1',
         'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Valores JSON em orjson (o resto em pickle), comprimidos a partir de COMPRESS_MIN_BYTES;
+            # inteiros ficam como inteiros nativos do Redis (INCR atômico). Ver `python manage.py bench_cache`
+            'SERIALIZER': 'setup.cache_backends.CompactSerializer',
+            'COMPRESSION': os.getenv('CACHE_COMPRESSION', 'zlib'),  # zlib, zstd, lz4 ou none
+            'COMPRESS_MIN_BYTES': 1024,
+            'SOCKET_CONNECT_TIMEOUT': 2,
+            'SOCKET_TIMEOUT': 2,
+            'CONNECTION_POOL_KWARGS': {
+                'max_connections': REDIS_MAX_CONNECTIONS,
+                'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+                'retry_on_timeout': True,
+            },
         }
     }
 }
 
+# Proteção contra stampede no cache (ver setup/cache.py)
+CACHE_TTL_JITTER = 0.1  # Variação de ±10% no TTL para as chaves não expirarem juntas
+CACHE_STALE_TTL = 60  # Segundos em que um valor expirado ainda é servido enquanto é recalculado
+CACHE_LOCK_TIMEOUT = 10  # Duração máxima do lock de recálculo
+CACHE_LOCK_WAIT = 0.5  # Espera máxima por um valor que outro processo está calculando
+CACHE_EARLY_REFRESH_BETA = 1.0  # Agressividade da renovação antecipada probabilística
+CACHE_WARM_CHUNK_SIZE = 1000  # Linhas lidas por vez e chaves por add_many (SET NX em lote) nas tarefas que aquecem o cache
+
+# Métricas por endpoint em /metrics (formato Prometheus, ver setup/metrics.py). Cada processo agrega
+# em memória e soma os valores num hash do Redis a cada METRICS_FLUSH_INTERVAL segundos.
+METRICS_ENABLED = True
+METRICS_KEY = 'metrics'
+METRICS_FLUSH_INTERVAL = 10
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+METRICS_TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)  # Tarefas do Celery, em segundos
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # O scrape precisa de `Authorization: Bearer <token>`; sem ele, /metrics fica fechado
+
+# Profiling sob demanda (ver setup/profiling.py): requisições com o header assinado (gerado por
+# `python manage.py profiles --token`) ou sorteadas por PROFILING_SAMPLE_RATE rodam sob o cProfile
+# (.prof) ou o profiler por amostragem (.folded, para flamegraph), com as queries num .json
+PROFILING_HEADER = 'X-Profile'
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'cprofile')  # Modo das requisições sorteadas: cprofile ou sampling
+PROFILING_SAMPLE_INTERVAL = 0.005  # Segundos entre amostras do profiler por amostragem
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_PROFILES = 200  # Os mais antigos são apagados
+PROFILING_MAX_QUERIES = 1000  # Queries guardadas por perfil
+
+# Log de queries lentas em requisições e tarefas (ver setup/slow_queries.py): agregadas por fingerprint
+# no Redis, com o EXPLAIN (ANALYZE, BUFFERS) das leituras capturado por uma tarefa do Celery
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_KEY = 'slow_queries'
+SLOW_QUERY_LOG_PARAMS = False  # Os valores das queries podem ter dados pessoais
+SLOW_QUERY_EXPLAIN = True
+SLOW_QUERY_EXPLAIN_INTERVAL = 60 * 60  # Um EXPLAIN por fingerprint a cada hora
+SLOW_QUERY_MAX_FINGERPRINTS = 500
+SLOW_QUERY_RETENTION = 60 * 60 * 24 * 7
+
+# Logs por item dentro das tarefas (ex.: um por post na varredura de likes) são amostrados
+LOG_SAMPLE_RATE = 0.01
+# Resumo de cada tarefa (duração, espera na fila, queries, chamadas ao cache): amostrado, mas
+# tarefas acima de TASK_LOG_SLOW_SECONDS sempre aparecem
+TASK_LOG_SAMPLE_RATE = 0.1
+TASK_LOG_SLOW_SECONDS = 1
+
+# Tracing distribuído (ver setup/tracing.py): spans da requisição, das queries, das chamadas ao cache
+# e das tarefas do Celery (o trace segue no header `traceparent` da mensagem), exportados em OTLP/JSON
+# para um arquivo (`file`) ou um coletor OTLP/HTTP (`otlp`). `none` desliga.
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none')
+TRACING_FILE = os.getenv('TRACING_FILE', os.path.join(BASE_DIR, 'traces', 'spans.jsonl'))
+TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'twitter-api')
+TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', 0.01))  # Traces novos; um traceparent recebido é respeitado
+TRACING_EXPORT_INTERVAL = 5  # Segundos entre os envios de cada processo
+TRACING_MAX_QUEUE = 10000  # Spans em memória à espera do envio; o excedente é descartado
+TRACING_DB_STATEMENT_MAX_LENGTH = 2000
+
+# Cache local (L1) por processo na frente do Redis, invalidado via pub/sub (ver setup/local_cache.py)
+L1_CACHE_MAX_ENTRIES = 10000
+L1_CACHE_TIMEOUT = 5
+L1_CACHE_CHANNEL = 'cache-invalidation'
+
 CELERY_BEAT_SCHEDULE = {
     'update-likes-cache-every-10-minutes': {
         'task': 'twitter.tasks.update_post_likes_cache',
         'schedule': crontab('*/10'),  # Executa a cada 10 minutos
     },
-}
\ No newline at end of file
+    'archive-deleted-posts-daily': {
+        'task': 'twitter.tasks.archive_deleted_posts',
+        'schedule': crontab(minute=0, hour=3),  # Executa todo dia às 3h
+    },
+    'rescale-trending-posts': {
+        'task': 'twitter.tasks.rescale_trending_posts',
+        'schedule': crontab(minute='*/15'),  # Executa a cada 15 minutos
+    },
+    'compute-follow-suggestions-nightly': {
+        'task': 'twitter.tasks.compute_follow_suggestions',
+        'schedule': crontab(minute=0, hour=4),  # Executa todo dia às 4h
+    },
+    'expire-image-uploads-hourly': {
+        'task': 'twitter.tasks.expire_image_uploads',
+        'schedule': crontab(minute=30),  # Executa a cada hora
+    },
+}
+
+# Feed ranqueado (`/api/posts/feed/?order=ranked`, ver twitter/ranking.py)
+RANKED_FEED_CANDIDATES = 1000  # Posts mais recentes dos seguidos que entram na pontuação
+RANKED_FEED_WINDOW_DAYS = 7
+RANKED_FEED_HALF_LIFE_HOURS = 12
+RANKED_FEED_WEIGHTS = {'likes': 1.0, 'affinity': 2.0, 'followers': 0.25}
+RANKED_FEED_CACHE_SECONDS = 60 * 3
+
+# Timeline do autor (/api/user/<id>/posts/): posts mais recentes de cada autor em cache
+AUTHOR_TIMELINE_CACHE_SIZE = 100
+AUTHOR_TIMELINE_CACHE_SECONDS = 60 * 10
+
+# /api/user/relationships/: ids por requisição e quantos nomes de "seguidores que você segue" devolver
+RELATIONSHIPS_MAX_IDS = 100
+RELATIONSHIPS_COMMON_SAMPLE = 3
+
+# Sugestões de quem seguir (amigos de amigos), recalculadas toda noite (ver twitter/suggestions.py)
+FOLLOW_SUGGESTIONS_TOP_K = 20
+FOLLOW_SUGGESTIONS_WORKERS = int(os.getenv('FOLLOW_SUGGESTIONS_WORKERS', os.cpu_count() or 1))
+FOLLOW_SUGGESTIONS_TIMEOUT = 60 * 60 * 48  # Sobrevive a uma execução perdida
+
+# Posts em alta (sorted set no Redis, ver twitter/trending.py)
+TRENDING_KEY = 'trending:posts'
+TRENDING_HALF_LIFE_HOURS = 6  # Um like perde metade do peso a cada 6 horas
+TRENDING_MAX_POSTS = 1000  # Top K mantido no set
+TRENDING_MIN_SCORE = 0.01  # Abaixo disso o post sai do set no reescalonamento
+TRENDING_DEFAULT_LIMIT = 20
+TRENDING_MAX_LIMIT = 100
+
+# Posts deletados há mais de N dias saem da tabela principal
+POST_ARCHIVE_AFTER_DAYS = int(os.getenv('POST_ARCHIVE_AFTER_DAYS', 30))
+POST_ARCHIVE_BATCH_SIZE = 500
\ No newline at end of file
@@ -0,0 +1,230 @@
+import datetime
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from setup.connections import get_redis
+from setup.logs import log_event
+
+
+logger = logging.getLogger(__name__)
+
+# Soma a ocorrência ao agregado do fingerprint e mantém o ranking por tempo total
+RECORD_SCRIPT = """
+redis.call('HINCRBY', KEYS[2], 'count', 1)
+redis.call('HINCRBYFLOAT', KEYS[2], 'total', ARGV[2])
+local max = tonumber(redis.call('HGET', KEYS[2], 'max') or '0')
+if tonumber(ARGV[2]) > max then
+    redis.call('HSET', KEYS[2], 'max', ARGV[2], 'max_params', ARGV[5])
+end
+redis.call('HSET', KEYS[2], 'sql', ARGV[3], 'source', ARGV[4], 'last_seen', ARGV[6], 'alias', ARGV[7])
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[8]))
+redis.call('ZINCRBY', KEYS[1], ARGV[2], ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[9]) + 1))
+"""
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_SPACE = re.compile(r'\s+')
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+# Postgres a partir do qual o EXPLAIN (GENERIC_PLAN) dispensa os valores dos parâmetros
+GENERIC_PLAN_VERSION = 160000
+
+# Bloco watch() mais interno: uma tarefa eager dentro da requisição registra a query uma vez só, com o nome da tarefa
+_active = ContextVar('slow_queries_watch', default=None)
+
+# Sem Redis, o agregado fica no processo
+_local = {}
+_local_lock = threading.Lock()
+
+
+def normalize(sql):
+    """SQL with literals replaced by placeholders and IN lists collapsed, so equal queries match."""
+    sql = _STRING.sub('%s', sql)
+    sql = _NUMBER.sub('%s', sql)
+    sql = _LIST.sub('(%s, ...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+def _key(value=None):
+    return settings.SLOW_QUERY_KEY if value is None else f'{settings.SLOW_QUERY_KEY}:{value}'
+
+
+def _json_param(value):
+    # Os parâmetros vão para a tarefa do EXPLAIN em JSON; o Postgres converte os textos de volta
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_param(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _json_param(item) for key, item in value.items()}
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def record(sql, params, alias, duration, source):
+    """Log a slow query, add it to the aggregate of its fingerprint and schedule its EXPLAIN."""
+    # O EXPLAIN da própria tarefa não entra no log
+    if sql.lstrip()[:7].upper() == 'EXPLAIN':
+        return
+
+    key = fingerprint(sql)
+    # Com SLOW_QUERY_LOG_PARAMS desligado os valores não saem do processo: nem log, nem Redis, nem fila
+    show_params = settings.SLOW_QUERY_LOG_PARAMS
+    params = _json_param(params) if params is not None and show_params else None
+    params_text = repr(params)[:1000] if show_params else '<hidden>'
+    log_event(
+        logger, 'slow_query', logging.WARNING,
+        fingerprint=key, source=source, alias=alias, duration_ms=f'{duration * 1000:.1f}',
+        sql=sql, params=params if show_params else '<hidden>',
+    )
+
+    try:
+        _aggregate(key, sql, params_text, alias, duration, source)
+    except Exception:
+        logger.warning('Could not aggregate the slow query %s', key, exc_info=True)
+
+    # EXPLAIN ANALYZE executa a query: só para leituras, e no máximo uma vez por intervalo por fingerprint.
+    # Sem os parâmetros, só o plano genérico (sem ANALYZE) do Postgres 16+
+    connection = connections[alias]
+    if (
+        settings.SLOW_QUERY_EXPLAIN
+        and connection.vendor == 'postgresql'
+        and (show_params or connection.pg_version >= GENERIC_PLAN_VERSION)
+        and sql.lstrip()[:6].upper() == 'SELECT'
+        and 'FOR UPDATE' not in sql.upper()
+        and cache.add(f'{_key(key)}:explain', 1, settings.SLOW_QUERY_EXPLAIN_INTERVAL)
+    ):
+        explain_slow_query.delay(key, sql, params if show_params else None, alias)
+
+
+@contextmanager
+def watch(source=None):
+    """
+    Send the queries slower than SLOW_QUERY_THRESHOLD_MS run inside the block (on every database
+    alias) to `record`. Independent of METRICS_ENABLED; a no-op while the threshold is None.
+    """
+    if settings.SLOW_QUERY_THRESHOLD_MS is None:
+        yield
+        return
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+    marker = object()
+
+    def time_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            if elapsed >= threshold and _active.get() is marker:
+                # View ou tarefa em execução (ou uma função que a resolve, já que a URL só é resolvida depois)
+                record(sql, params, context['connection'].alias, elapsed, source() if callable(source) else source)
+
+    token = _active.set(marker)
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(time_query))
+            yield
+    finally:
+        _active.reset(token)
+
+
+def _aggregate(key, sql, params_text, alias, duration, source):
+    client = get_redis()
+    if client is not None:
+        client.register_script(RECORD_SCRIPT)(
+            keys=[_key(), _key(key)],
+            args=[
+                key, duration, sql, source or '', params_text, time.time(), alias,
+                settings.SLOW_QUERY_RETENTION, settings.SLOW_QUERY_MAX_FINGERPRINTS,
+            ],
+        )
+        return
+
+    with _local_lock:
+        entry = _local.setdefault(key, {'fingerprint': key, 'count': 0, 'total': 0.0, 'max': 0.0})
+        entry['count'] += 1
+        entry['total'] += duration
+        if duration > entry['max']:
+            entry['max'], entry['max_params'] = duration, params_text
+        entry.update(sql=sql, source=source or '', last_seen=time.time(), alias=alias)
+
+
+def store_plan(key, plan):
+    client = get_redis()
+    if client is not None:
+        client.hset(_key(key), mapping={'plan': plan, 'plan_at': time.time()})
+        return
+    with _local_lock:
+        if key in _local:
+            _local[key].update(plan=plan, plan_at=time.time())
+
+
+def top(limit=20):
+    """Aggregated slow queries with the largest total time first."""
+    client = get_redis()
+    if client is None:
+        with _local_lock:
+            entries = sorted(_local.values(), key=lambda entry: entry['total'], reverse=True)
+            return [dict(entry) for entry in entries[:limit]]
+
+    entries = []
+    for key in client.zrevrange(_key(), 0, limit - 1):
+        key = key.decode()
+        values = {field.decode(): value.decode() for field, value in client.hgetall(_key(key)).items()}
+        if not values:
+            continue
+        for field in ('total', 'max', 'last_seen', 'plan_at'):
+            if field in values:
+                values[field] = float(values[field])
+        values['count'] = int(values['count'])
+        entries.append({'fingerprint': key, **values})
+    return entries
+
+
+def reset():
+    client = get_redis()
+    if client is not None:
+        keys = [_key(key.decode()) for key in client.zrange(_key(), 0, -1)]
+        client.delete(_key(), *keys)
+    with _local_lock:
+        _local.clear()
+
+
+def _numbered(sql):
+    """The query with `$1, $2, ...` in place of the driver placeholders, as EXPLAIN (GENERIC_PLAN) expects."""
+    position = iter(range(1, sql.count('%s') + 1))
+    return _PLACEHOLDER.sub(lambda match: '%' if match.group() == '%%' else f'${next(position)}', sql)
+
+
+@shared_task
+def explain_slow_query(key, sql, params, alias):
+    """
+    Capture `EXPLAIN (ANALYZE, BUFFERS)` of a slow read on the database where it ran, or its
+    `EXPLAIN (GENERIC_PLAN)` when the parameters were withheld (`params=None`).
+    """
+    with connections[alias].cursor() as cursor:
+        if params is None:
+            cursor.execute(f'EXPLAIN (GENERIC_PLAN) {_numbered(sql)}')
+        else:
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+    store_plan(key, plan)
+    log_event(logger, 'slow_query_plan', fingerprint=key, plan=plan)
+    return plan
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.request
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Tipos de span do OTLP
+INTERNAL, SERVER, CLIENT, PRODUCER, CONSUMER = 1, 2, 3, 4, 5
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+class Span:
+    """One timed operation of a trace; exported in the OTLP/JSON span format when it ends."""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'attributes', 'status', 'start', 'end')
+
+    def __init__(self, name, kind, trace_id, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = '%016x' % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.status = None
+        self.start = time.time_ns()
+        self.end = None
+
+    @property
+    def traceparent(self):
+        """W3C `traceparent` header that makes the receiver's spans children of this one."""
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def finish(self, error=None):
+        self.end = time.time_ns()
+        if error is not None:
+            self.status = STATUS_ERROR
+            self.attributes['error.type'] = type(error).__name__
+        exporter.add(self)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'attributes': [_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status:
+            span['status'] = {'code': self.status}
+        return span
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+# Span ativo; None também quando o trace não foi amostrado (nada é gravado nem medido)
+_current = ContextVar('tracing_span', default=None)
+
+
+def enabled():
+    return settings.TRACING_EXPORTER != 'none'
+
+
+def current_span():
+    return _current.get()
+
+
+def parse_traceparent(value):
+    """(trace id, parent span id, sampled) from a W3C `traceparent`, or None if it is invalid."""
+    try:
+        version, trace_id, parent_id, flags = value.strip().split('-')
+        int(trace_id, 16), int(parent_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+    if len(trace_id) != 32 or len(parent_id) != 16 or set(trace_id) == {'0'}:
+        return None
+    return trace_id, parent_id, sampled
+
+
+def start_trace(name, kind, traceparent=None, attributes=None):
+    """
+    Root span of a request or task: continues the trace of `traceparent` when there is one,
+    otherwise starts a new trace if it falls in TRACING_SAMPLE_RATE. Returns None when not traced.
+    """
+    if not enabled():
+        return None
+
+    parent = parse_traceparent(traceparent) if traceparent else None
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+        if not sampled:
+            return None
+        return Span(name, kind, trace_id, parent_id, attributes)
+
+    current = current_span()
+    if current is not None:
+        return Span(name, kind, current.trace_id, current.span_id, attributes)
+
+    if random.random() >= settings.TRACING_SAMPLE_RATE:
+        return None
+    return Span(name, kind, '%032x' % random.getrandbits(128), None, attributes)
+
+
+def child_span(name, kind=INTERNAL, attributes=None):
+    """Child of the active span, or None when nothing is being traced."""
+    current = current_span()
+    if current is None:
+        return None
+    return Span(name, kind, current.trace_id, current.span_id, attributes)
+
+
+def attach(span):
+    """Make `span` the active span until `detach` is called with the returned token."""
+    return _current.set(span)
+
+
+def detach(token):
+    _current.reset(token)
+
+
+@contextmanager
+def activate(span):
+    """Make `span` the parent of the spans created inside the block."""
+    token = attach(span)
+    try:
+        yield span
+    finally:
+        detach(token)
+
+
+@contextmanager
+def span(name, kind=INTERNAL, **attributes):
+    """Time the block as a child of the active span (only when the trace is sampled)."""
+    child = child_span(name, kind, attributes)
+    if child is None:
+        yield None
+        return
+
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as error:
+        child.finish(error)
+        raise
+    else:
+        child.finish()
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def trace_queries():
+    """Record a CLIENT span for every SQL query run inside the block (on every database alias)."""
+    def traced(execute, sql, params, many, context):
+        alias = context['connection'].alias
+        with span(sql.split(None, 1)[0].upper() if sql else 'SQL', CLIENT, **{
+            'db.system': context['connection'].vendor,
+            'db.name': alias,
+            'db.statement': sql[:settings.TRACING_DB_STATEMENT_MAX_LENGTH],
+        }):
+            return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(traced))
+        yield
+
+
+class Exporter:
+    """
+    Buffer finished spans in memory and export them in batches from a background thread: as
+    OTLP/JSON lines appended to TRACING_FILE, or POSTed to an OTLP/HTTP collector (`/v1/traces`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = []
+        self._pid = None
+
+    def add(self, span):
+        with self._lock:
+            if len(self._spans) < settings.TRACING_MAX_QUEUE:
+                self._spans.append(span)
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Uma thread por processo, recriada depois de um fork (workers do gunicorn/Celery)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='span-exporter', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.TRACING_EXPORT_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return
+
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [_attribute('service.name', settings.TRACING_SERVICE_NAME)]},
+                'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_otlp() for span in spans]}],
+            }],
+        }
+        try:
+            if settings.TRACING_EXPORTER == 'otlp':
+                request = urllib.request.Request(
+                    settings.TRACING_OTLP_ENDPOINT, data=json.dumps(payload).encode(),
+                    headers={'Content-Type': 'application/json'}, method='POST',
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            elif settings.TRACING_EXPORTER == 'file':
+                os.makedirs(os.path.dirname(settings.TRACING_FILE), exist_ok=True)
+                with open(settings.TRACING_FILE, 'a') as file:
+                    file.write(json.dumps(payload) + '\n')
+        except Exception:
+            logger.warning('Could not export %d spans', len(spans), exc_info=True)
+
+
+exporter = Exporter()
+
+
+def flush():
+    exporter.flush()
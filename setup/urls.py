@@ -1,11 +1,13 @@
 from django.contrib import admin
-from django.urls import path, include, reverse_lazy
+from django.urls import path, re_path, include, reverse_lazy
 from django.conf import settings
 from django.conf.urls.static import static
 
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view as swagger_get_schema_view
 from rest_framework.permissions import AllowAny
+from setup.media import serve_media
+from setup.metrics import metrics_view
 
 
 schema_view = swagger_get_schema_view(
@@ -21,8 +23,10 @@ schema_view = swagger_get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('twitter.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-schema'),
+    # Com MEDIA_SERVE_MODE x-accel/x-sendfile o worker só responde os headers; o servidor web envia o arquivo
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)